@@ -0,0 +1,139 @@
+import os
+import math
+
+import numpy as np
+
+# Configuration
+INDEX_FACTORY = os.getenv("VIBE_INDEX_FACTORY", "flat")
+TRAIN_SAMPLE = int(os.getenv("VIBE_INDEX_TRAIN_SAMPLE", "50000"))
+MIN_ANN_VECTORS = int(os.getenv("VIBE_MIN_ANN_VECTORS", "2000"))
+DEFAULT_NPROBE = int(os.getenv("VIBE_NPROBE", "16"))
+DEFAULT_EF_SEARCH = int(os.getenv("VIBE_EF_SEARCH", "64"))
+
+# Named presets; anything else is passed to faiss.index_factory as is
+INDEX_PRESETS = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8")
+
+# k-means wants about 39 training points per centroid (faiss warns below
+# that); every PQ sub-quantizer trains 256 centroids
+MIN_POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256
+
+def _nlist(n_vectors):
+    """IVF list count: ~4 * sqrt(n), with at least 39 training points per list"""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_CENTROID))
+
+def _pq_subquantizers(dim):
+    """Largest divisor of dim giving sub-vectors of at least 8 dimensions, up to 64"""
+    return max(m for m in range(1, 65) if dim % m == 0 and dim // m >= 8) if dim >= 8 else 1
+
+def min_training_vectors(spec, n_vectors):
+    """Vectors needed to train the preset `spec` without undertrained centroids"""
+    spec = (spec or "flat").lower()
+    if spec == "ivf_flat":
+        return MIN_POINTS_PER_CENTROID * _nlist(n_vectors)
+    if spec == "ivf_pq":
+        return MIN_POINTS_PER_CENTROID * max(_nlist(n_vectors), PQ_CENTROIDS)
+    return 0
+
+def resolve_factory(spec, n_vectors, dim):
+    """faiss.index_factory string for a preset name or a raw factory string.
+
+    Small stores fall back to an index that needs no (or little) training:
+    below MIN_ANN_VECTORS everything is flat, and IVF presets without enough
+    training vectors become flat (ivf_flat) or SQ8 (ivf_pq, still compressed).
+    """
+    spec = spec or "flat"
+    if n_vectors < MIN_ANN_VECTORS and spec.lower() != "flat":
+        print(f"[!] Only {n_vectors} vectors, using a flat index instead of {spec}")
+        return "Flat"
+    needed = min_training_vectors(spec, n_vectors)
+    if min(n_vectors, TRAIN_SAMPLE) < needed:
+        fallback = "SQ8" if spec.lower() == "ivf_pq" else "Flat"
+        print(f"[!] {spec} needs {needed} training vectors, have {n_vectors}; using {fallback}")
+        return fallback
+    presets = {
+        "flat": "Flat",
+        "hnsw": "HNSW32",
+        "ivf_flat": f"IVF{_nlist(n_vectors)},Flat",
+        "ivf_pq": f"IVF{_nlist(n_vectors)},PQ{_pq_subquantizers(dim)}",
+        "sq8": "SQ8",
+    }
+    return presets.get(spec.lower(), spec)
+
+def supports_removal(index):
+    """True if LangChain's FAISS.delete keeps this index consistent.
+
+    HNSW graphs cannot delete vectors, and IVF indexes keep the removed row
+    ids while LangChain renumbers its row -> docstore map as if later rows
+    had shifted down. Stores using either are updated as a flat index and
+    retrained instead.
+    """
+    import faiss
+
+    index = faiss.downcast_index(index)
+    return not hasattr(index, "hnsw") and faiss.try_extract_index_ivf(index) is None
+
+def stores_exact_vectors(index):
+    """True if reconstruct() returns the original vectors (no quantization)"""
+    import faiss
+
+    index = faiss.downcast_index(index)
+    return isinstance(index, (faiss.IndexFlat, faiss.IndexHNSWFlat, faiss.IndexIVFFlat))
+
+def build_index(vectors, spec=INDEX_FACTORY):
+    """Empty, trained FAISS index for `vectors` (training uses a random sample)"""
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+    factory = resolve_factory(spec, n_vectors, dim)
+    index = faiss.index_factory(dim, factory, faiss.METRIC_L2)
+    if not index.is_trained:
+        sample = vectors
+        if n_vectors > TRAIN_SAMPLE:
+            sample = vectors[np.random.default_rng(0).choice(n_vectors, TRAIN_SAMPLE, replace=False)]
+        index.train(sample)
+    print(f"[✓] Built {factory} index for {n_vectors} x {dim} vectors")
+    return index
+
+def search_params(index, selector=None, nprobe=None, ef_search=None):
+    """Per-query SearchParameters for the index type, or None for defaults.
+
+    nprobe applies to IVF indexes and efSearch to HNSW; both trade latency
+    for recall and are set per call, so concurrent queries can differ.
+    """
+    import faiss
+
+    index = faiss.downcast_index(index)
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe or DEFAULT_NPROBE)
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search or DEFAULT_EF_SEARCH)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+def describe_index(index):
+    import faiss
+
+    index = faiss.downcast_index(index)
+    return {"type": type(index).__name__, "ntotal": index.ntotal, "bytes": len(faiss.serialize_index(index))}
+
+def to_flat(index):
+    """Exact flat copy of an index whose vectors can be reconstructed (flat, HNSW, IVF-Flat)"""
+    import faiss
+
+    flat = faiss.IndexFlatL2(index.d)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()  # IVF lists can only be reconstructed by row through a direct map
+    if index.ntotal:
+        flat.add(index.reconstruct_n(0, index.ntotal))
+    return flat
+
+def retrain_index(index, spec=INDEX_FACTORY):
+    """Rebuild a flat index as `spec`, trained on its own vectors; rows keep their order"""
+    vectors = index.reconstruct_n(0, index.ntotal)
+    trained = build_index(vectors, spec)
+    trained.add(vectors)
+    return trained
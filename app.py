@@ -1,12 +1,23 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 import os
 import json
-import threading
+import time
 from build_vibe_vectorstore import main as build_vectorstore
-from query_vibe import structured_query_response, load_data_and_store
+from query_vibe import structured_query_response, stream_query_response, batch_query_response, load_data_and_store
+from store_registry import VectorstoreRegistry, DEFAULT_MEMORY_BUDGET_MB
+from jobs import JobManager, MAX_CONCURRENT_JOBS
+from vibe_store import store_is_current
+from scrape_ledger import ScrapeLedger
+from place_ranking import STRATEGIES, MAX_TOP_N
+from query_cache import get_query_embedding_cache, get_semantic_cache
+from llm_cache import get_llm_cache
+from rate_limit import limiter_stats
+from scrolling import wait_metrics
+from metrics import span, observe, inc, render, stats_gauges, start_trace, end_trace, TRACE_ALL
 import sys
 import logging
-from main3 import main as run_scraper_direct  # Import directly
+from main3 import stream_scraped_places
+from place_records import combined_output_path, tagged_output_path
 
 from flask_cors import CORS
 
@@ -17,46 +28,102 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Configuration
+MAX_BATCH_QUERIES = int(os.getenv("VIBE_MAX_BATCH_QUERIES", "50"))
+
 # Global variables
-vectorstore = None
-place_map = None
-lock = threading.Lock()
-initialized = False
-
-def initialize_data(city, category):
-    global vectorstore, place_map, initialized
-    with lock:
-        if not initialized:
-            try:
-                logger.info(f"Initializing data for {category} in {city}")
-                
-                # 1. Check if data already exists
-                output_file = f"Combined Output/{category}_{city}_combined.json"
-                if os.path.exists(output_file):
-                    logger.info(f"Found existing data file: {output_file}")
-                else:
-                    logger.info(f"Running scraper for new data collection")
-                    run_scraper_direct(city, category)
-                
-                # 2. Check if vectorstore needs building
-                tagged_file = f"Combined Output/{category}_{city}_combined_tagged.json"
-                if not os.path.exists(tagged_file):
-                    logger.info(f"Building vectorstore from {output_file}")
-                    build_vectorstore(output_file)
-                
-                # 3. Load vectorstore
-                logger.info("Loading vectorstore...")
-                vectorstore, place_map = load_data_and_store(city.lower(), category.lower())
-                initialized = True
-                logger.info("Data initialization complete")
-                
-            except Exception as e:
-                logger.error(f"Initialization failed: {str(e)}")
-                raise
+stores = VectorstoreRegistry(load_data_and_store, DEFAULT_MEMORY_BUDGET_MB)
+last_searched = None  # (city, category) used when a query doesn't name one
+
+def reload_if_loaded(city, category):
+    # Swap the rebuilt store in; in-flight queries finish on the old snapshot
+    if (city, category) in stores:
+        stores.reload(city, category)
+
+def initialize_data(city, category, progress=None):
+    """Scrape, build and load one city/category, reporting each stage to `progress`"""
+    global last_searched
+    progress = progress or (lambda stage, status: None)
+    try:
+        logger.info(f"Initializing data for {category} in {city}")
+
+        # 1. Reuse the combined file if nothing needs re-scraping
+        output_file = combined_output_path(city, category)
+        if os.path.exists(output_file) and not ScrapeLedger(city, category).needs_refresh():
+            logger.info(f"Found existing data file: {output_file}")
+            progress("scrape", "skipped")
+            # 2. Update this city/category's store if it wasn't built from this exact file
+            if not store_is_current(city, category, output_file):
+                logger.info(f"Building vectorstore from {output_file}")
+                progress("build", "running")
+                with span("store_build"):
+                    built = build_vectorstore(output_file, city, category)
+                if built is None:
+                    raise RuntimeError(f"No reviews to index for {category} in {city}")
+                reload_if_loaded(city, category)
+                progress("build", "done")
+            else:
+                progress("build", "skipped")
+        else:
+            # Re-scrapes only places the ledger marks stale; the rest are reused.
+            # Places are tagged and embedded as they finish scraping, so both stages run together
+            logger.info(f"Running scraper and vectorstore build for new or stale data")
+            progress("scrape", "running")
+            progress("build", "running")
+            with span("scrape_and_build"):
+                built = build_vectorstore(output_file, city, category, places=stream_scraped_places(city, category))
+            progress("scrape", "done")
+            if built is None:
+                raise RuntimeError(f"No reviews to index for {category} in {city}")
+            reload_if_loaded(city, category)
+            progress("build", "done")
+
+        # 3. Load vectorstore (no-op if already in the registry)
+        logger.info("Loading vectorstore...")
+        progress("load", "running")
+        with span("store_load"):
+            stores.get(city, category)
+        progress("load", "done")
+        last_searched = (city, category)
+        logger.info("Data initialization complete")
+
+    except Exception as e:
+        logger.error(f"Initialization failed: {str(e)}")
+        raise
+
+jobs = JobManager(initialize_data, MAX_CONCURRENT_JOBS)
+
+# === Request metrics and traces ===
+@app.before_request
+def begin_request():
+    g.started = time.perf_counter()
+    # ?trace=1 (or VIBE_TRACE=on) adds a Server-Timing header and logs where the time went
+    g.trace_token = None
+    if TRACE_ALL or request.args.get("trace") == "1":
+        g.trace, g.trace_token = start_trace(f"{request.method} {request.path}")
+
+@app.after_request
+def finish_request(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    observe("vibe_http_request_seconds", time.perf_counter() - g.started, help="Flask request latency",
+            route=route, method=request.method)
+    inc("vibe_http_requests_total", help="Flask requests by route and status", route=route,
+        method=request.method, status=response.status_code)
+    if g.get("trace_token") is not None:
+        response.headers["Server-Timing"] = ", ".join(
+            f"{stage};dur={ms}" for stage, ms in g.trace.summary().items())
+        g.trace.dump()
+    return response
+
+@app.teardown_request
+def end_request(exc):
+    if g.get("trace_token") is not None:
+        end_trace(g.trace_token)
+        g.trace_token = None
 
 @app.route('/api/search', methods=['POST'])
 def search_places():
-    """Search endpoint with detailed logging"""
+    """Queue a scrape/build job and return its ID immediately"""
     logger.info("Received search request")
     data = request.get_json()
     if not data:
@@ -68,26 +135,73 @@ def search_places():
     if not city or not category:
         logger.warning("Missing city or category")
         return jsonify({"error": "Both city and category are required"}), 400
-    
+
+    job, created = jobs.submit(city, category)
+    logger.info(f"Search job {job.id} for {category} in {city} ({'queued' if created else 'attached'})")
+    response = {
+        **job.to_dict(),
+        "attached": not created,
+        "status_url": f"/api/jobs/{job.id}",
+        "data_file": tagged_output_path(combined_output_path(city, category))
+    }
+    return jsonify(response), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Per-stage progress of a search job"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+    return jsonify(job.to_dict())
+
+def parse_query_options(data):
+    """Validate the store and ranking options shared by the query endpoints.
+
+    Returns (options, None) or (None, error response).
+    """
+    city = data.get('city')
+    category = data.get('category')
+    if not city or not category:
+        if last_searched is None:
+            return None, (jsonify({"error": "Data not initialized. Call /api/search first"}), 400)
+        city, category = last_searched
+
+    strategy = data.get('strategy', 'max')
+    if strategy not in STRATEGIES:
+        return None, (jsonify({"error": f"strategy must be one of {list(STRATEGIES)}"}), 400)
     try:
-        initialize_data(city, category)
-        response = {
-            "status": "success",
-            "message": f"Data collected for {category} in {city}",
-            "data_file": f"Combined Output/{category}_{city}_combined_tagged.json"
-        }
-        logger.info(f"Search completed: {response}")
-        return jsonify(response)
-    except Exception as e:
-        logger.error(f"Search error: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        top_n = int(data.get('top_n', 1))
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "top_n must be an integer"}), 400)
+    if not 1 <= top_n <= MAX_TOP_N:
+        return None, (jsonify({"error": f"top_n must be between 1 and {MAX_TOP_N}"}), 400)
+
+    # ANN recall/latency knobs: nprobe for IVF stores, ef_search for HNSW stores
+    ann_params = {}
+    for name in ('nprobe', 'ef_search'):
+        if data.get(name) is not None:
+            try:
+                ann_params[name] = int(data[name])
+            except (TypeError, ValueError):
+                return None, (jsonify({"error": f"{name} must be an integer"}), 400)
+            if ann_params[name] < 1:
+                return None, (jsonify({"error": f"{name} must be positive"}), 400)
+
+    return {"city": city, "category": category, "tags": data.get('tags', []),
+            "top_n": top_n, "strategy": strategy, "ann_params": ann_params}, None
+
+def query_kwargs(options, snapshot):
+    return {
+        "required_tags": options["tags"],
+        "top_n": options["top_n"],
+        "strategy": options["strategy"],
+        "ann_params": options["ann_params"],
+        "cache_scope": (options["city"].strip().lower(), options["category"].strip().lower(), snapshot.version),
+    }
 
 @app.route('/api/query', methods=['POST'])
 def query_vibes():
     """Query endpoint"""
-    if not initialized:
-        return jsonify({"error": "Data not initialized. Call /api/search first"}), 400
-        
     data = request.get_json()
     if not data:
         return jsonify({"error": "No JSON data provided"}), 400
@@ -95,20 +209,128 @@ def query_vibes():
     query = data.get('query')
     if not query:
         return jsonify({"error": "Query parameter is required"}), 400
-        
+
+    options, error = parse_query_options(data)
+    if error:
+        return error
+
     try:
-        with lock:
-            result = structured_query_response(
-                query, 
-                vectorstore, 
-                place_map,
-                data.get('tags', [])
-            )
-            return jsonify(result)
+        # Queries run concurrently against an immutable snapshot; no lock needed
+        snapshot = stores.snapshot(options["city"], options["category"])
+        result = structured_query_response(
+            query,
+            snapshot.vectorstore,
+            snapshot.place_map,
+            **query_kwargs(options, snapshot)
+        )
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Query error: {str(e)}")
         return jsonify({"error": str(e)}), 500
-    
+
+@app.route('/api/query/batch', methods=['POST'])
+def query_vibes_batch():
+    """Answer a list of queries ({"query", "tags"} or plain strings) in one request"""
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "queries must be a non-empty list"}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+    queries = [item if isinstance(item, dict) else {"query": item} for item in queries]
+    if not all(isinstance(item.get('query'), str) and item['query'].strip() for item in queries):
+        return jsonify({"error": "Every query needs a non-empty 'query' string"}), 400
+
+    options, error = parse_query_options(data)
+    if error:
+        return error
+
+    try:
+        start = time.perf_counter()
+        snapshot = stores.snapshot(options["city"], options["category"])
+        kwargs = query_kwargs(options, snapshot)
+        del kwargs["required_tags"]  # tags are per query
+        results = batch_query_response(queries, snapshot.vectorstore, snapshot.place_map, **kwargs)
+        return jsonify({"results": results, "total_ms": round((time.perf_counter() - start) * 1000, 1)})
+    except Exception as e:
+        logger.error(f"Batch query error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/query/stream', methods=['POST'])
+def query_vibes_stream():
+    """Query endpoint streaming server-sent events: places, delta, result, done"""
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+
+    query = data.get('query')
+    if not query:
+        return jsonify({"error": "Query parameter is required"}), 400
+
+    options, error = parse_query_options(data)
+    if error:
+        return error
+
+    try:
+        snapshot = stores.snapshot(options["city"], options["category"])
+    except Exception as e:
+        logger.error(f"Query error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+    def generate():
+        try:
+            for event, payload in stream_query_response(
+                query, snapshot.vectorstore, snapshot.place_map, **query_kwargs(options, snapshot)
+            ):
+                yield sse_event(event, payload)
+        except Exception as e:
+            logger.error(f"Streaming query error: {str(e)}")
+            yield sse_event("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/api/stores', methods=['GET'])
+def store_stats():
+    """Loaded vectorstores and registry hit/miss/eviction stats"""
+    return jsonify(stores.stats())
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    """Query embedding LRU, semantic result cache and LLM cache stats"""
+    semantic = get_semantic_cache()
+    llm = get_llm_cache()
+    return jsonify({
+        "query_embeddings": get_query_embedding_cache().stats(),
+        "semantic": semantic.stats() if semantic else None,
+        "llm": llm.stats() if llm else None,
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Counters, stage latency histograms and cache/registry/limiter stats in Prometheus text format"""
+    semantic = get_semantic_cache()
+    llm = get_llm_cache()
+    gauges = stats_gauges("vibe_store_registry", stores.stats())
+    gauges += stats_gauges("vibe_query_embedding_cache", get_query_embedding_cache().stats())
+    if semantic:
+        gauges += stats_gauges("vibe_semantic_cache", semantic.stats())
+    if llm:
+        gauges += stats_gauges("vibe_llm_cache", llm.stats())
+    for provider, stats in limiter_stats().items():
+        gauges += stats_gauges("vibe_rate_limiter", stats, provider=provider)
+    gauges += stats_gauges("vibe_scroll_wait", wait_metrics())
+    return Response(render(gauges), mimetype="text/plain; version=0.0.4")
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -0,0 +1,664 @@
+import os
+import sys
+import time
+import tempfile
+import itertools
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+# === Shared helpers ===
+class FakeDoc:
+    def __init__(self, text, metadata):
+        self.page_content = text
+        self.metadata = metadata
+
+def write_google_reviews_fixture(directory, n_reviews=40, name="google_reviews.html"):
+    """Write a page with Google Maps-style review blocks and return its file:// URL"""
+    blocks = "\n".join(
+        f'<div data-review-id="r{i}"><div class="d4r55">Author {i}</div>'
+        f'<span class="rsqaWe">{i % 12 + 1} months ago</span>'
+        f'<span class="wiI7pd">Review {i}: quiet place, good coffee and fast wifi.</span></div>'
+        for i in range(n_reviews)
+    )
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'<html><body><div role="feed">{blocks}</div></body></html>')
+    return f"file://{path}"
+
+def write_reddit_comments_fixture(directory, n_top=15, n_replies=3, name="reddit_thread.html"):
+    """Write a page with nested shreddit-comment elements and return its file:// URL"""
+    def comment(cid, depth):
+        replies = "".join(comment(f"{cid}_{r}", depth + 1) for r in range(n_replies)) if depth < 2 else ""
+        return (
+            f'<shreddit-comment id="{cid}"><div><p>Comment {cid}: went here last week, loved the vibe.</p></div>'
+            f'<a data-testid="comment_permalink" href="/r/test/comments/x/{cid}/">link</a>{replies}</shreddit-comment>'
+        )
+
+    body = "".join(comment(f"c{i}", 0) for i in range(n_top))
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<html><body>{body}</body></html>")
+    return f"file://{path}"
+
+def write_heavy_assets_fixture(directory, n_images=12, image_kb=150):
+    """Write a review page that also pulls images, a font, a video and an
+    analytics script, like a real Maps/Reddit page. Returns the page filename."""
+    write_google_reviews_fixture(directory, name="reviews_fragment.html")
+    with open(os.path.join(directory, "reviews_fragment.html"), encoding="utf-8") as f:
+        reviews = f.read()
+    for i in range(n_images):
+        with open(os.path.join(directory, f"img{i}.png"), "wb") as f:
+            f.write(os.urandom(image_kb * 1024))
+    for asset, kb in (("font.woff2", 80), ("clip.mp4", 2048), ("gen_204", 1)):
+        with open(os.path.join(directory, asset), "wb") as f:
+            f.write(os.urandom(kb * 1024))
+    images = "".join(f'<img src="img{i}.png">' for i in range(n_images))
+    head = ('<style>@font-face{font-family:x;src:url(font.woff2)} body{font-family:x}</style>'
+            '<script src="gen_204" async></script>')
+    page = reviews.replace("<body>", f"<head>{head}</head><body>{images}<video src='clip.mp4' autoplay muted></video>")
+    with open(os.path.join(directory, "heavy.html"), "w", encoding="utf-8") as f:
+        f.write(page)
+    return "heavy.html"
+
+@functools.lru_cache(maxsize=None)
+def _quiet_handler(directory):
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+def serve_directory(directory):
+    """Serve a directory over HTTP on a free local port; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _quiet_handler(directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def _extract_fixture_reviews(page):
+    return [
+        el.locator('span[class*="wiI7pd"]').inner_text(timeout=300)
+        for el in page.locator('div[data-review-id]').all()
+    ]
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+# === Query concurrency load test ===
+class _SleepyVectorstore:
+    """Stands in for FAISS: fixed search cost that, like FAISS, releases the GIL"""
+
+    def __init__(self, places, search_seconds, dim=768):
+        from types import SimpleNamespace
+
+        self.places = places
+        self.search_seconds = search_seconds
+        # Enough of the FAISS attributes for the registry's size estimate
+        self.index = SimpleNamespace(ntotal=len(places), d=dim)
+        self.docstore = None
+
+    def similarity_search(self, query, k=15, **kwargs):
+        time.sleep(self.search_seconds)
+        return [
+            FakeDoc(f"review {i} of {name}", {"source": name, "tags": ["quiet"]})
+            for i, name in enumerate(self.places[:k])
+        ]
+
+def bench_query_concurrency(workers=(1, 2, 4, 8, 16), requests_per_run=64,
+                            llm_seconds=0.2, search_seconds=0.005, load_seconds=0.05, reload_every=0.1):
+    """QPS of structured_query_response vs. worker threads, served from a real
+    VectorstoreRegistry that a background thread keeps reloading.
+
+    The loader, search and LLM are stubs. Every query checks that its
+    vectorstore and place map came from the same load, i.e. that a reload
+    never hands a reader half of the old store and half of the new one.
+    """
+    import query_vibe
+    from store_registry import VectorstoreRegistry
+    from vibe_store import PlaceTable
+
+    places = [f"Place {i}" for i in range(20)]
+    loads = itertools.count(1)
+
+    def loader(city, category):
+        time.sleep(load_seconds)  # reading the index and side tables
+        load = next(loads)
+        vectorstore = _SleepyVectorstore(places, search_seconds)
+        vectorstore.load = load
+        return vectorstore, PlaceTable([{"name": name, "address": "somewhere", "load": load} for name in places])
+
+    def fake_llm(prompt, max_retries=3):
+        time.sleep(llm_seconds)
+        return {"summary": "stub"}
+
+    stores = VectorstoreRegistry(loader)
+
+    def query(i):
+        # Alternate the two read paths the Flask routes use
+        if i % 2:
+            vectorstore, place_map = stores.get("Pune", "cafes")
+        else:
+            snapshot = stores.snapshot("Pune", "cafes")
+            vectorstore, place_map = snapshot.vectorstore, snapshot.place_map
+        assert all(place["load"] == vectorstore.load for place in place_map.values()), "torn snapshot"
+        result = query_vibe.structured_query_response(f"quiet cafe {i}", vectorstore, place_map)
+        assert "error" not in result, result
+        return vectorstore.load
+
+    def keep_reloading(stop, reloads):
+        while not stop.wait(reload_every):
+            stores.reload("Pune", "cafes")
+            reloads.append(1)
+
+    original_llm = query_vibe.generate_structured_output
+    original_prompt = query_vibe.build_prompt_for_place
+    query_vibe.generate_structured_output = fake_llm
+    query_vibe.build_prompt_for_place = lambda place, reviews, query: query
+    try:
+        print(f"{'workers':>8} {'seconds':>9} {'qps':>8} {'reloads':>8} {'versions':>9}")
+        for n in workers:
+            stop, reloads = threading.Event(), []
+            reloader = threading.Thread(target=keep_reloading, args=(stop, reloads), daemon=True)
+            reloader.start()
+            try:
+                with ThreadPoolExecutor(max_workers=n) as pool:
+                    served, elapsed = _timed(lambda: list(pool.map(query, range(requests_per_run))))
+            finally:
+                stop.set()
+                reloader.join()
+            print(f"{n:>8} {elapsed:>9.2f} {requests_per_run / elapsed:>8.1f} {len(reloads):>8} "
+                  f"{len(set(served)):>9}")
+        print(f"registry stats: {stores.stats()}")
+    finally:
+        query_vibe.generate_structured_output = original_llm
+        query_vibe.build_prompt_for_place = original_prompt
+
+# === Browser pool: per-place latency ===
+def bench_browser_pool(places=10):
+    """Per-place latency of a fresh browser per place vs. the warm BrowserPool"""
+    from playwright.sync_api import sync_playwright
+    from browser_pool import BrowserPool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = write_google_reviews_fixture(tmp)
+
+        def cold_place():
+            with sync_playwright() as p:
+                browser = p.chromium.launch(headless=True)
+                page = browser.new_page()
+                page.goto(url)
+                _extract_fixture_reviews(page)
+                browser.close()
+
+        pool = BrowserPool(size=1)
+
+        def pooled_place():
+            with pool.page() as page:
+                page.goto(url)
+                _extract_fixture_reviews(page)
+
+        try:
+            for label, fn in (("launch per place", cold_place), ("browser pool", pooled_place)):
+                timings = [_timed(fn)[1] for _ in range(places)]
+                print(f"{label:>18}: {sum(timings) / len(timings) * 1000:8.1f} ms/place "
+                      f"(first {timings[0] * 1000:.1f} ms)")
+            print(f"pool stats: {pool.stats()}")
+        finally:
+            pool.close()
+
+# === DOM extraction: per-element locators vs. one page.evaluate ===
+def bench_dom_extraction(repeats=5):
+    """Extraction time per page for the locator and evaluate modes of both scrapers"""
+    import google_maps_scraper as gms
+    import reddit_scraper as rs
+    from browser_pool import BrowserPool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        google_url = write_google_reviews_fixture(tmp)
+        reddit_url = write_reddit_comments_fixture(tmp)
+        pool = BrowserPool(size=1)
+        try:
+            cases = (
+                ("google", google_url,
+                 lambda page: gms._extract_reviews_with_locators(page, 20),
+                 lambda page: page.evaluate(gms.EXTRACT_REVIEWS_JS, gms._extract_args(20))),
+                ("reddit", reddit_url,
+                 rs.extract_thread_comments,
+                 lambda page: page.evaluate(rs.EXTRACT_COMMENTS_JS, rs.EXTRACT_COMMENTS_ARGS)),
+            )
+            for label, url, by_locator, by_evaluate in cases:
+                with pool.page() as page:
+                    page.goto(url)
+                    locator_result, _ = _timed(by_locator, page)
+                    evaluate_result, _ = _timed(by_evaluate, page)
+                    assert locator_result == evaluate_result, f"{label}: modes disagree"
+                    locator_t = min(_timed(by_locator, page)[1] for _ in range(repeats))
+                    evaluate_t = min(_timed(by_evaluate, page)[1] for _ in range(repeats))
+                print(f"{label:>7}: locator {locator_t * 1000:8.1f} ms, evaluate {evaluate_t * 1000:6.1f} ms "
+                      f"({locator_t / evaluate_t:.0f}x)")
+        finally:
+            pool.close()
+
+# === Request routing: bytes and page-ready latency ===
+def bench_route_profile(loads=5):
+    """Page-ready latency and bytes fetched with and without resource blocking"""
+    from browser_pool import BrowserPool
+    from routing import RouteProfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        page_name = write_heavy_assets_fixture(tmp)
+        server, base_url = serve_directory(tmp)
+        try:
+            profiles = (
+                ("no blocking", RouteProfile(blocked_types=(), blocked_url_patterns=())),
+                ("block profile", RouteProfile()),
+            )
+            for label, profile in profiles:
+                pool = BrowserPool(size=1, route_profile=profile)
+                try:
+                    def load():
+                        with pool.page() as page:
+                            page.goto(f"{base_url}/{page_name}", wait_until="load")
+                            return len(_extract_fixture_reviews(page))
+                    load()  # warm up the browser
+                    timings = [_timed(load)[1] for _ in range(loads)]
+                    stats = profile.stats()
+                    print(f"{label:>14}: {sum(timings) / len(timings) * 1000:7.1f} ms/page, "
+                          f"{stats['bytes_fetched'] / (loads + 1) / 1024:8.1f} KB fetched/page, "
+                          f"{stats['requests_blocked'] // (loads + 1)} requests blocked/page")
+                finally:
+                    pool.close()
+        finally:
+            server.shutdown()
+
+# === Docstore format: per-chunk place metadata vs. compact + side table ===
+def _synthetic_places(n_places, reviews_per_place):
+    return [
+        {
+            "name": f"Place {i}",
+            "city": "Pune",
+            "category": "cafes",
+            "address": f"{i} Long Example Road, Koregaon Park, Pune, Maharashtra 411001, India",
+            "rating": 4.3,
+            "reviews_count": 1200 + i,
+            "coordinates": {"latitude": 18.53 + i / 1000, "longitude": 73.89 + i / 1000},
+            "source_url": f"ChIJ{i:024d}",
+            "tags": ["quiet", "cozy", "budget-friendly", "aesthetic"],
+            "google_reviews": [
+                {"author": f"Author {j}", "time": "a month ago",
+                 "text": f"Review {j}: lovely quiet corner, strong coffee, staff were friendly and fast."}
+                for j in range(reviews_per_place)
+            ],
+        }
+        for i in range(n_places)
+    ]
+
+def bench_docstore_format(n_places=50, reviews_per_place=200, dim=768):
+    """On-disk size, load time, first-fetch time and memory of real saved stores,
+    old vs. compact chunk metadata, loaded eagerly (index.pkl) and lazily
+    (export_docstore's docstore.sqlite through load_lazy_store)"""
+    import tracemalloc
+    import faiss
+    import numpy as np
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import FakeEmbeddings
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from finalPDFmaster import load_vector_store
+    from lazy_store import export_docstore, DOCSTORE_DB_NAME
+    from vibe_store import place_key, place_metadata, save_place_table, place_record
+
+    places = _synthetic_places(n_places, reviews_per_place)
+    formats = {
+        "full metadata": lambda p, r: {**place_metadata(p), "author": r["author"]},
+        "compact + table": lambda p, r: {"place_id": place_key(p), "author": r["author"], "origin": "google"},
+    }
+    n_chunks = n_places * reviews_per_place
+    vectors = np.random.default_rng(0).random((n_chunks, dim), dtype=np.float32)
+    query = vectors[:1]
+    embeddings = FakeEmbeddings(size=dim)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{n_chunks} chunks, {dim}-d vectors")
+        print(f"{'format':>16} {'load':>6} {'KB on disk':>11} {'load ms':>8} {'fetch ms':>9} {'py heap MB':>11}")
+        for label, metadata in formats.items():
+            path = os.path.join(tmp, label.replace(" ", "_"))
+            ids = [f"{place_key(p)}:{j}" for p in places for j in range(reviews_per_place)]
+            docstore = InMemoryDocstore({
+                doc_id: Document(page_content=r["text"], metadata=metadata(p, r))
+                for doc_id, (p, r) in zip(ids, ((p, r) for p in places for r in p["google_reviews"]))
+            })
+            index = faiss.IndexFlatL2(dim)
+            index.add(vectors)
+            vectorstore = FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+            vectorstore.save_local(path)
+            export_docstore(vectorstore, path)
+            if label == "compact + table":
+                save_place_table(path, [place_record(p) for p in places])
+            del vectorstore, docstore, index
+
+            for mode, files in (("eager", ("index.faiss", "index.pkl")), ("mmap", ("index.faiss", DOCSTORE_DB_NAME))):
+                files += ("places.json",) if label == "compact + table" else ()
+                disk = sum(os.path.getsize(os.path.join(path, name)) for name in files)
+                load_t = min(_timed(load_vector_store, path, embeddings, mode=mode)[1] for _ in range(3))
+
+                tracemalloc.start()
+                loaded = load_vector_store(path, embeddings, mode=mode)
+                _, rows = loaded.index.search(query, 15)
+                _, fetch_t = _timed(lambda: [loaded.docstore.search(loaded.index_to_docstore_id[int(r)])
+                                             for r in rows[0]])
+                resident, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del loaded
+                print(f"{label:>16} {mode:>6} {disk / 1024:>11.1f} {load_t * 1000:>8.1f} "
+                      f"{fetch_t * 1000:>9.2f} {resident / 1024 / 1024:>11.1f}")
+
+def bench_place_ranking(n_places=500, chunks_per_place=40, candidates=(50, 200, 1000), repeats=200):
+    """Latency of aggregating a candidate search into place scores, per strategy"""
+    import numpy as np
+    from place_ranking import PlaceRanker, STRATEGIES
+
+    rng = np.random.default_rng(0)
+    ntotal = n_places * chunks_per_place
+    ranker = PlaceRanker(
+        np.repeat(np.arange(n_places, dtype=np.int32), chunks_per_place),
+        [f"Place {i}" for i in range(n_places)],
+        rng.uniform(3.0, 5.0, n_places),
+        rng.integers(10, 5000, n_places).astype(np.float64),
+    )
+
+    print(f"{'candidates':>10} " + " ".join(f"{s:>12}" for s in STRATEGIES))
+    for k in candidates:
+        rows = rng.choice(ntotal, size=k, replace=False).astype(np.int64)
+        sims = np.sort(rng.uniform(0.5, 0.9, k))[::-1]
+        cells = []
+        for strategy in STRATEGIES:
+            start = time.perf_counter()
+            for _ in range(repeats):
+                ranker.rank(sims, rows, strategy, top_n=5)
+            cells.append(f"{(time.perf_counter() - start) / repeats * 1000:9.3f} ms")
+        print(f"{k:>10} " + " ".join(cells))
+
+def _clustered_vectors(n, dim, n_clusters=64, seed=0):
+    """Unit vectors drawn around random centres, roughly like review embeddings"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_clusters, dim))
+    vectors = centres[rng.integers(n_clusters, size=n)] + 0.6 * rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+def _store_vectors(path):
+    """Vectors of a saved flat store, e.g. vectorstores/cafes_pune"""
+    import faiss
+
+    from vibe_store import live_store_dir
+
+    index = faiss.read_index(os.path.join(live_store_dir(path), "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+def bench_ann_index(n_vectors=20000, dim=768, n_queries=200, k=10):
+    """recall@k, per-query latency and index size for each index preset and search setting.
+
+    Runs on synthetic clustered vectors, and on a real store's embeddings
+    when VIBE_BENCH_STORE points at a flat store directory.
+    """
+    import faiss
+    import numpy as np
+    from ann_index import INDEX_PRESETS, build_index, search_params, describe_index
+
+    datasets = {"synthetic": _clustered_vectors(n_vectors + n_queries, dim)}
+    if os.getenv("VIBE_BENCH_STORE"):
+        datasets["store"] = _store_vectors(os.getenv("VIBE_BENCH_STORE"))
+    sweeps = {"ivf_flat": ("nprobe", (1, 8, 32)), "ivf_pq": ("nprobe", (1, 8, 32)),
+              "hnsw": ("ef_search", (16, 64, 256))}
+
+    for label, vectors in datasets.items():
+        rng = np.random.default_rng(1)
+        picked = rng.permutation(len(vectors))
+        queries, base = vectors[picked[:n_queries]], vectors[picked[n_queries:]]
+        exact = faiss.IndexFlatL2(base.shape[1])
+        exact.add(base)
+        _, truth = exact.search(queries, k)
+
+        print(f"\n[{label}] {len(base)} x {base.shape[1]} vectors, {n_queries} queries, recall@{k}")
+        print(f"{'index':>10} {'setting':>14} {'recall':>7} {'ms/query':>9} {'MB':>8} {'build s':>8}")
+        for preset in INDEX_PRESETS:
+            def build():
+                index = build_index(base, preset)
+                index.add(base)
+                return index
+
+            index, build_t = _timed(build)
+            size_mb = describe_index(index)["bytes"] / 1024 / 1024
+            knob, values = sweeps.get(preset, (None, (None,)))
+            for value in values:
+                params = search_params(index, **({knob: value} if knob else {}))
+                (_, found), elapsed = _timed(index.search, queries, k, params=params)
+                recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+                setting = f"{knob}={value}" if knob else "-"
+                print(f"{preset:>10} {setting:>14} {recall:>7.3f} {elapsed / n_queries * 1000:>9.3f} "
+                      f"{size_mb:>8.1f} {build_t:>8.2f}")
+
+_COLD_START_PROBE = """
+import sys, time, json
+import numpy as np
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+if {mode!r} == "mmap":
+    from lazy_store import load_lazy_store
+    vs = load_lazy_store({path!r}, None)
+else:
+    from langchain_community.vectorstores import FAISS
+    vs = FAISS.load_local({path!r}, None, allow_dangerous_deserialization=True)
+loaded = time.perf_counter()
+_, rows = vs.index.search(np.random.default_rng(0).random((1, vs.index.d), dtype=np.float32), 15)
+docs = [vs.docstore.search(vs.index_to_docstore_id[int(r)]) for r in rows[0]]
+first = time.perf_counter()
+status = open("/proc/self/status").read()
+kb = lambda key: int(status.split(key + ":")[1].split()[0])
+print(json.dumps({{"load": loaded - start, "first_query": first - loaded,
+                  "anon_mb": kb("RssAnon") / 1024, "file_mb": kb("RssFile") / 1024}}))
+"""
+
+def bench_cold_start(n_chunks=50000, dim=768):
+    """Load time, first-query time and resident memory of a fresh worker, eager vs. mmap load.
+
+    Anonymous memory is private to each worker; file-backed pages of a
+    memory-mapped index are shared through the OS page cache.
+    """
+    import json
+    import subprocess
+    import faiss
+    import numpy as np
+    from langchain_core.documents import Document
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from lazy_store import export_docstore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = faiss.IndexFlatL2(dim)
+        index.add(np.random.default_rng(0).random((n_chunks, dim), dtype=np.float32))
+        ids = [f"ChIJ{i // 200:024d}:{i % 200}" for i in range(n_chunks)]
+        docstore = InMemoryDocstore({
+            doc_id: Document(
+                page_content=f"Review {i}: lovely quiet corner, strong coffee, staff were friendly and fast. " * 3,
+                metadata={"place_id": doc_id.split(":")[0], "author": f"Author {i}", "origin": "google"})
+            for i, doc_id in enumerate(ids)
+        })
+        vectorstore = FAISS(None, index, docstore, dict(enumerate(ids)))
+        vectorstore.save_local(tmp)
+        export_docstore(vectorstore, tmp)
+        del vectorstore, docstore, index
+
+        root = os.path.dirname(os.path.abspath(__file__))
+        print(f"{n_chunks} chunks x {dim} dims")
+        print(f"{'mode':>6} {'load ms':>9} {'1st query ms':>13} {'anon MB':>8} {'file MB':>8}")
+        for mode in ("eager", "mmap"):
+            probe = _COLD_START_PROBE.format(root=root, mode=mode, path=tmp)
+            out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{mode:>6} {r['load'] * 1000:>9.1f} {r['first_query'] * 1000:>13.1f} "
+                  f"{r['anon_mb']:>8.1f} {r['file_mb']:>8.1f}")
+
+# === Rate limiting against a throttling fake API ===
+class _ThrottlingAPI:
+    """Local HTTP server that answers 429 (Retry-After: 1) above `per_second`
+    requests per second and 503 to a random `error_rate` of the rest"""
+
+    def __init__(self, per_second, error_rate=0.0):
+        from http.server import BaseHTTPRequestHandler
+        import random
+
+        api = self
+        self.per_second = per_second
+        self.counts = {200: 0, 429: 0, 503: 0}
+        self._recent = []
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with api._lock:
+                    now = time.monotonic()
+                    api._recent = [t for t in api._recent if now - t < 1.0]
+                    if len(api._recent) >= api.per_second:
+                        status = 429
+                    else:
+                        api._recent.append(now)
+                        status = 503 if random.random() < error_rate else 200
+                    api.counts[status] += 1
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(b'{"local_results": []}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/search.json"
+
+def bench_rate_limit(calls=60, workers=16, per_second=10, error_rate=0.05):
+    """Successful calls, server-side 429s and wall time for a burst of API calls,
+    unthrottled vs. through a ProviderLimiter, plus circuit breaker fail-fast"""
+    import requests
+    from rate_limit import ProviderLimiter, CircuitOpenError
+
+    session = requests.Session()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{calls} calls, {workers} threads, server quota {per_second}/s, {error_rate:.0%} 503s")
+        print(f"{'client':>12} {'ok':>5} {'429s':>6} {'503s':>6} {'seconds':>8}")
+        for label in ("unthrottled", "limiter"):
+            api = _ThrottlingAPI(per_second, error_rate)
+            limiter = ProviderLimiter("fake", per_second * 60 * 0.9, max_concurrency=4,
+                                      path=os.path.join(tmp, "limits.sqlite"))
+            call = (lambda: session.get(api.url, timeout=5)) if label == "unthrottled" else (
+                lambda: limiter.call(session.get, api.url, timeout=5))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                responses, elapsed = _timed(lambda: list(pool.map(lambda _: call(), range(calls))))
+            api.server.shutdown()
+            ok = sum(r.status_code == 200 for r in responses)
+            print(f"{label:>12} {ok:>5} {api.counts[429]:>6} {api.counts[503]:>6} {elapsed:>8.2f}")
+            if label == "limiter":
+                print(f"limiter stats: {limiter.stats()}")
+
+        api = _ThrottlingAPI(per_second, error_rate=1.0)  # provider is down
+        limiter = ProviderLimiter("down", 6000, max_concurrency=4, attempts=2,
+                                  path=os.path.join(tmp, "limits.sqlite"))
+        limiter.state.failure_threshold = 4
+        rejected = 0
+        start = time.perf_counter()
+        for _ in range(10):
+            try:
+                limiter.call(session.get, api.url, timeout=5)
+            except CircuitOpenError:
+                rejected += 1
+        api.server.shutdown()
+        print(f"provider down: {api.counts[503]} requests sent for 10 calls, {rejected} rejected by the "
+              f"open circuit in {time.perf_counter() - start:.2f} s")
+
+# === Place discovery: paginated SerpAPI pages ===
+def bench_serp_discovery(target=120, latency=0.3, concurrency=(1, 2, 4, 6)):
+    """Wall time to discover `target` places from a fake SerpAPI with `latency`
+    seconds per page, by page-fetch concurrency"""
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+    import json
+    import serp
+    import rate_limit
+
+    connections = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def setup(self):
+            super().setup()
+            connections.append(1)
+
+        def do_GET(self):
+            time.sleep(latency)
+            start = int(parse_qs(urlparse(self.path).query).get("start", ["0"])[0])
+            # Neighbouring pages overlap by one place, as Maps pages sometimes do
+            results = [{"title": f"Place {i}", "place_id": f"ChIJ{i:06d}", "reviews": 10}
+                       for i in range(max(0, start - 1), min(start + 20, 130))]
+            body = json.dumps({"local_results": results}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original = serp.SERPAPI_URL, serp.SERP_CONCURRENCY, rate_limit._limiters.get("serpapi")
+    serp.SERPAPI_URL = f"http://127.0.0.1:{server.server_address[1]}/search.json"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"{'pages at once':>14} {'places':>7} {'seconds':>8} {'new conns':>12}")
+            for n in concurrency:
+                serp.SERP_CONCURRENCY = n
+                # Fresh, effectively unthrottled limiter per run: the shared serpapi
+                # bucket would carry tokens (and breaker state) between runs
+                rate_limit._limiters["serpapi"] = rate_limit.ProviderLimiter(
+                    "serpapi", 60_000, max_concurrency=n, path=os.path.join(tmp, f"limits_{n}.sqlite"))
+                connections.clear()
+                places, elapsed = _timed(serp.get_places_from_google_maps, "Pune", "cafes", max_places=target)
+                assert len({p["source_url"] for p in places}) == len(places)
+                print(f"{n:>14} {len(places):>7} {elapsed:>8.2f} {len(connections):>12}")
+    finally:
+        serp.SERPAPI_URL, serp.SERP_CONCURRENCY, limiter = original
+        if limiter is None:
+            rate_limit._limiters.pop("serpapi", None)
+        else:
+            rate_limit._limiters["serpapi"] = limiter
+        server.shutdown()
+
+BENCHMARKS = {
+    "query-concurrency": bench_query_concurrency,
+    "browser-pool": bench_browser_pool,
+    "dom-extraction": bench_dom_extraction,
+    "route-profile": bench_route_profile,
+    "docstore-format": bench_docstore_format,
+    "place-ranking": bench_place_ranking,
+    "ann-index": bench_ann_index,
+    "cold-start": bench_cold_start,
+    "rate-limit": bench_rate_limit,
+    "serp-discovery": bench_serp_discovery,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"\n=== {name} ===")
+        BENCHMARKS[name]()
@@ -0,0 +1,247 @@
+import os
+import atexit
+import threading
+from multiprocessing import util as mp_util
+import asyncio
+from contextlib import contextmanager, asynccontextmanager
+from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+from routing import default_route_profile
+
+# Configuration
+POOL_SIZE = int(os.getenv("VIBE_BROWSER_POOL_SIZE", "2"))
+PAGES_PER_BROWSER = int(os.getenv("VIBE_PAGES_PER_BROWSER", "50"))
+
+class _PooledBrowser:
+    def __init__(self, playwright, launch_kwargs):
+        self.browser = playwright.chromium.launch(**launch_kwargs)
+        self.pages_served = 0
+
+    @property
+    def alive(self):
+        return self.browser.is_connected()
+
+    def close(self):
+        try:
+            self.browser.close()
+        except Exception:
+            pass
+
+class BrowserPool:
+    """Keeps a few headless Chromium instances warm and hands out one fresh
+    context per place.
+
+    A browser is relaunched after serving `pages_per_browser` contexts or when
+    it has disconnected (crashed). Playwright's sync API is bound to the thread
+    that started it, so each thread/process should use its own pool; see
+    `get_browser_pool()`. Every context gets `route_profile` installed
+    (defaults to `routing.default_route_profile()`).
+    """
+
+    def __init__(self, size=POOL_SIZE, pages_per_browser=PAGES_PER_BROWSER, headless=True, route_profile=None):
+        self.size = size
+        self.pages_per_browser = pages_per_browser
+        self.launch_kwargs = {"headless": headless}
+        self.route_profile = route_profile if route_profile is not None else default_route_profile()
+        self._playwright = None
+        self._browsers = []
+        self._next = 0
+        self.launches = 0
+        self.recycles = 0
+
+    def start(self):
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        return self
+
+    def _launch(self):
+        self.launches += 1
+        return _PooledBrowser(self._playwright, self.launch_kwargs)
+
+    def _acquire_browser(self):
+        self.start()
+        if len(self._browsers) < self.size:
+            pooled = self._launch()
+            self._browsers.append(pooled)
+            return pooled
+
+        slot = self._next % self.size
+        self._next += 1
+        pooled = self._browsers[slot]
+        if not pooled.alive or pooled.pages_served >= self.pages_per_browser:
+            pooled.close()
+            pooled = self._browsers[slot] = self._launch()
+            self.recycles += 1
+        return pooled
+
+    @contextmanager
+    def context(self, **context_kwargs):
+        """Yield an isolated BrowserContext that is closed afterwards"""
+        pooled = self._acquire_browser()
+        try:
+            context = pooled.browser.new_context(**context_kwargs)
+        except Exception:
+            # Browser died between health check and use: replace it once
+            pooled.close()
+            self._browsers.remove(pooled)
+            pooled = self._acquire_browser()
+            context = pooled.browser.new_context(**context_kwargs)
+        pooled.pages_served += 1
+        if self.route_profile:
+            self.route_profile.apply(context)
+        try:
+            yield context
+        finally:
+            try:
+                context.close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def page(self, **context_kwargs):
+        """Yield a page in its own fresh context"""
+        with self.context(**context_kwargs) as context:
+            yield context.new_page()
+
+    def close(self):
+        for pooled in self._browsers:
+            pooled.close()
+        self._browsers = []
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    def stats(self):
+        return {
+            "browsers": len(self._browsers),
+            "launches": self.launches,
+            "recycles": self.recycles,
+            "pages_served": sum(b.pages_served for b in self._browsers),
+            "routing": self.route_profile.stats() if self.route_profile else None,
+        }
+
+class AsyncBrowserPool:
+    """async_playwright counterpart of BrowserPool for the asyncio scrape engine.
+
+    All coroutines on one event loop share it; contexts are spread round-robin
+    over `size` browsers with the same recycle-after-N / relaunch-on-crash rules.
+    """
+
+    def __init__(self, size=POOL_SIZE, pages_per_browser=PAGES_PER_BROWSER, headless=True, route_profile=None):
+        self.size = size
+        self.pages_per_browser = pages_per_browser
+        self.launch_kwargs = {"headless": headless}
+        self.route_profile = route_profile if route_profile is not None else default_route_profile()
+        self._playwright = None
+        self._browsers = []  # [browser, contexts_served]
+        self._retired = []  # recycled browsers that still had open contexts
+        self._next = 0
+        self._lock = asyncio.Lock()
+        self.launches = 0
+        self.recycles = 0
+
+    async def __aenter__(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _launch(self):
+        self.launches += 1
+        return [await self._playwright.chromium.launch(**self.launch_kwargs), 0]
+
+    async def _acquire_browser(self):
+        async with self._lock:
+            if len(self._browsers) < self.size:
+                entry = await self._launch()
+                self._browsers.append(entry)
+                return entry
+
+            slot = self._next % self.size
+            self._next += 1
+            entry = self._browsers[slot]
+            if not entry[0].is_connected() or entry[1] >= self.pages_per_browser:
+                # Contexts still open on the old browser die with it; only
+                # recycle browsers that have gone idle or crashed.
+                old = entry[0]
+                entry = self._browsers[slot] = await self._launch()
+                self.recycles += 1
+                if old.contexts:
+                    self._retired.append(old)
+                else:
+                    await old.close()
+            return entry
+
+    @asynccontextmanager
+    async def context(self, **context_kwargs):
+        """Yield an isolated BrowserContext that is closed afterwards"""
+        entry = await self._acquire_browser()
+        browser = entry[0]
+        context = await browser.new_context(**context_kwargs)
+        entry[1] += 1
+        if self.route_profile:
+            await self.route_profile.apply_async(context)
+        try:
+            yield context
+        finally:
+            try:
+                await context.close()
+            except Exception:
+                pass
+            if browser in self._retired and not browser.contexts:
+                self._retired.remove(browser)
+                await browser.close()
+
+    @asynccontextmanager
+    async def page(self, **context_kwargs):
+        """Yield a page in its own fresh context"""
+        async with self.context(**context_kwargs) as context:
+            yield await context.new_page()
+
+    async def close(self):
+        for browser in [b for b, _ in self._browsers] + self._retired:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+        self._retired = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def stats(self):
+        return {
+            "browsers": len(self._browsers),
+            "launches": self.launches,
+            "recycles": self.recycles,
+            "pages_served": sum(served for _, served in self._browsers),
+            "routing": self.route_profile.stats() if self.route_profile else None,
+        }
+
+_local = threading.local()
+
+def get_browser_pool():
+    """Return this thread's shared BrowserPool, creating it on first use.
+
+    Multiprocessing workers each get their own pool, which then stays warm
+    for every place that worker handles.
+    """
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = _local.pool = BrowserPool()
+        # Pool workers skip atexit, but run multiprocessing finalizers on a clean exit
+        atexit.register(pool.close)
+        mp_util.Finalize(pool, pool.close, exitpriority=10)
+    return pool
+
+def close_browser_pool():
+    pool = getattr(_local, "pool", None)
+    if pool is not None:
+        pool.close()
+        _local.pool = None
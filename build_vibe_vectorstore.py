@@ -1,6 +1,10 @@
 import os
 import json
 import re
+import shutil
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -9,17 +13,44 @@ from finalPDFmaster import (
     create_embeddings,
     create_vector_store,
     save_vector_store,
+    load_vector_store,
     configure_environment
 )
+from vibe_store import (
+    store_path,
+    live_store_dir,
+    new_store_dir,
+    publish_store_dir,
+    place_key,
+    place_content_hash,
+    chunk_ids_for,
+    empty_manifest,
+    load_manifest,
+    save_manifest,
+    place_unchanged,
+    place_record,
+    file_hash,
+    save_place_table,
+    PlaceTable,
+    DOCSTORE_FORMAT
+)
+from llm_cache import cached_generate, LLMParseError
+from tag_index import TagIndex
+from ann_index import INDEX_FACTORY, supports_removal, stores_exact_vectors, to_flat, retrain_index
+from place_records import PlaceRecordWriter, iter_place_records, tagged_output_path, batched
+from lazy_store import export_docstore
+from metrics import span, timed, inc, bind_trace
 
 # === Tag Classification ===
-def extract_vibe_tags(name, city, reviews):
-    combined_text = "\n".join([r["text"] for r in reviews])
+TAGGING_MODEL = "gemini-2.5-flash"
+TAG_CONCURRENCY = int(os.getenv("VIBE_TAG_CONCURRENCY", "4"))
+TAG_BATCH_SIZE = int(os.getenv("VIBE_TAG_BATCH_SIZE", "1"))  # places per prompt
+BUILD_BATCH_PLACES = int(os.getenv("VIBE_BUILD_BATCH_PLACES", "8"))  # places tagged/embedded per step
 
-    prompt = f"""
+TAG_INSTRUCTIONS = """
 You are a vibe classifier for city locations such as cafes, restaurants, gyms, etc.
 
-Given the following reviews for a place called "{name}" in {city}, extract 3–6 vibe-related tags that best describe the experience of the location.
+{task}
 
 Use lowercase, dash-separated words.
 
@@ -27,96 +58,343 @@ Only choose tags from a consistent predefined set that applies across all catego
 
 Examples of valid tags: "budget-friendly", "aesthetic", "lively", "quiet", "family-friendly", "cozy", "spacious", "premium", "crowded", "peaceful", "healthy-options", "music", "zumba", "yoga", "late-night", "outdoor-seating", "fast-service", "pet-friendly", "romantic", "group-friendly", "modern", "traditional", "luxury", "noisy", "clean".
 
-Only output the tags in the form of a JSON list.
+{output_format}
+"""
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_tagging_model():
+    """One shared GenerativeModel for all tagging calls"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = genai.GenerativeModel(TAGGING_MODEL)
+        return _model
+
+def _strip_code_fence(raw):
+    raw = re.sub(r"^```(json)?", "", raw.strip()).strip()
+    return re.sub(r"```$", "", raw).strip()
+
+def _parse_tag_list(raw):
+    tags = json.loads(_strip_code_fence(raw))
+    if not isinstance(tags, list):
+        raise ValueError("expected a JSON list of tags")
+    return tags
+
+def _parse_tag_map(raw):
+    parsed = json.loads(_strip_code_fence(raw))
+    if not isinstance(parsed, dict):
+        raise ValueError("expected a JSON object of place tags")
+    return {name: tags for name, tags in parsed.items() if isinstance(tags, list)}
+
+def extract_vibe_tags(name, city, reviews):
+    """Tags for one place, or None if the model's answer could not be parsed"""
+    combined_text = "\n".join([r["text"] for r in reviews])
 
+    prompt = TAG_INSTRUCTIONS.format(
+        task=f'Given the following reviews for a place called "{name}" in {city}, extract 3–6 vibe-related tags that best describe the experience of the location.',
+        output_format="Only output the tags in the form of a JSON list.",
+    ) + f"""
 Reviews:
 {combined_text}
 """
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt)
+    try:
+        return cached_generate(get_tagging_model(), TAGGING_MODEL, prompt, _parse_tag_list)
+    except LLMParseError as e:
+        print(f"[!] Failed to parse tags for {name}. Raw:\n{e.raw}")
+    return None
 
-    raw = response.text.strip()
-    raw = re.sub(r"^```(json)?", "", raw).strip()
-    raw = re.sub(r"```$", "", raw).strip()
+def extract_vibe_tags_batch(batch, city):
+    """Tag several places with one prompt.
 
+    `batch` is a list of (name, reviews). Returns {name: tags}; places the
+    model skipped or answered with something other than a list are missing.
+    """
+    sections = "\n\n".join(
+        f"### {name}\n" + "\n".join(r["text"] for r in reviews)
+        for name, reviews in batch
+    )
+    prompt = TAG_INSTRUCTIONS.format(
+        task=f"Below are reviews for {len(batch)} places in {city}, each under a '### <place name>' heading. For every place, extract 3–6 vibe-related tags that best describe the experience of that location.",
+        output_format="Only output a JSON object mapping each place name exactly as written in its heading to its JSON list of tags.",
+    ) + f"""
+Reviews:
+{sections}
+"""
     try:
-        tags = json.loads(raw)
-        if isinstance(tags, list):
-            return tags
-    except Exception as e:
-        print(f"[!] Failed to parse tags for {name}. Raw:\n{response.text}")
-    return []
+        return cached_generate(get_tagging_model(), TAGGING_MODEL, prompt, _parse_tag_map)
+    except LLMParseError:
+        print(f"[!] Failed to parse batched tags for {len(batch)} places")
+        return {}
+
+def tag_places(places, city, concurrency=TAG_CONCURRENCY, batch_size=TAG_BATCH_SIZE):
+    """Tag many places concurrently; calls go through the shared Gemini rate limit.
+
+    `places` is a list of (name, reviews). With batch_size > 1, places are
+    packed into one prompt per batch; any place missing from a batch answer is
+    retried on its own. Returns {name: tags}, with None for places whose
+    tagging failed (errors, an open circuit breaker or unparseable answers).
+    """
+    def tag_one(name, reviews):
+        try:
+            return extract_vibe_tags(name, city, reviews)
+        except Exception as e:
+            print(f"[!] Tagging failed for {name}: {e}")
+            return None
+
+    def tag_batch(batch):
+        if len(batch) == 1:
+            name, reviews = batch[0]
+            return {name: tag_one(name, reviews)}
+        try:
+            tags = extract_vibe_tags_batch(batch, city)
+        except Exception as e:
+            print(f"[!] Batched tagging failed: {e}")
+            tags = {}
+        for name, reviews in batch:
+            if name not in tags:
+                print(f"[!] No batched tags for {name}, tagging it alone")
+                tags[name] = tag_one(name, reviews)
+        return tags
+
+    batches = [places[i:i + max(1, batch_size)] for i in range(0, len(places), max(1, batch_size))]
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for tags in pool.map(bind_trace(tag_batch), batches):
+            results.update(tags)
+    failed = sum(tags is None for tags in results.values())
+    print(f"[✓] Tagged {len(results) - failed} places in {len(batches)} LLM batches"
+          + (f", {failed} failed" if failed else ""))
+    return results
 
 # === Step 1: Load JSON and classify ===
-def load_reviews_and_tag(json_path, save_tagged_json=True):
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    docs = []
-    for place in data:
-        name = place["name"]
-        city = place.get("city", "unknown city")
-
-        google_reviews = place.get("google_reviews", [])
-        reddit_reviews = [
-            {"text": c["text"], "author": c.get("author", "Anonymous")}
-            for thread in place.get("reddit_comments", [])
-            for c in thread.get("all_comments", [])
-        ]
-        all_reviews = google_reviews + reddit_reviews
-
-        # 🔹 Get tags from Gemini
-        tags = extract_vibe_tags(name, city, all_reviews)
-        place["tags"] = tags
-
-        # 🔹 Create FAISS documents
-        for r in all_reviews:
-            docs.append(Document(
-                page_content=r["text"],
-                metadata={
-                    "source": name,
-                    "city": city,
-                    "tags": tags,
-                    "author": r.get("author", "Anonymous"),
-                    "address": place.get("address"),
-                    "rating": place.get("rating"),
-                    "reviews_count": place.get("reviews_count"),
-                    "coordinates": place.get("coordinates"),
-                    "url": f"https://www.google.com/maps/place/?q=place_id:{place.get('source_url')}"
-                }
-            ))
+def place_reviews(place):
+    google_reviews = [
+        {"text": r["text"], "author": r.get("author", "Anonymous"), "origin": "google"}
+        for r in place.get("google_reviews", [])
+    ]
+    reddit_reviews = [
+        {"text": c["text"], "author": c.get("author", "Anonymous"), "origin": "reddit"}
+        for thread in place.get("reddit_comments", [])
+        for c in thread.get("all_comments", [])
+    ]
+    return google_reviews + reddit_reviews
 
-    # 🔹 Save the updated JSON
-    if save_tagged_json:
-        tagged_path = os.path.splitext(json_path)[0] + "_tagged.json"
-        with open(tagged_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"[💾] Tagged JSON saved to {tagged_path}")
+def place_documents(place, reviews, tags):
+    # Compact chunk metadata: place fields are joined from places.json at query time
+    key = place_key(place)
+    return [
+        Document(
+            page_content=r["text"],
+            metadata={"place_id": key, "author": r.get("author", "Anonymous"), "origin": r["origin"]}
+        )
+        for r in reviews
+    ]
 
-    return docs
+@timed("tagging")
+def tag_batch_of_places(places, city):
+    """Tag a batch of places in place, concurrently and rate limited.
 
-# === Step 2: Chunking ===
-def chunk_documents(documents, chunk_size=600, chunk_overlap=150):
+    Returns the places whose tagging failed; they get empty tags for now.
+    """
+    tags_by_name = tag_places([(place["name"], place_reviews(place)) for place in places], city)
+    failed = []
+    for place in places:
+        tags = tags_by_name.get(place["name"])
+        if tags is None:
+            failed.append(place)
+        place["tags"] = tags or []
+    return failed
+
+def chunk_documents(documents, chunk_size=600, chunk_overlap=150, verbose=True):
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     chunks = splitter.split_documents(documents)
 
     for chunk in chunks:
         chunk.page_content = clean_text(chunk.page_content)
 
-    print(f"[✓] Prepared {len(chunks)} chunks")
+    if verbose:
+        print(f"[✓] Prepared {len(chunks)} chunks")
     return chunks
 
+# === Step 3: Incremental, per-place store update ===
+def reembedded_flat_index(vectorstore):
+    """Flat index of a quantized store's chunks, embedded again in row order.
+
+    Quantized vectors (PQ) only approximate the originals, so retraining on
+    them would lose recall on every update; the chunk embedding cache makes
+    this cheap.
+    """
+    import faiss
+    import numpy as np
+
+    index = vectorstore.index
+    texts = [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[row]).page_content
+        for row in range(index.ntotal)
+    ]
+    vectors = np.asarray(vectorstore.embedding_function.embed_documents(texts), dtype=np.float32)
+    if getattr(vectorstore, "_normalize_L2", False):
+        faiss.normalize_L2(vectors)
+    flat = faiss.IndexFlatL2(index.d)
+    if len(vectors):
+        flat.add(vectors)
+    return flat
+
+def update_place_store(places, city, category, source_path):
+    """Bring the (city, category) store in line with freshly scraped places.
+
+    `places` can be any iterable, including a generator fed by the scraper:
+    places are tagged, chunked and embedded BUILD_BATCH_PLACES at a time as
+    they arrive, so memory stays bounded however many places a city has.
+    Only new or changed places are tagged and embedded; their old vectors
+    and docstore entries are replaced by ID, and places that did not come
+    back are deleted at the end. Unchanged places keep their vectors and tags,
+    except places whose tagging failed last time, which are tagged again.
+    """
+    path = store_path(city, category)
+    live_dir = live_store_dir(path)
+    manifest = load_manifest(live_dir, city, category)
+    embedding_model = create_embeddings([])
+    model_name = getattr(embedding_model, "model_name", None)
+
+    index_exists = os.path.exists(os.path.join(live_dir, "index.faiss"))
+    if (not index_exists or manifest["embedding_model"] != model_name
+            or manifest.get("docstore_format") != DOCSTORE_FORMAT
+            or manifest.get("index_factory", "flat") != INDEX_FACTORY):
+        manifest = empty_manifest(city, category)  # full rebuild
+    known = manifest["places"]
+
+    # Stores are updated as a flat index and retrained at the end when the
+    # configured type needs training data or cannot delete vectors (HNSW, IVF)
+    vectorstore, retrain = None, manifest["version"] == 0
+    if not retrain:
+        vectorstore = load_vector_store(live_dir, embedding_model, mode="eager")
+        if not supports_removal(vectorstore.index):
+            if stores_exact_vectors(vectorstore.index):
+                vectorstore.index = to_flat(vectorstore.index)
+            else:
+                vectorstore.index = reembedded_flat_index(vectorstore)
+            retrain = True
+
+    seen, records = set(), []
+    counts = {"changed": 0, "unchanged": 0, "chunks": 0, "stale": 0}
+    tagged = PlaceRecordWriter(tagged_output_path(source_path))
+    try:
+        for batch in batched(places, BUILD_BATCH_PLACES):
+            changed, untagged = [], set()
+            for place in batch:
+                seen.add(place_key(place))
+                if place_unchanged(place, manifest) and known[place_key(place)].get("tags_ok", True):
+                    place["tags"] = known[place_key(place)]["tags"]  # reuse stored tags
+                else:
+                    changed.append(place)
+            if changed:
+                untagged = {place_key(place) for place in tag_batch_of_places(changed, city)}
+
+            # 🔹 Chunks for changed places, with deterministic per-place IDs
+            stale_ids, new_chunks, new_ids = [], [], []
+            for place in changed:
+                key = place_key(place)
+                if key in known:
+                    stale_ids.extend(known[key]["chunk_ids"])
+                with span("chunking"):
+                    chunks = chunk_documents(place_documents(place, place_reviews(place), place["tags"]), verbose=False)
+                ids = chunk_ids_for(key, chunks)
+                new_chunks.extend(chunks)
+                new_ids.extend(ids)
+                known[key] = {
+                    "name": place["name"],
+                    "content_hash": place_content_hash(place),
+                    "tags": place["tags"],
+                    "tags_ok": key not in untagged,  # failed tagging is retried on the next update
+                    "chunk_ids": ids,
+                }
+
+            if stale_ids:
+                vectorstore.delete(stale_ids)
+            if new_chunks:
+                with span("embedding"):
+                    if vectorstore is None:
+                        vectorstore = create_vector_store(new_chunks, embedding_model, ids=new_ids, index_factory="flat")
+                    else:
+                        vectorstore.add_documents(new_chunks, ids=new_ids)
+            inc("vibe_places_indexed_total", len(changed), help="Places tagged and embedded", result="changed")
+            inc("vibe_places_indexed_total", len(batch) - len(changed), help="Places tagged and embedded",
+                result="unchanged")
+            inc("vibe_chunks_embedded_total", len(new_chunks), help="Chunks added to vectorstores")
+
+            for place in batch:
+                tagged.write(place)
+                records.append(place_record(place))
+            counts["changed"] += len(changed)
+            counts["unchanged"] += len(batch) - len(changed)
+            counts["chunks"] += len(new_chunks)
+            counts["stale"] += len(stale_ids)
+            print(f"[✓] Indexed {len(records)} places so far ({len(new_chunks)} new chunks in this batch)")
+    except BaseException:
+        tagged.close(commit=False)
+        raise
+    tagged.close()
+
+    removed = [key for key in known if key not in seen]
+    stale_ids = [cid for key in removed for cid in known.pop(key)["chunk_ids"]]
+    if stale_ids:
+        vectorstore.delete(stale_ids)
+    print(f"[⚙️] {counts['changed']} new/changed, {counts['unchanged']} unchanged, {len(removed)} removed places; "
+          f"{counts['chunks']} chunks added, {counts['stale'] + len(stale_ids)} replaced/deleted")
+
+    if vectorstore is None or not vectorstore.index.ntotal:
+        print("[✗] No reviews to index")
+        return None
+    if retrain and INDEX_FACTORY.lower() != "flat":
+        with span("index_train"):
+            vectorstore.index = retrain_index(vectorstore.index, INDEX_FACTORY)
+
+    manifest["version"] += 1
+    manifest["source_hash"] = file_hash(source_path)
+    manifest["embedding_model"] = model_name
+    manifest["index_factory"] = INDEX_FACTORY
+    # Every file goes into a new version directory that is published in one step
+    with span("store_save"):
+        version_dir = new_store_dir(path, manifest["version"])
+        try:
+            save_vector_store(vectorstore, version_dir)
+            export_docstore(vectorstore, version_dir)
+            save_place_table(version_dir, records)
+            # FAISS rows shift on delete, so the tag bitmaps are rebuilt from the final index
+            TagIndex.build(vectorstore, PlaceTable(records)).save(version_dir)
+            save_manifest(version_dir, manifest)
+        except BaseException:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+        publish_store_dir(path, version_dir)
+    print(f"[✓] Store {path} at version {manifest['version']} ({vectorstore.index.ntotal} vectors)")
+    return vectorstore
+
 # === Main ===
-def main(input_path=None):
-    VECTOR_STORE_PATH = "vibe_vectorstore"
-    JSON_INPUT_PATH = input_path if input_path else r"C:\Users\Lenovo\Desktop\Jinvaani\solution\Combined Output\gym_pune_combined.json"
-    
+def main(input_path=None, city=None, category=None, places=None):
+    """Update the store from a combined JSONL file, or from `places` (e.g. the
+    scraper's generator) while that file is still being written.
+
+    Returns the updated vectorstore, or None if there was nothing to index.
+    """
+    JSON_INPUT_PATH = input_path if input_path else r"C:\Users\Lenovo\Desktop\Jinvaani\solution\Combined Output\gym_pune_combined.jsonl"
+
     configure_environment()
-    documents = load_reviews_and_tag(JSON_INPUT_PATH)
-    chunks = chunk_documents(documents)
-    embedding_model = create_embeddings(chunks)
-    vectorstore = create_vector_store(chunks, embedding_model)
-    save_vector_store(vectorstore, VECTOR_STORE_PATH)
+    if places is None:
+        places = iter_place_records(JSON_INPUT_PATH)
+    if not city or not category:
+        places = iter(places)
+        first = next(places, None)
+        if first is None:
+            print("[✗] No places in input")
+            return
+        city = city or first.get("city", "unknown city")
+        category = category or first.get("category", "places")
+        places = itertools.chain([first], places)
+    return update_place_store(places, city, category, JSON_INPUT_PATH)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,135 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from metrics import span, inc, bind_trace
+
+# Configuration
+EMBEDDING_CACHE_PATH = os.getenv("VIBE_EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite")
+EMBED_BATCH_SIZE = int(os.getenv("VIBE_EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("VIBE_EMBED_CONCURRENCY", "4"))
+
+def text_key(model_name, text):
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """SQLite store of float32 embedding vectors keyed by hash(model, text)"""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT, dim INTEGER, vector BLOB, created_at REAL)"
+            )
+
+    def _conn(self):
+        # Connections must not cross threads or survive a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, model_name, texts):
+        """Return {text: float32 vector} for the texts that are cached"""
+        keys = {text_key(model_name, text): text for text in texts}
+        found = {}
+        conn = self._conn()
+        key_list = list(keys)
+        for i in range(0, len(key_list), 500):  # stay under SQLite's parameter limit
+            chunk = key_list[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, blob in rows:
+                found[keys[key]] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model_name, vectors):
+        """Store {text: vector}"""
+        now = time.time()
+        rows = []
+        for text, vector in vectors.items():
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((text_key(model_name, text), model_name, vector.shape[0], vector.tobytes(), now))
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def stats(self):
+        entries, stored = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        return {"entries": entries, "bytes": stored}
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends uncached texts to the backend.
+
+    Misses are deduplicated, split into `batch_size` batches and embedded with
+    up to `concurrency` requests in flight, then written back to the cache.
+    """
+
+    def __init__(self, base, model_name, cache=None, batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY):
+        self.base = base
+        self.model_name = model_name
+        self.cache = cache or EmbeddingCache()
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        cached = self.cache.get_many(self.model_name, texts)
+        missing = list(dict.fromkeys(t for t in texts if t not in cached))
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        inc("vibe_embedding_lookups_total", len(texts) - len(missing), help="Chunk embedding cache lookups",
+            result="hit")
+        inc("vibe_embedding_lookups_total", len(missing), help="Chunk embedding cache lookups", result="miss")
+
+        if missing:
+            batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+            embed = bind_trace(self._embed_batch)
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                for batch, vectors in zip(batches, pool.map(embed, batches)):
+                    fresh = dict(zip(batch, vectors))
+                    self.cache.put_many(self.model_name, fresh)
+                    cached.update({t: np.asarray(v, dtype=np.float32) for t, v in fresh.items()})
+            print(f"[✓] Embedded {len(missing)} new chunks in {len(batches)} batches "
+                  f"({len(texts) - len(missing)} from cache)")
+        else:
+            print(f"[✓] All {len(texts)} chunk embeddings served from cache")
+
+        return [cached[t].tolist() for t in texts]
+
+    def _embed_batch(self, texts):
+        with span("embed_api", kind="documents"):
+            return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        with span("embed_api", kind="query"):
+            return self.base.embed_query(text)
+
+    def embed_queries(self, texts):
+        """Embed several queries in one request (query task type, not cached on disk)"""
+        with span("embed_api", kind="queries"):
+            try:
+                return self.base.embed_documents(texts, task_type="retrieval_query")
+            except TypeError:  # backend without task types
+                return [self.base.embed_query(text) for text in texts]
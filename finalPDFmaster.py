@@ -1,13 +1,21 @@
 import os
 import time
-import requests
 import google.generativeai as genai
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
+from embedding_cache import CachedEmbeddings
+from ann_index import INDEX_FACTORY, build_index
+from lazy_store import STORE_LOAD_MODE, load_lazy_store
+from rate_limit import get_limiter
+from http_client import get_session, HTTP_TIMEOUT
+from metrics import record_llm_call
 import re
 
+# Overridable so the limiter can be exercised against a local fake server
+GROQ_API_URL = os.getenv("VIBE_GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+
 # === Utility Functions ===
 def clean_text(text: str) -> str:
     """Clean text by removing lines with excessive symbols/whitespace"""
@@ -44,16 +52,31 @@ def load_and_chunk_pdf(pdf_path: str, chunk_size: int = 800, chunk_overlap: int
     return chunks
 
 # === Vector Store Functions ===
-def create_embeddings(chunks, model_name: str = "models/embedding-001"):
-    """Create embeddings using Gemini model"""
+def create_embeddings(chunks, model_name: str = "models/embedding-001", cache: bool = True):
+    """Create embeddings using Gemini model, backed by the on-disk embedding cache"""
     print("Creating embeddings...")
     embedding_model = GoogleGenerativeAIEmbeddings(model=model_name)
+    if cache:
+        embedding_model = CachedEmbeddings(embedding_model, model_name)
     return embedding_model
 
-def create_vector_store(chunks, embedding_model):
-    """Create and return FAISS vector store"""
+def create_vector_store(chunks, embedding_model, ids=None, index_factory=INDEX_FACTORY):
+    """Create and return FAISS vector store.
+
+    `index_factory` is a preset from ann_index.INDEX_PRESETS or a
+    faiss.index_factory string; ANN indexes are trained on the chunk vectors.
+    """
     print("Creating vector store...")
-    vectorstore = FAISS.from_documents(chunks, embedding_model)
+    if (index_factory or "flat").lower() == "flat":
+        vectorstore = FAISS.from_documents(chunks, embedding_model, ids=ids)
+    else:
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = embedding_model.embed_documents(texts)
+        index = build_index(vectors, index_factory)
+        vectorstore = FAISS(embedding_model, index, InMemoryDocstore(), {})
+        vectorstore.add_embeddings(zip(texts, vectors), metadatas=[chunk.metadata for chunk in chunks], ids=ids)
     print(f"Vector store created with {vectorstore.index.ntotal} embeddings")
     return vectorstore
 
@@ -62,8 +85,18 @@ def save_vector_store(vectorstore, save_path: str):
     vectorstore.save_local(save_path)
     print(f"Vector store saved locally at {save_path}")
 
-def load_vector_store(load_path: str, embedding_model):
-    """Load vector store from disk"""
+def load_vector_store(load_path: str, embedding_model, mode: str = STORE_LOAD_MODE):
+    """Load vector store from disk.
+
+    mode="mmap" memory-maps index.faiss and reads documents lazily from the
+    store's docstore.sqlite (read-only); stores without one, and
+    mode="eager", unpickle everything into RAM.
+    """
+    if mode == "mmap":
+        vectorstore = load_lazy_store(load_path, embedding_model)
+        if vectorstore is not None:
+            print(f"Memory-mapped vector store with {vectorstore.index.ntotal} embeddings")
+            return vectorstore
     vectorstore = FAISS.load_local(load_path, embedding_model, allow_dangerous_deserialization=True)
     print(f"Loaded vector store with {vectorstore.index.ntotal} embeddings")
     return vectorstore
@@ -83,13 +116,16 @@ def call_groq_llm(prompt: str, groq_api_key: str, model: str = "deepseek-r1-dist
         ]
     }
 
-    response = requests.post("https://api.groq.com/openai/v1/chat/completions", 
-                           json=payload, 
-                           headers=headers)
+    response = get_limiter("groq").call(
+        get_session().post, GROQ_API_URL, json=payload, headers=headers, timeout=HTTP_TIMEOUT
+    )
     if response.status_code != 200:
         raise Exception(f"Groq LLM error: {response.status_code} - {response.text}")
-    
-    return response.json()["choices"][0]["message"]["content"]
+
+    data = response.json()
+    usage = data.get("usage", {})
+    record_llm_call(model, False, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+    return data["choices"][0]["message"]["content"]
 
 def expand_query_with_llm(query: str, groq_api_key: str):
     """Expand short queries using LLM"""
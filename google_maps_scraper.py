@@ -1,83 +1,180 @@
 import os
 import json
-import time
 from datetime import datetime
-from playwright.sync_api import sync_playwright
-
-def scrape_google_maps_reviews(place_id, max_reviews=20, output_file=None):
+from browser_pool import get_browser_pool, AsyncBrowserPool
+from scrolling import scroll_until_loaded, scroll_until_loaded_async
+from metrics import timed, inc
+
+REVIEW_SELECTOR = 'div[data-review-id]'
+REVIEW_ID_ATTRIBUTE = 'data-review-id'  # nested elements of one review share it
+AUTHOR_SELECTOR = 'div[class*="d4r55"]'
+TIME_SELECTOR = 'span[class*="rsqaWe"]'
+TEXT_SELECTOR = 'span[class*="wiI7pd"]'
+REVIEWS_READY_TIMEOUT_MS = 10000
+PAGE_TIMEOUT_MS = 45000
+REVIEWS_TAB_TIMEOUT_MS = 15000
+
+# "evaluate" pulls every review out in one page.evaluate round trip;
+# "locator" is the original per-field Playwright locator path, kept in the
+# sync scraper for comparison; the async scraper always evaluates
+EXTRACTION_MODE = os.getenv("VIBE_EXTRACTION_MODE", "evaluate")
+
+EXTRACT_REVIEWS_JS = """
+([reviewSel, authorSel, timeSel, textSel, maxReviews]) => {
+  const seen = new Set();
+  const reviews = [];
+  for (const el of document.querySelectorAll(reviewSel)) {
+    if (reviews.length >= maxReviews) break;
+    const author = el.querySelector(authorSel);
+    const time = el.querySelector(timeSel);
+    const text = el.querySelector(textSel);
+    if (!author || !time || !text) continue;
+    const review = {author: author.innerText, time: time.innerText, text: text.innerText};
+    const hash = `${review.author}|${review.time}|${review.text}`;
+    if (seen.has(hash)) continue;
+    seen.add(hash);
+    reviews.push(review);
+  }
+  return reviews;
+}
+"""
+
+# === Shared by the sync and async scrapers ===
+# Only the Playwright calls differ between the two; URL building, the
+# extraction script, logging, metrics and saving all live here.
+def _extract_args(max_reviews):
+    return [REVIEW_SELECTOR, AUTHOR_SELECTOR, TIME_SELECTOR, TEXT_SELECTOR, max_reviews]
+
+def _scroll_args(max_reviews):
+    return {"selector": REVIEW_SELECTOR, "target_count": max_reviews, "scroll_container": True,
+            "key_attribute": REVIEW_ID_ATTRIBUTE}
+
+def _place_url(place_id):
+    return f"https://www.google.com/maps/place/?q=place_id:{place_id}"
+
+def _page_loaded():
+    inc("vibe_pages_fetched_total", help="Pages loaded by the scrapers", source="google")
+
+def _no_reviews_tab(error):
+    print("[✗] Failed to click 'Reviews' tab:", error)
+    return []
+
+def _scrolled(result):
+    print(f"[✓] Done scrolling: {result.count} blocks, {result.waited_seconds:.1f}s waiting ({result.reason})")
+
+def _finish_reviews(reviews_data, place_id, output_file=None):
+    """Count and save extracted reviews; returns them"""
+    print(f"[✓] Extracted {len(reviews_data)} unique reviews")
+    inc("vibe_items_scraped_total", len(reviews_data), help="Reviews and comments scraped", source="google")
+
+    # Save to file inside 'Google Reviews' folder
+    os.makedirs("Google Reviews", exist_ok=True)
+    if output_file is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = f"Google Reviews/reviews_{place_id}_{timestamp}.json"
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(reviews_data, f, indent=2, ensure_ascii=False)
+
+    print(f"[💾] Saved to {output_file}")
+    return reviews_data
+
+def _extract_reviews_with_locators(page, max_reviews):
     reviews_data = []
-    url = f"https://www.google.com/maps/place/?q=place_id:{place_id}"
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    review_elements = page.locator(REVIEW_SELECTOR)
+    total_found = review_elements.count()
+    print(f"[✓] Found {total_found} review blocks")
+
+    seen = set()
+    count_added = 0
+
+    for el in review_elements.all():
+        if count_added >= max_reviews:
+            break
+        try:
+            author = el.locator(AUTHOR_SELECTOR).inner_text(timeout=300)
+            time_ago = el.locator(TIME_SELECTOR).inner_text(timeout=300)
+            text = el.locator(TEXT_SELECTOR).inner_text(timeout=300)
+
+            review_hash = f"{author}|{time_ago}|{text}"
+            if review_hash in seen:
+                continue
+            seen.add(review_hash)
+
+            reviews_data.append({
+                "author": author,
+                "time": time_ago,
+                "text": text
+            })
+            count_added += 1
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
+        except Exception as e:
+            print(f"[!] Skipping review due to error: {e}")
+            continue
+    return reviews_data
+
+# === Scrapers ===
+@timed("google_reviews")
+def scrape_google_maps_reviews(place_id, max_reviews=20, output_file=None, pool=None):
+    url = _place_url(place_id)
+
+    # Reuse a warm browser; each place still gets its own isolated context
+    pool = pool or get_browser_pool()
+    with pool.page() as page:
         print(f"[→] Visiting: {url}")
-        page.goto(url, timeout=45000)
-        page.wait_for_timeout(2500)
+        page.goto(url, timeout=PAGE_TIMEOUT_MS)
+        _page_loaded()
 
-        # STEP 1: Click "Reviews" tab
+        # STEP 1: Click "Reviews" tab (click() waits for it to render)
         try:
-            page.get_by_role("tab", name="Reviews").click()
-            page.wait_for_timeout(2000)
+            page.get_by_role("tab", name="Reviews").click(timeout=REVIEWS_TAB_TIMEOUT_MS)
             print("[✓] Clicked on 'Reviews' tab")
         except Exception as e:
-            print("[✗] Failed to click 'Reviews' tab:", e)
-            browser.close()
-            return []
+            return _no_reviews_tab(e)
 
-        # STEP 2: Scroll to load reviews
+        # STEP 2: Scroll the reviews feed until enough reviews are loaded
         print("[→] Scrolling...")
-        for _ in range(3):
-            page.mouse.wheel(0, 4000)
-            time.sleep(0.6)
-        print("[✓] Done scrolling")
+        try:
+            page.wait_for_selector(REVIEW_SELECTOR, timeout=REVIEWS_READY_TIMEOUT_MS)
+        except Exception:
+            print("[!] No reviews rendered")
+        _scrolled(scroll_until_loaded(page, **_scroll_args(max_reviews)))
 
         # STEP 3: Extract reviews
-        review_elements = page.locator('div[data-review-id]')
-        total_found = review_elements.count()
-        print(f"[✓] Found {total_found} review blocks")
-
-        seen = set()
-        count_added = 0
-
-        for el in review_elements.all():
-            if count_added >= max_reviews:
-                break
-            try:
-                author = el.locator('div[class*="d4r55"]').inner_text(timeout=300)
-                time_ago = el.locator('span[class*="rsqaWe"]').inner_text(timeout=300)
-                text = el.locator('span[class*="wiI7pd"]').inner_text(timeout=300)
-
-                review_hash = f"{author}|{time_ago}|{text}"
-                if review_hash in seen:
-                    continue
-                seen.add(review_hash)
-
-                reviews_data.append({
-                    "author": author,
-                    "time": time_ago,
-                    "text": text
-                })
-                count_added += 1
-
-            except Exception as e:
-                print(f"[!] Skipping review due to error: {e}")
-                continue
+        if EXTRACTION_MODE == "evaluate":
+            reviews_data = page.evaluate(EXTRACT_REVIEWS_JS, _extract_args(max_reviews))
+        else:
+            reviews_data = _extract_reviews_with_locators(page, max_reviews)
 
-        print(f"[✓] Extracted {len(reviews_data)} unique reviews")
+    # STEP 4: Save
+    return _finish_reviews(reviews_data, place_id, output_file)
 
-        # STEP 4: Save to file inside 'Google Reviews' folder
-        os.makedirs("Google Reviews", exist_ok=True)
-        if output_file is None:
-            output_file = f"Google Reviews/reviews_{place_id}_{timestamp}.json"
+@timed("google_reviews")
+async def scrape_google_maps_reviews_async(place_id, pool: AsyncBrowserPool, max_reviews=20, output_file=None):
+    """Async Playwright version of scrape_google_maps_reviews for the asyncio engine"""
+    url = _place_url(place_id)
+
+    async with pool.page() as page:
+        print(f"[→] Visiting: {url}")
+        await page.goto(url, timeout=PAGE_TIMEOUT_MS)
+        _page_loaded()
+
+        try:
+            await page.get_by_role("tab", name="Reviews").click(timeout=REVIEWS_TAB_TIMEOUT_MS)
+            print("[✓] Clicked on 'Reviews' tab")
+        except Exception as e:
+            return _no_reviews_tab(e)
+
+        print("[→] Scrolling...")
+        try:
+            await page.wait_for_selector(REVIEW_SELECTOR, timeout=REVIEWS_READY_TIMEOUT_MS)
+        except Exception:
+            print("[!] No reviews rendered")
+        _scrolled(await scroll_until_loaded_async(page, **_scroll_args(max_reviews)))
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(reviews_data, f, indent=2, ensure_ascii=False)
+        reviews_data = await page.evaluate(EXTRACT_REVIEWS_JS, _extract_args(max_reviews))
 
-        print(f"[💾] Saved to {output_file}")
-        browser.close()
-        return reviews_data
+    return _finish_reviews(reviews_data, place_id, output_file)
 
 
 # --- Run for standalone testing ---
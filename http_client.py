@@ -0,0 +1,32 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configuration
+HTTP_POOL_SIZE = int(os.getenv("VIBE_HTTP_POOL_SIZE", "16"))  # keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("VIBE_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("VIBE_HTTP_READ_TIMEOUT", "30"))
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Process-wide requests.Session with a pooled, keep-alive connection per host.
+
+    Retries are left to rate_limit's provider limiters, so the adapter makes
+    one attempt per call. A forked worker gets its own session rather than
+    the parent's sockets.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
@@ -0,0 +1,126 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from store_registry import store_key
+from metrics import start_trace, end_trace, TRACE_ALL
+
+# How many scrape/build jobs may run at once, and how many finished jobs to remember
+MAX_CONCURRENT_JOBS = int(os.getenv("VIBE_MAX_CONCURRENT_JOBS", "2"))
+MAX_FINISHED_JOBS = 200
+
+JOB_STAGES = ("scrape", "build", "load")
+
+class Job:
+    """A background scrape/build/load run for one (city, category)"""
+
+    def __init__(self, city, category):
+        self.id = uuid.uuid4().hex
+        self.city = city
+        self.category = category
+        self.status = "queued"  # queued -> running -> done | failed
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.trace = None  # spans recorded while the job runs
+        self.stages = OrderedDict(
+            (name, {"status": "pending", "started_at": None, "finished_at": None})
+            for name in JOB_STAGES
+        )
+        self._lock = threading.Lock()
+
+    def progress(self, stage, status):
+        """Record a stage transition: 'running', 'done', 'skipped' or 'failed'"""
+        with self._lock:
+            entry = self.stages[stage]
+            entry["status"] = status
+            now = time.time()
+            if status == "running":
+                entry["started_at"] = now
+            else:
+                entry["finished_at"] = now
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "city": self.city,
+                "category": self.category,
+                "status": self.status,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "stages": {name: dict(entry) for name, entry in self.stages.items()},
+                "timings_ms": self.trace.summary() if self.trace else None,
+            }
+
+class JobManager:
+    """Runs `runner(city, category, progress)` on a bounded worker pool.
+
+    Submitting a (city, category) that already has a queued or running job
+    returns that job instead of starting a second one.
+    """
+
+    def __init__(self, runner, max_workers=MAX_CONCURRENT_JOBS, max_finished=MAX_FINISHED_JOBS):
+        self.runner = runner
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vibe-job")
+        self._jobs = OrderedDict()  # job_id -> Job
+        self._active = {}  # store key -> Job
+        self._lock = threading.Lock()
+
+    def submit(self, city, category):
+        """Return (job, created) where created is False if an active job was reused"""
+        key = store_key(city, category)
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None and not active.finished:
+                return active, False
+
+            job = Job(city, category)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._prune()
+
+        self._executor.submit(self._run, key, job)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, key, job):
+        job.status = "running"
+        job.started_at = time.time()
+        job.trace, token = start_trace(f"job {job.category} in {job.city}")
+        try:
+            self.runner(job.city, job.category, job.progress)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            for entry_name, entry in job.stages.items():
+                if entry["status"] == "running":
+                    job.progress(entry_name, "failed")
+        finally:
+            end_trace(token)
+            if TRACE_ALL:
+                job.trace.dump()
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(key) is job:
+                    del self._active[key]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
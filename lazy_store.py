@@ -0,0 +1,105 @@
+import os
+import json
+import sqlite3
+import threading
+
+# Configuration
+STORE_LOAD_MODE = os.getenv("VIBE_STORE_LOAD_MODE", "mmap")  # "mmap" or "eager"
+DOCSTORE_DB_NAME = "docstore.sqlite"
+
+def export_docstore(vectorstore, path):
+    """Write the docstore and row -> docstore ID map next to index.faiss as SQLite.
+
+    index.pkl stays the source of truth for incremental updates; this copy is
+    what mmap-mode loads read from, one document at a time. `path` is a new,
+    unpublished store version (see vibe_store.publish_store_dir).
+    """
+    db_file = os.path.join(path, DOCSTORE_DB_NAME)
+    if os.path.exists(db_file):
+        os.remove(db_file)
+    conn = sqlite3.connect(db_file)
+    with conn:
+        conn.execute("CREATE TABLE docs (id TEXT PRIMARY KEY, page_content TEXT, metadata TEXT)")
+        conn.execute("CREATE TABLE rows (row INTEGER PRIMARY KEY, id TEXT)")
+        conn.executemany(
+            "INSERT INTO docs (id, page_content, metadata) VALUES (?, ?, ?)",
+            ((doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+             for doc_id, doc in vectorstore.docstore._dict.items())
+        )
+        conn.executemany("INSERT INTO rows (row, id) VALUES (?, ?)", vectorstore.index_to_docstore_id.items())
+    conn.close()
+
+class LazyDocstore:
+    """Read-only docstore that fetches each Document from SQLite when asked for it"""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def search(self, search):
+        from langchain_core.documents import Document
+
+        row = self._conn().execute("SELECT page_content, metadata FROM docs WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def metadata_items(self):
+        """(docstore ID, metadata) for every chunk, without reading chunk text"""
+        for doc_id, metadata in self._conn().execute("SELECT id, metadata FROM docs"):
+            yield doc_id, json.loads(metadata)
+
+    def index_to_docstore_id(self):
+        return dict(self._conn().execute("SELECT row, id FROM rows"))
+
+    def add(self, texts):
+        raise RuntimeError("mmap-loaded stores are read-only; load with mode='eager' to update")
+
+    def delete(self, ids):
+        raise RuntimeError("mmap-loaded stores are read-only; load with mode='eager' to update")
+
+def read_index_mmap(index_file):
+    """Open a FAISS index with its vectors memory-mapped read-only.
+
+    Pages come from the OS page cache, so workers on one host share them and
+    a load does not read the file up front.
+    """
+    import faiss
+
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(index_file, flags)
+    except RuntimeError as e:
+        print(f"[!] Could not memory-map {index_file} ({e}), reading it instead")
+        return faiss.read_index(index_file)
+
+def load_lazy_store(path, embedding_model):
+    """FAISS vectorstore over a memory-mapped index and a LazyDocstore, or None
+    if the store was saved without a docstore database"""
+    from langchain_community.vectorstores import FAISS
+
+    db_file = os.path.join(path, DOCSTORE_DB_NAME)
+    if not os.path.exists(db_file):
+        return None
+    docstore = LazyDocstore(db_file)
+    index = read_index_mmap(os.path.join(path, "index.faiss"))
+    return FAISS(embedding_model, index, docstore, docstore.index_to_docstore_id())
+
+def chunk_metadata(vectorstore):
+    """(FAISS row, chunk metadata) pairs; lazy docstores skip the chunk text"""
+    docstore = vectorstore.docstore
+    if hasattr(docstore, "metadata_items"):
+        by_id = dict(docstore.metadata_items())
+        return [(row, by_id.get(doc_id, {})) for row, doc_id in vectorstore.index_to_docstore_id.items()]
+    return [
+        (row, getattr(docstore.search(doc_id), "metadata", {}))
+        for row, doc_id in vectorstore.index_to_docstore_id.items()
+    ]
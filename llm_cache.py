@@ -0,0 +1,207 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+from rate_limit import get_limiter
+from metrics import record_llm_call, record_gemini_usage
+
+# Configuration
+LLM_CACHE_PATH = os.getenv("VIBE_LLM_CACHE_PATH", "cache/llm_cache.sqlite")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("VIBE_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = int(os.getenv("VIBE_LLM_CACHE_MAX_MB", "256"))
+
+def prompt_key(model_name, prompt):
+    """Content address of an LLM call: sha256 over model name and prompt"""
+    return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """On-disk cache of LLM response text keyed by hash(model, prompt).
+
+    Backed by SQLite in WAL mode with one connection per thread and per
+    process, so Flask worker threads and multiprocessing scraper workers can
+    share one file. Entries expire after `ttl_seconds`; when the stored text
+    exceeds `max_bytes` the least recently used entries are dropped.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL_SECONDS, max_mb=LLM_CACHE_MAX_MB):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_mb * 1024 * 1024
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, response TEXT,"
+                " size INTEGER, created_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def _conn(self):
+        # Connections must not cross threads or survive a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, model_name, prompt):
+        """Return the cached response text, or None on a miss or expired entry"""
+        key = prompt_key(model_name, prompt)
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count(False)
+            return None
+        response, created_at = row
+        with conn:
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count(False)
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count(True)
+        return response
+
+    def put(self, model_name, prompt, response):
+        key = prompt_key(model_name, prompt)
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, len(response.encode("utf-8")), now, now),
+            )
+        self._evict(conn)
+
+    def _evict(self, conn):
+        with conn:
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0] - self.max_bytes
+            if excess <= 0:
+                return
+            # Drop least recently used entries until enough bytes are freed
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                victims.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            with self._stats_lock:
+                self.evictions += len(victims)
+
+    def stats(self):
+        entries, stored = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": stored,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Process-wide LLMCache, or None when VIBE_LLM_CACHE=off"""
+    global _cache
+    if os.getenv("VIBE_LLM_CACHE", "on") == "off":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+class LLMParseError(ValueError):
+    """The model answered but the text could not be parsed; `raw` holds it"""
+
+    def __init__(self, raw, cause):
+        super().__init__(f"could not parse LLM response: {cause}")
+        self.raw = raw
+
+def cached_generate(model, model_name, prompt, parse):
+    """Return parse(response text), serving it from the LLM cache when possible.
+
+    Only responses that parse are cached, so a malformed answer is never
+    replayed. Raises LLMParseError when a fresh response fails to parse.
+    """
+    cache = get_llm_cache()
+    if cache is not None:
+        raw = cache.get(model_name, prompt)
+        if raw is not None:
+            try:
+                parsed = parse(raw)
+                record_llm_call(model_name, cached=True)
+                return parsed
+            except Exception:
+                pass
+
+    response = get_limiter("gemini").call(model.generate_content, prompt)
+    record_gemini_usage(model_name, response)
+    raw = response.text
+    try:
+        parsed = parse(raw)
+    except Exception as e:
+        raise LLMParseError(raw, e) from e
+    if cache is not None:
+        cache.put(model_name, prompt, raw)
+    return parsed
+
+def cached_stream(model, model_name, prompt, parse):
+    """Yield the response text in chunks as the model generates it.
+
+    A cached response is yielded in one piece. A streamed response is cached
+    once complete, and only if parse() accepts it; the caller parses the
+    joined text itself.
+    """
+    cache = get_llm_cache()
+    if cache is not None:
+        raw = cache.get(model_name, prompt)
+        if raw is not None:
+            record_llm_call(model_name, cached=True)
+            yield raw
+            return
+
+    parts = []
+    chunk = None
+    # Only opening the stream is retried; a failure mid-answer reaches the caller
+    for chunk in get_limiter("gemini").call(model.generate_content, prompt, stream=True):
+        text = chunk.text
+        parts.append(text)
+        yield text
+
+    record_gemini_usage(model_name, chunk)  # the last chunk carries the usage totals
+    raw = "".join(parts)
+    if cache is not None:
+        try:
+            parse(raw)
+        except Exception:
+            return
+        cache.put(model_name, prompt, raw)
@@ -1,15 +1,36 @@
 import os
 import json
+import queue
+import asyncio
+import threading
 from multiprocessing import Pool
 from serp import get_places_from_google_maps, save_places_to_json
-from google_maps_scraper import scrape_google_maps_reviews
-from reddit_scraper import run_pipeline
+from google_maps_scraper import scrape_google_maps_reviews, scrape_google_maps_reviews_async
+from reddit_scraper import run_pipeline, run_pipeline_async
+from browser_pool import AsyncBrowserPool
+from scrape_ledger import ScrapeLedger, SOURCES
+from vibe_store import place_key, namespace
+from place_records import PlaceRecordWriter, combined_output_path, sanitize
+from metrics import bind_trace
 from datetime import datetime
 
+# "async" overlaps Google and Reddit scraping in one event loop;
+# "process" keeps the old two-stage multiprocessing.Pool path
+SCRAPE_ENGINE = os.getenv("VIBE_SCRAPE_ENGINE", "async")
+GOOGLE_CONCURRENCY = int(os.getenv("VIBE_GOOGLE_CONCURRENCY", "4"))
+REDDIT_CONCURRENCY = int(os.getenv("VIBE_REDDIT_CONCURRENCY", "3"))
+# Places discovered and scraped per city/category. Kept at 3 because every
+# place costs a Playwright Maps session plus Reddit and Gemini calls; SerpAPI
+# returns 20 places per page, so paginated discovery only kicks in when this
+# is raised above 20 (see benchmarks.py serp-discovery)
+MAX_PLACES = int(os.getenv("VIBE_MAX_PLACES", "3"))
+
+ENTRY_FIELDS = {"google": "google_reviews", "reddit": "reddit_comments"}
+
 def scrape_google_reviews(place):
     try:
         print(f"Starting Google Maps scraping for: {place['name']}")
-        output_file = f"Google Reviews/reviews_{place['name'].replace(' ', '_')}.json"
+        output_file = _google_output_file(place)
         reviews = scrape_google_maps_reviews(
             place['source_url'],
             max_reviews=20,
@@ -18,13 +39,14 @@ def scrape_google_reviews(place):
         print(f"Completed Google Maps scraping for: {place['name']}")
         return {
             "name": place['name'],
+            "key": place_key(place),
             "success": True,
             "reviews": reviews,
             "output_file": output_file
         }
     except Exception as e:
         print(f"Error in Google Maps scraping for {place['name']}: {e}")
-        return {"name": place['name'], "success": False, "error": str(e)}
+        return {"name": place['name'], "key": place_key(place), "success": False, "error": str(e)}
 
 def scrape_reddit(args):
     place, city = args
@@ -33,31 +55,224 @@ def scrape_reddit(args):
         query = f"{place['name']} {city}"
         output_file = run_pipeline(query)
         print(f"Completed Reddit scraping for: {place['name']}")
-        return {"name": place['name'], "success": True, "output_file": output_file}
+        return {"name": place['name'], "key": place_key(place), "success": True, "output_file": output_file}
     except Exception as e:
         print(f"Error in Reddit scraping for {place['name']}: {e}")
-        return {"name": place['name'], "success": False, "error": str(e)}
-
-def sanitize_string(obj):
-    if isinstance(obj, str):
-        return obj.encode('utf-8', errors='replace').decode('utf-8')
-    elif isinstance(obj, list):
-        return [sanitize_string(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {sanitize_string(k): sanitize_string(v) for k, v in obj.items()}
-    return obj
-
-def main(city=None, category=None):
-    if isinstance(city, tuple):  # Handle Flask's argument passing
-        city, category = city
-    if not city or not category:
-        city = input("Enter the city name: ").strip()
-        category = input("Enter the category: ").strip()
+        return {"name": place['name'], "key": place_key(place), "success": False, "error": str(e)}
+
+def _google_output_file(place):
+    """Review file for one place; keyed by place_id and city/category so same-named places don't collide"""
+    key = "".join(c if c.isalnum() or c in "-_" else "_" for c in place_key(place))
+    return f"Google Reviews/reviews_{namespace(place['city'], place['category'])}_{key}.json"
+
+async def scrape_google_reviews_async(place, pool, limit):
+    async with limit:
+        try:
+            print(f"Starting Google Maps scraping for: {place['name']}")
+            output_file = _google_output_file(place)
+            reviews = await scrape_google_maps_reviews_async(
+                place['source_url'], pool, max_reviews=20, output_file=output_file
+            )
+            print(f"Completed Google Maps scraping for: {place['name']}")
+            return {"name": place['name'], "key": place_key(place), "success": True, "reviews": reviews, "output_file": output_file}
+        except Exception as e:
+            print(f"Error in Google Maps scraping for {place['name']}: {e}")
+            return {"name": place['name'], "key": place_key(place), "success": False, "error": str(e)}
+
+async def scrape_reddit_async(place, city, pool, limit):
+    async with limit:
+        try:
+            print(f"Starting Reddit scraping for: {place['name']}")
+            output_file = await run_pipeline_async(f"{place['name']} {city}", pool)
+            print(f"Completed Reddit scraping for: {place['name']}")
+            return {"name": place['name'], "key": place_key(place), "success": True, "output_file": output_file}
+        except Exception as e:
+            print(f"Error in Reddit scraping for {place['name']}: {e}")
+            return {"name": place['name'], "key": place_key(place), "success": False, "error": str(e)}
+
+def load_reddit_comments(reddit_data, name):
+    if not reddit_data or not reddit_data.get("output_file"):
+        return []
+    try:
+        with open(reddit_data['output_file'], 'r', encoding='utf-8', errors='replace') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading Reddit comments for {name}: {e}")
+        return []
+
+def plan_scrape(places, ledger=None):
+    """Prefill entries from the ledger and list what still has to be scraped.
 
+    Returns (entries, todo): entries by place_key with every fresh source
+    already filled in, and {source: [places]} for stale or missing sources.
+    """
+    entries = {place_key(place): {**sanitize(place), "google_reviews": [], "reddit_comments": []} for place in places}
+    todo = {source: [] for source in SOURCES}
+    for place in places:
+        for source in SOURCES:
+            if ledger is not None and not ledger.is_stale(place, source):
+                data = ledger.load_output(place, source)
+                if data is not None:
+                    entries[place_key(place)][ENTRY_FIELDS[source]] = data
+                    continue
+            todo[source].append(place)
+    if ledger is not None:
+        reused = len(places) * len(SOURCES) - sum(len(v) for v in todo.values())
+        print(f"[✓] Ledger: reusing {reused} fresh place/source results, "
+              f"scraping {len(todo['google'])} Google + {len(todo['reddit'])} Reddit")
+    return entries, todo
+
+def merge_result(entries, places_by_key, result, source, ledger=None):
+    """Fold one finished scrape into its entry and record it in the ledger"""
+    if not result['success']:
+        return
+    key = result['key']
+    if source == "google":
+        data = sanitize(result['reviews'])
+    else:  # already sanitized by reddit_scraper when saved
+        data = load_reddit_comments(result, result['name'])
+    entries[key][ENTRY_FIELDS[source]] = data
+    if ledger is not None:
+        ledger.record(places_by_key[key], source, result.get('output_file'), data)
+
+async def stream_reviews_async(places, city, ledger=None):
+    """Scrape Google reviews and Reddit threads for every place at once,
+    yielding each place's entry as soon as all of its sources are in.
+
+    Each source has its own concurrency limit and all tasks share one browser
+    pool, so a city takes about as long as its slowest place. Finished
+    entries are handed off and dropped, so only places still being scraped
+    are held in memory.
+    """
+    entries, todo = plan_scrape(places, ledger)
+    places_by_key = {place_key(place): place for place in places}
+    pending = {key: 0 for key in places_by_key}
+    for source in SOURCES:
+        for place in todo[source]:
+            pending[place_key(place)] += 1
+
+    # Places with nothing to scrape are ready straight from the ledger
+    for key in places_by_key:
+        if not pending[key]:
+            yield entries.pop(key)
+    if not any(todo.values()):
+        return
+
+    google_limit = asyncio.Semaphore(GOOGLE_CONCURRENCY)
+    reddit_limit = asyncio.Semaphore(REDDIT_CONCURRENCY)
+
+    async def tagged(source, coro):
+        return source, await coro
+
+    async with AsyncBrowserPool() as pool:
+        tasks = [asyncio.create_task(tagged("google", scrape_google_reviews_async(place, pool, google_limit)))
+                 for place in todo["google"]]
+        tasks += [asyncio.create_task(tagged("reddit", scrape_reddit_async(place, city, pool, reddit_limit)))
+                  for place in todo["reddit"]]
+        try:
+            for done, finished in enumerate(asyncio.as_completed(tasks), 1):
+                source, result = await finished
+                merge_result(entries, places_by_key, result, source, ledger)
+                print(f"[{done}/{len(tasks)}] Merged {source} results for {result['name']}")
+                pending[result['key']] -= 1
+                if not pending[result['key']]:
+                    yield entries.pop(result['key'])
+            print(f"[✓] Browser pool: {pool.stats()}")
+        finally:
+            # Stop scrapes still running (consumer gone or cancelled) before the pool closes
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+def collect_reviews_in_pools(places, city, ledger=None):
+    entries, todo = plan_scrape(places, ledger)
+    places_by_key = {place_key(place): place for place in places}
+
+    print("\n=== Step 2: Google Maps reviews scraping ===")
+    if todo["google"]:
+        for result in run_in_pool(scrape_google_reviews, todo["google"]):
+            merge_result(entries, places_by_key, result, "google", ledger)
+
+    print("\n=== Step 3: Reddit scraping ===")
+    if todo["reddit"]:
+        for result in run_in_pool(scrape_reddit, [(place, city) for place in todo["reddit"]]):
+            merge_result(entries, places_by_key, result, "reddit", ledger)
+
+    return [entries[key] for key in places_by_key]
+
+def run_in_pool(fn, items, processes=3):
+    # close/join (not terminate) so each worker shuts its warm browser pool down cleanly
+    pool = Pool(processes=min(processes, len(items)))
+    try:
+        results = pool.map(fn, items)
+        pool.close()
+    except Exception:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+
+def _iter_async_entries(places, city, ledger):
+    """Run stream_reviews_async on its own event loop thread and yield its entries here.
+
+    The hand-off queue is bounded and the loop waits for room without
+    blocking, so a slow consumer holds scraping back instead of piling up
+    finished places. If the consumer stops early (a failed build, a closed
+    generator), the producer is cancelled and its browser pool closed.
+    """
+    entries = queue.Queue(maxsize=GOOGLE_CONCURRENCY + REDDIT_CONCURRENCY)
+    done = object()
+    failure = []
+    producer = {}
+    started = threading.Event()
+
+    async def produce():
+        loop = asyncio.get_running_loop()
+        producer["loop"], producer["task"] = loop, asyncio.current_task()
+        started.set()
+        try:
+            async for entry in stream_reviews_async(places, city, ledger):
+                await loop.run_in_executor(None, entries.put, entry)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            failure.append(e)
+        finally:
+            await loop.run_in_executor(None, entries.put, done)
+
+    thread = threading.Thread(target=bind_trace(asyncio.run), args=(produce(),), daemon=True)
+    thread.start()
+    finished = False
+    try:
+        while (entry := entries.get()) is not done:
+            yield entry
+        finished = True
+    finally:
+        if not finished:
+            started.wait()
+            try:
+                producer["loop"].call_soon_threadsafe(producer["task"].cancel)
+            except RuntimeError:  # the loop already finished
+                pass
+            # Drain so a put blocked on the full queue can return and the producer reach `done`
+            while entries.get() is not done:
+                pass
+        thread.join()
+    if failure:
+        raise failure[0]
+
+def stream_scraped_places(city, category, use_ledger=True):
+    """Fetch a city's places, scrape them, and yield each finished place.
+
+    Every place is also appended to the combined JSONL file as it arrives, so
+    the vectorstore build can consume this generator while later places are
+    still being scraped.
+    """
     print(f"\nStarting data collection for {category} in {city}...\n")
 
     print("=== Step 1: Fetching places ===")
-    places = get_places_from_google_maps(city, category, max_places=3)
+    places = get_places_from_google_maps(city, category, max_places=MAX_PLACES)
     print(f"Found {len(places)} places.")
 
     if not places:
@@ -66,44 +281,34 @@ def main(city=None, category=None):
 
     save_places_to_json(places, city, category)
 
-    print("\n=== Step 2: Google Maps reviews scraping ===")
-    with Pool(processes=min(3, len(places))) as pool:
-        google_results = pool.map(scrape_google_reviews, places)
-
-    print("\n=== Step 3: Reddit scraping ===")
-    with Pool(processes=min(3, len(places))) as pool:
-        reddit_results = pool.map(scrape_reddit, [(place, city) for place in places])
+    # Only places that are stale or whose review count changed get re-scraped
+    ledger = ScrapeLedger(city, category) if use_ledger else None
 
-    final_output = []
-    for place in places:
-        google_data = next((r for r in google_results if r['name'] == place['name'] and r['success']), None)
-        reddit_data = next((r for r in reddit_results if r['name'] == place['name'] and r['success']), None)
-
-        reddit_comments = []
-        if reddit_data and reddit_data.get("output_file"):
-            try:
-                with open(reddit_data['output_file'], 'r', encoding='utf-8', errors='replace') as f:
-                    reddit_threads = json.load(f)
-                    reddit_comments = reddit_threads
-            except Exception as e:
-                print(f"Error loading Reddit comments for {place['name']}: {e}")
-
-        entry = {
-            **place,
-            "google_reviews": google_data['reviews'] if google_data else [],
-            "reddit_comments": reddit_comments
-        }
+    os.makedirs("Google Reviews", exist_ok=True)
+    if SCRAPE_ENGINE == "process":
+        entries = collect_reviews_in_pools(places, city, ledger)
+    else:
+        print("\n=== Step 2: Google Maps + Reddit scraping (async) ===")
+        entries = _iter_async_entries(places, city, ledger)
 
-        final_output.append(entry)
+    output_file = combined_output_path(city, category)
+    with PlaceRecordWriter(output_file) as writer:
+        for entry in entries:
+            writer.write(entry)
+            yield entry
 
-    final_output = sanitize_string(final_output)
+    print(f"\n=== Final output saved to {output_file} ({writer.count} places) ===")
 
-    os.makedirs("Combined Output", exist_ok=True)
-    output_file = f"Combined Output/{category}_{city}_combined.json"
-    with open(output_file, 'w', encoding='utf-8', errors='replace') as f:
-        json.dump(final_output, f, indent=2, ensure_ascii=False)
+def main(city=None, category=None, use_ledger=True):
+    if isinstance(city, tuple):  # Handle Flask's argument passing
+        city, category = city
+    if not city or not category:
+        city = input("Enter the city name: ").strip()
+        category = input("Enter the category: ").strip()
 
-    print(f"\n=== Final output saved to {output_file} ===")
+    for _ in stream_scraped_places(city, category, use_ledger):
+        pass
+    return combined_output_path(city, category)
 
 if __name__ == "__main__":
     os.makedirs("output", exist_ok=True)
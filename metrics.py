@@ -0,0 +1,231 @@
+import os
+import time
+import json
+import asyncio
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# Configuration
+TRACE_ALL = os.getenv("VIBE_TRACE", "off") == "on"  # dump a trace for every request and job
+TRACE_DIR = os.getenv("VIBE_TRACE_DIR")  # also write each trace there as JSON
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Counters and histograms are per process; scraper workers in the "process"
+# engine's multiprocessing.Pool keep their own and are not exported.
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_help = {}
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name, value=1, help=None, **labels):
+    """Add `value` to the counter `name` with these labels"""
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+        if help:
+            _help.setdefault(name, help)
+
+def observe(name, value, help=None, **labels):
+    """Record one observation (seconds) in the histogram `name`"""
+    key = (name, _labels(labels))
+    with _lock:
+        row = _histograms.get(key)
+        if row is None:
+            row = _histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                row[i] += 1
+        row[-2] += value
+        row[-1] += 1
+        if help:
+            _help.setdefault(name, help)
+
+# === Traces ===
+class Trace:
+    """Spans recorded while serving one request or job, in the order they ended"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []  # (stage, start offset, seconds, labels)
+        self._lock = threading.Lock()
+
+    def add(self, stage, start, seconds, labels):
+        with self._lock:
+            self.spans.append((stage, start - self.started, seconds, labels))
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span[1])
+        return {
+            "name": self.name,
+            "total_ms": round(self.total() * 1000, 1),
+            "spans": [
+                {"stage": stage, "start_ms": round(start * 1000, 1), "ms": round(seconds * 1000, 1), **labels}
+                for stage, start, seconds, labels in spans
+            ],
+        }
+
+    def summary(self):
+        """Milliseconds per stage, summed over its spans"""
+        totals = {}
+        with self._lock:
+            for stage, _, seconds, _ in self.spans:
+                totals[stage] = totals.get(stage, 0.0) + seconds * 1000
+        return {stage: round(ms, 1) for stage, ms in totals.items()}
+
+    def dump(self):
+        """Print where the time went and, with VIBE_TRACE_DIR, save the trace as JSON"""
+        data = self.to_dict()
+        print(f"[🔍] Trace {self.name}: {data['total_ms']} ms")
+        for stage, ms in sorted(self.summary().items(), key=lambda item: -item[1]):
+            print(f"      {stage:<24} {ms:>10.1f} ms")
+        if TRACE_DIR:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            name = "".join(c if c.isalnum() else "_" for c in self.name)
+            with open(os.path.join(TRACE_DIR, f"{int(time.time() * 1000)}_{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        return data
+
+_current_trace = contextvars.ContextVar("vibe_trace", default=None)
+
+def start_trace(name):
+    """Begin collecting spans in this context; returns (trace, token for end_trace)"""
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+def current_trace():
+    return _current_trace.get()
+
+def bind_trace(fn):
+    """Wrap fn so spans it records in a worker thread join the caller's trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current_trace.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+    return run
+
+@contextmanager
+def span(stage, **labels):
+    """Time a pipeline stage into vibe_stage_seconds and the current trace, if any.
+
+    Exceptions are counted in vibe_stage_errors_total and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        inc("vibe_stage_errors_total", help="Pipeline stages that raised", stage=stage, **labels)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        observe("vibe_stage_seconds", seconds, help="Time spent per pipeline stage", stage=stage, **labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, start, seconds, labels)
+
+def timed(stage, **labels):
+    """Decorator form of span(), for plain and async functions"""
+    def wrap(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*args, **kwargs):
+                with span(stage, **labels):
+                    return await fn(*args, **kwargs)
+            return run_async
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with span(stage, **labels):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
+
+# === LLM usage ===
+def record_llm_call(model_name, cached, prompt_tokens=None, output_tokens=None):
+    inc("vibe_llm_calls_total", help="LLM calls by model, including cache hits", model=model_name,
+        cached="true" if cached else "false")
+    if prompt_tokens:
+        inc("vibe_llm_tokens_total", prompt_tokens, help="LLM tokens used", model=model_name, kind="prompt")
+    if output_tokens:
+        inc("vibe_llm_tokens_total", output_tokens, help="LLM tokens used", model=model_name, kind="output")
+
+def record_gemini_usage(model_name, response):
+    usage = getattr(response, "usage_metadata", None)
+    record_llm_call(model_name, False, getattr(usage, "prompt_token_count", None),
+                    getattr(usage, "candidates_token_count", None))
+
+# === Prometheus text format ===
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def stats_gauges(name, stats, **labels):
+    """Gauge samples for the numeric values of a stats() dict, one level of nesting deep"""
+    samples = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, (int, float)):
+            samples.append((f"{name}_{key}", _labels(labels), value))
+        elif isinstance(value, dict):
+            for sub, sub_value in value.items():
+                if isinstance(sub_value, (int, float)) and not isinstance(sub_value, bool):
+                    samples.append((f"{name}_{key}", _labels({**labels, "key": sub}), sub_value))
+    return samples
+
+def render(gauges=()):
+    """Every counter and histogram, plus `gauges` [(name, labels, value)], in Prometheus text format"""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(_histograms.items())
+        help_text = dict(_help)
+
+    def header(name, kind, seen):
+        if name not in seen:
+            seen.add(name)
+            if name in help_text:
+                lines.append(f"# HELP {name} {help_text[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    seen = set()
+    for (name, labels), value in counters:
+        header(name, "counter", seen)
+        lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+    for (name, labels), row in histograms:
+        header(name, "histogram", seen)
+        for bound, count in zip(LATENCY_BUCKETS, row):
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {row[-1]}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_number(row[-2])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {row[-1]}")
+    for name, labels, value in sorted(gauges, key=lambda sample: sample[0]):
+        header(name, "gauge", seen)
+        lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
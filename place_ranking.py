@@ -0,0 +1,117 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from vibe_store import place_key
+from lazy_store import chunk_metadata
+
+# Configuration
+CANDIDATE_K = int(os.getenv("VIBE_RANK_CANDIDATES", "200"))
+TOP_N_CHUNKS = int(os.getenv("VIBE_RANK_TOP_N_CHUNKS", "3"))
+RRF_K = int(os.getenv("VIBE_RANK_RRF_K", "60"))
+RATING_PRIOR_WEIGHT = float(os.getenv("VIBE_RATING_PRIOR", "0.1"))
+COUNT_PRIOR_WEIGHT = float(os.getenv("VIBE_COUNT_PRIOR", "0.05"))
+MAX_TOP_N = int(os.getenv("VIBE_MAX_TOP_N", "10"))
+
+STRATEGIES = ("max", "mean_top_n", "rrf")
+
+RankedPlace = namedtuple("RankedPlace", ["key", "score", "rows"])
+
+def similarities(vectorstore, distances):
+    """FAISS scores as similarities, higher is better.
+
+    LangChain's FAISS defaults to squared L2 over unit-length embeddings,
+    where cosine = 1 - d / 2; inner-product indexes already return similarity.
+    """
+    strategy = str(getattr(vectorstore, "distance_strategy", "")).upper()
+    if "INNER_PRODUCT" in strategy:
+        return distances
+    return 1.0 - distances / 2.0
+
+class PlaceRanker:
+    """Aggregates chunk hits into place scores with array operations.
+
+    Built once per loaded store: `row_place[r]` is the index of the place
+    owning FAISS row r (-1 if unknown), and the rating / review-count priors
+    are precomputed per place, so ranking a few hundred candidates is a
+    handful of bincounts.
+    """
+
+    def __init__(self, row_place, keys, ratings, counts):
+        self.row_place = row_place
+        self.keys = keys
+        self.rating_prior = np.clip(np.nan_to_num(ratings) / 5.0, 0.0, 1.0)
+        log_counts = np.log1p(np.nan_to_num(counts))
+        self.count_prior = log_counts / log_counts.max() if len(log_counts) and log_counts.max() > 0 else log_counts
+
+    @classmethod
+    def build(cls, vectorstore, place_map):
+        places = list(place_map.values())
+        index_of_key = {place_key(place): i for i, place in enumerate(places)}
+        index_of_name = {place["name"]: i for i, place in enumerate(places)}
+
+        row_place = np.full(vectorstore.index.ntotal, -1, dtype=np.int32)
+        for row, metadata in chunk_metadata(vectorstore):
+            if "place_id" in metadata:
+                row_place[row] = index_of_key.get(metadata["place_id"], -1)
+            else:  # chunks from stores without compact metadata
+                row_place[row] = index_of_name.get(metadata.get("source"), -1)
+
+        ratings = np.array([p.get("rating") or np.nan for p in places], dtype=np.float64)
+        counts = np.array([p.get("reviews_count") or 0 for p in places], dtype=np.float64)
+        return cls(row_place, [place_key(p) for p in places], ratings, counts)
+
+    def rank(self, sims, rows, strategy="max", top_n=1, n_chunks=TOP_N_CHUNKS):
+        """Top `top_n` places for one search result.
+
+        `sims` and `rows` are a single FAISS result row, best first, with
+        -1 padding. Returns RankedPlace(key, score, rows) with the place's
+        matching rows in rank order.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown ranking strategy '{strategy}', expected one of {STRATEGIES}")
+
+        valid = rows >= 0
+        rows, sims = rows[valid], sims[valid].astype(np.float64)
+        places = self.row_place[rows]
+        known = places >= 0
+        rows, sims, places = rows[known], sims[known], places[known]
+        if not len(rows):
+            return []
+        ranks = np.arange(len(rows))
+        n_places = len(self.keys)
+
+        if strategy == "max":
+            # Results are sorted, so a place's first hit is its best
+            score = np.full(n_places, -np.inf)
+            np.maximum.at(score, places, sims)
+        elif strategy == "mean_top_n":
+            # Position of each hit within its place, keeping rank order
+            order = np.argsort(places, kind="stable")
+            grouped = places[order]
+            starts = np.r_[0, np.flatnonzero(np.diff(grouped)) + 1]
+            position = np.empty(len(rows), dtype=np.int64)
+            position[order] = ranks - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+            keep = position < n_chunks
+            # Missing slots count as zero, so several good matches beat one lucky chunk
+            score = np.bincount(places[keep], weights=sims[keep], minlength=n_places) / n_chunks
+        else:  # rrf
+            score = np.bincount(places, weights=1.0 / (RRF_K + ranks + 1), minlength=n_places)
+
+        hit = np.zeros(n_places, dtype=bool)
+        hit[places] = True
+        candidates = np.flatnonzero(hit)
+        relevance = score[candidates]
+        low, high = relevance.min(), relevance.max()
+        relevance = (relevance - low) / (high - low) if high > low else np.ones_like(relevance)
+
+        final = ((1.0 - RATING_PRIOR_WEIGHT - COUNT_PRIOR_WEIGHT) * relevance
+                 + RATING_PRIOR_WEIGHT * self.rating_prior[candidates]
+                 + COUNT_PRIOR_WEIGHT * self.count_prior[candidates])
+
+        top = np.argsort(-final, kind="stable")[:top_n]
+        return [
+            RankedPlace(self.keys[candidates[i]], float(final[i]), rows[places == candidates[i]])
+            for i in top
+        ]
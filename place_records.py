@@ -0,0 +1,79 @@
+import os
+import json
+from itertools import islice
+
+# Scraped places are stored as JSON Lines: one place (with its reviews) per line
+COMBINED_DIR = "Combined Output"
+
+def combined_output_path(city, category):
+    return os.path.join(COMBINED_DIR, f"{category}_{city}_combined.jsonl")
+
+def tagged_output_path(source_path):
+    return os.path.splitext(source_path)[0] + "_tagged.jsonl"
+
+def sanitize(obj):
+    """Replace undecodable characters in every string of a record.
+
+    Called once per record as scraped data enters the pipeline, so later
+    stages can trust what they read.
+    """
+    if isinstance(obj, str):
+        return obj.encode('utf-8', errors='replace').decode('utf-8')
+    elif isinstance(obj, list):
+        return [sanitize(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {sanitize(k): sanitize(v) for k, v in obj.items()}
+    return obj
+
+class PlaceRecordWriter:
+    """Append places to a JSONL file, one line each, flushed as they arrive.
+
+    Lines go to a temporary file that replaces `path` only when the writer
+    closes without an error, so readers never see a half-written file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._tmp = path + ".tmp"
+        self._file = open(self._tmp, "w", encoding="utf-8")
+
+    def write(self, place):
+        self._file.write(json.dumps(place, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.count += 1
+
+    def close(self, commit=True):
+        self._file.close()
+        if commit:
+            os.replace(self._tmp, self.path)
+        else:
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+def iter_place_records(path):
+    """Yield places one at a time from a JSONL file (or a legacy JSON array file)"""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def batched(iterable, size):
+    """Lists of up to `size` items from any iterable, consumed lazily"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
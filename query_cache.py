@@ -0,0 +1,180 @@
+import os
+import time
+import threading
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+
+# Configuration
+QUERY_EMBED_LRU_SIZE = int(os.getenv("VIBE_QUERY_EMBED_LRU", "1024"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("VIBE_SEMANTIC_CACHE_SIZE", "512"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("VIBE_SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("VIBE_SEMANTIC_CACHE_TTL", "3600"))
+
+def normalize_query(text):
+    return " ".join(text.lower().split())
+
+def _hit_rate(hits, misses):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+class QueryEmbeddingCache:
+    """In-process LRU of (model, normalised query text) -> query embedding"""
+
+    def __init__(self, max_entries=QUERY_EMBED_LRU_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_name, text, embed):
+        """Cached embedding for `text`, calling embed(text) on a miss"""
+        key = (model_name, normalize_query(text))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        # Embed outside the lock; concurrent misses on one key just embed twice
+        vector = np.asarray(embed(text), dtype=np.float32)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return vector
+
+    def get_many(self, model_name, texts, embed_many):
+        """Embeddings for `texts` as an (n, dim) array; misses go to one embed_many(list) call"""
+        keys = [(model_name, normalize_query(text)) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = embed_many(list(missing.values()))
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    found[key] = self._entries[key] = np.asarray(vector, dtype=np.float32)
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return np.stack([found[key] for key in keys])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": _hit_rate(self.hits, self.misses),
+            }
+
+class SemanticCache:
+    """Query responses reused for near-duplicate questions.
+
+    Entries live in a scope (store, store version, tags, top_n, strategy) so a
+    rebuilt store or a different filter never serves an old answer. A lookup
+    returns the response of the most similar cached query in the scope if its
+    cosine similarity is at least `threshold`. Entries expire after
+    `ttl_seconds` and the least recently used are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # entry id -> (scope, unit vector, response, created_at)
+        self._scopes = {}  # scope -> set of entry ids
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, entry_id):
+        scope = self._entries.pop(entry_id)[0]
+        ids = self._scopes[scope]
+        ids.discard(entry_id)
+        if not ids:
+            del self._scopes[scope]
+
+    def lookup(self, scope, vector):
+        """Cached response for a query within `scope`, or None"""
+        query = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            ids = [i for i in self._scopes.get(scope, ()) if now - self._entries[i][3] <= self.ttl_seconds]
+            for stale in self._scopes.get(scope, set()) - set(ids):
+                self._drop(stale)
+            if ids:
+                scores = np.stack([self._entries[i][1] for i in ids]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(ids[best])
+                    self.hits += 1
+                    return self._entries[ids[best]][2]
+            self.misses += 1
+            return None
+
+    def store(self, scope, vector, response):
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (scope, self._unit(vector), response, time.time())
+            self._scopes.setdefault(scope, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "scopes": len(self._scopes),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": _hit_rate(self.hits, self.misses),
+            }
+
+_embedding_cache = QueryEmbeddingCache()
+_semantic_cache = None
+_semantic_lock = threading.Lock()
+
+def get_query_embedding_cache():
+    return _embedding_cache
+
+def get_semantic_cache():
+    """Process-wide SemanticCache, or None when VIBE_SEMANTIC_CACHE=off"""
+    global _semantic_cache
+    if os.getenv("VIBE_SEMANTIC_CACHE", "on") == "off":
+        return None
+    with _semantic_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache()
+        return _semantic_cache
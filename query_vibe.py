@@ -1,31 +1,126 @@
 import os
+import re
 import json
 import time
+import queue
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import google.generativeai as genai
 from finalPDFmaster import (
     configure_environment,
     create_embeddings,
     load_vector_store
 )
+from llm_cache import cached_generate, cached_stream, LLMParseError
+from langchain.schema import Document
+from vibe_store import (
+    resolve_store_path, hold_store_dir, legacy_tagged_path, load_place_table, place_metadata, place_record, PlaceTable
+)
+from place_records import iter_place_records, combined_output_path, tagged_output_path
+from tag_index import TagIndex
+from place_ranking import PlaceRanker, similarities, CANDIDATE_K
+from ann_index import search_params
+from query_cache import get_query_embedding_cache, get_semantic_cache
+from metrics import span, timed, inc, bind_trace
+
+STRUCTURED_OUTPUT_MODEL = "gemini-2.5-flash"
 
 def load_data_and_store(city, category):
     configure_environment()
     embedding_model = create_embeddings([])
-    vectorstore = load_vector_store("vibe_vectorstore", embedding_model)
+    store_dir = resolve_store_path(city, category)
+    vectorstore = load_vector_store(store_dir, embedding_model)
+    # Keeps the version directory from being pruned while this store is loaded
+    vectorstore.store_lease = hold_store_dir(store_dir)
+
+    # Place metadata side table; stores built before it existed use the tagged places file
+    place_data = load_place_table(store_dir)
+    if place_data is None:
+        tagged_file = tagged_output_path(combined_output_path(city, category))
+        if not os.path.exists(tagged_file):
+            tagged_file = legacy_tagged_path(city, category)
+        place_data = [place_record(place) for place in iter_place_records(tagged_file)]
 
-    tagged_file = f"Combined Output/{category}_{city}_combined_tagged.json"
-    with open(tagged_file, "r", encoding="utf-8") as f:
-        place_data = json.load(f)
+    place_map = PlaceTable(place_data)
 
-    place_map = {place["name"]: place for place in place_data}
+    # Tag bitmaps are saved with the store; older stores get them built on load
+    tag_index = TagIndex.load(store_dir)
+    if tag_index is None or tag_index.ntotal != vectorstore.index.ntotal:
+        tag_index = TagIndex.build(vectorstore, place_map)
+    vectorstore.tag_index = tag_index
+    vectorstore.place_ranker = PlaceRanker.build(vectorstore, place_map)
     return vectorstore, place_map
 
+@timed("query_embed")
+def embed_query(vectorstore, query):
+    """Query embedding, served from the in-process LRU for repeated questions"""
+    model_name = getattr(vectorstore.embedding_function, "model_name", None)
+    return get_query_embedding_cache().get(model_name, query, vectorstore._embed_query)
+
+@timed("query_embed")
+def embed_queries(vectorstore, queries):
+    """(n, dim) query embeddings; texts missing from the LRU are embedded in one request"""
+    embeddings = vectorstore.embedding_function
+    model_name = getattr(embeddings, "model_name", None)
+    embed_many = getattr(embeddings, "embed_queries", None) or (
+        lambda texts: [vectorstore._embed_query(text) for text in texts]
+    )
+    return get_query_embedding_cache().get_many(model_name, queries, embed_many)
+
+def search_rows_batch(vectorstore, vectors, k, bitmap=None, ann_params=None):
+    """One FAISS search for a matrix of query vectors; returns (similarities, rows), one row per query.
+
+    With a bitmap the filter is handed to the index as an IDSelector, so it
+    is applied during the search rather than to its results. `ann_params`
+    ({"nprobe", "ef_search"}) tunes IVF and HNSW indexes for this call.
+    """
+    import faiss
+
+    vectors = np.array(vectors, dtype=np.float32)
+    if getattr(vectorstore, "_normalize_L2", False):
+        faiss.normalize_L2(vectors)
+    selector = None
+    if bitmap is not None:
+        bitmap = np.ascontiguousarray(bitmap, dtype=np.uint8)
+        selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    params = search_params(vectorstore.index, selector, **(ann_params or {}))
+    with span("faiss_search"):
+        distances, rows = vectorstore.index.search(vectors, k, params=params)
+    return similarities(vectorstore, distances), rows
+
+def search_rows(vectorstore, query, k, bitmap=None, vector=None, ann_params=None):
+    """search_rows_batch for a single query, best first"""
+    if vector is None:
+        vector = embed_query(vectorstore, query)
+    sims, rows = search_rows_batch(vectorstore, [vector], k, bitmap, ann_params)
+    return sims[0], rows[0]
+
+def docs_for_rows(vectorstore, rows):
+    return [vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(row)]) for row in rows if row != -1]
+
+def join_place_metadata(docs, place_map):
+    """Expand compact chunk metadata ({place_id, author, origin}) with the
+    place's fields from the side table. Docs are copied, never mutated, since
+    they are shared by concurrent queries."""
+    joined = []
+    for doc in docs:
+        place = place_map.get(doc.metadata.get("place_id"))
+        if place is None:
+            joined.append(doc)
+            continue
+        joined.append(Document(
+            page_content=doc.page_content,
+            metadata={**place_metadata(place), **doc.metadata}
+        ))
+    return joined
+
 def group_docs_by_place(docs):
+    """Docs by place_key; chunks from stores without compact metadata only have the name"""
     place_reviews = defaultdict(list)
     for doc in docs:
-        place_name = doc.metadata.get("source")
-        place_reviews[place_name].append(doc)
+        key = doc.metadata.get("place_id") or doc.metadata.get("source")
+        place_reviews[key].append(doc)
     return place_reviews
 
 def build_prompt_for_place(place, reviews, user_query):
@@ -34,7 +129,7 @@ def build_prompt_for_place(place, reviews, user_query):
     reddit_reviews = []
     
     for doc in reviews:
-        if "reddit.com" in str(doc.metadata.get("url", "")):
+        if doc.metadata.get("origin") == "reddit" or "reddit.com" in str(doc.metadata.get("url", "")):
             reddit_reviews.append(doc)
         else:
             google_reviews.append(doc)
@@ -88,45 +183,57 @@ Reddit Comments:
 """
     return prompt
 
+def parse_json_object(raw):
+    """Parse the JSON object in an LLM answer, tolerating code fences and chatter"""
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = raw[raw.find('{'):raw.rfind('}')+1]
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        start = raw.find('{')
+        end = raw.rfind('}') + 1
+        return json.loads(raw[start:end])
+
 def generate_structured_output(prompt, max_retries=3):
-    model = genai.GenerativeModel("gemini-2.5-flash")  # Using the more available model
-    
+    model = genai.GenerativeModel(STRUCTURED_OUTPUT_MODEL)  # Using the more available model
+
+    # 429s, 5xx and network errors are retried with backoff by the shared Gemini
+    # limiter; this loop only asks again when the answer does not parse
     for attempt in range(max_retries):
         try:
-            response = model.generate_content(prompt)
-            raw = response.text.strip()
-            
-            # Clean up the response
-            if raw.startswith("```"):
-                raw = raw[raw.find('{'):raw.rfind('}')+1]
-            
-            try:
-                return json.loads(raw)
-            except json.JSONDecodeError:
-                # Try to manually extract JSON if parsing fails
-                try:
-                    start = raw.find('{')
-                    end = raw.rfind('}') + 1
-                    return json.loads(raw[start:end])
-                except:
-                    print(f"[!] Attempt {attempt + 1}: Failed to parse response, retrying...")
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                    continue
-                    
-        except Exception as e:
-            print(f"[!] Attempt {attempt + 1}: Error generating content - {str(e)}")
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt  # Exponential backoff
-                print(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-            else:
-                raise
+            # Identical prompts (same place, reviews and question) are served from the LLM cache
+            return cached_generate(model, STRUCTURED_OUTPUT_MODEL, prompt, parse_json_object)
+        except LLMParseError:
+            inc("vibe_llm_parse_failures_total", help="LLM answers that could not be parsed")
+            print(f"[!] Attempt {attempt + 1}: Failed to parse response, retrying...")
 
     return {"error": "Could not generate valid response after retries"}
 
-def structured_query_response(query, vectorstore, place_map, required_tags=None):
-    print("\n[🔍] Searching relevant reviews...")
-    all_docs = vectorstore.similarity_search(query, k=15)  # Reduced from 25 to 15
+def rank_places(query, vectorstore, place_map, required_tags=None, top_n=1, strategy="max", vector=None,
+                ann_params=None):
+    """Top places as [(place_key, docs)] from one wide, tag-filtered candidate search"""
+    bitmap = None
+    if required_tags:
+        tag_index = vectorstore.tag_index
+        bitmap = tag_index.bitmap_for(required_tags)
+        matching = tag_index.count(bitmap)
+        print(f"[⚙️] Filtering with tags: {sorted(set(required_tags))}, {matching} chunks match")
+        if not matching:
+            return []
+
+    sims, rows = search_rows(vectorstore, query, min(CANDIDATE_K, vectorstore.index.ntotal), bitmap, vector, ann_params)
+    start = time.perf_counter()
+    with span("rank"):
+        ranked = vectorstore.place_ranker.rank(sims, rows, strategy, top_n)
+    print(f"[✓] Ranked {int((rows >= 0).sum())} candidate chunks into {len(ranked)} places "
+          f"({strategy}) in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return [(r.key, join_place_metadata(docs_for_rows(vectorstore, r.rows[:15]), place_map)) for r in ranked]
+
+def rank_by_first_hit(query, vectorstore, place_map, required_tags=None, top_n=1):
+    """Places in order of their best chunk in a top-15 search, for stores without a PlaceRanker"""
+    all_docs = vectorstore.similarity_search(query, k=15)
+    all_docs = join_place_metadata(all_docs, place_map)
 
     if required_tags:
         required_tags = set(tag.strip().lower() for tag in required_tags)
@@ -136,19 +243,359 @@ def structured_query_response(query, vectorstore, place_map, required_tags=None)
         ]
         print(f"[⚙️] Filtered with tags: {required_tags}, {len(all_docs)} docs remain")
 
-    grouped = group_docs_by_place(all_docs)
-    if not grouped:
-        return {"error": "No relevant places found."}
+    return list(group_docs_by_place(all_docs).items())[:top_n]
+
+# === Place answers ===
+# Every query path (plain, batch, streaming) answers with the same shape and
+# admits it to the semantic cache the same way, so cached answers can be
+# served to any of them.
+def place_card(place):
+    """The fields of a place's answer that come from the place table rather than the LLM"""
+    coordinates = place.get("coordinates") or {}
+    return {
+        "name": place["name"],
+        "address": place.get("address"),
+        "rating": place.get("rating"),
+        "review_count": place.get("reviews_count"),
+        "tags": place.get("tags", []),
+        "location": {"latitude": coordinates.get("latitude"), "longitude": coordinates.get("longitude")},
+        "links": {
+            "google_maps": f"https://www.google.com/maps/place/?q=place_id:{place.get('source_url', '')}",
+            "reddit_threads": [thread["url"] for thread in place.get("reddit_comments", [])][:3],
+        },
+        "summary": "",
+        "key_features": [],
+    }
+
+def validate_place_result(result, card):
+    """Check an LLM answer and merge it onto the place card; raises ValueError"""
+    if not isinstance(result, dict):
+        raise ValueError("expected a JSON object")
+    summary = result.get("summary")
+    features = result.get("key_features")
+    if not isinstance(summary, str) or not summary.strip():
+        raise ValueError("missing summary")
+    if not isinstance(features, list):
+        raise ValueError("missing key_features")
+    return {**card, "summary": summary.strip(), "key_features": [str(f) for f in features]}
+
+def place_result(place, answer):
+    """One place's answer: its card with the LLM's summary and key features,
+    or the card plus an "error" if the answer failed or is unusable"""
+    card = place_card(place)
+    if isinstance(answer, dict) and "error" in answer:
+        return {**card, "error": answer["error"]}
+    try:
+        return validate_place_result(answer, card)
+    except ValueError as e:
+        return {**card, "error": f"Invalid answer: {e}"}
+
+def build_response(results, top_n, strategy):
+    """The single place's answer for top_n=1, else {"places": [...], "strategy"}"""
+    return results[0] if top_n == 1 else {"places": results, "strategy": strategy}
 
-    best_place_name = next(iter(grouped))
-    reviews = grouped[best_place_name]
-    place = place_map.get(best_place_name)
+def _ann_key(ann_params):
+    return tuple(sorted((ann_params or {}).items()))
 
+def _tag_key(tags):
+    return tuple(sorted(set(tag.strip().lower() for tag in tags or [])))
+
+def cache_scope_for(cache_scope, tags, top_n, strategy, ann_params):
+    """Semantic cache scope: the store's scope plus everything that changes the answer"""
+    return (*cache_scope, _tag_key(tags), top_n, strategy, _ann_key(ann_params))
+
+def is_complete(result):
+    """True if no part of an answer is an error, so it may be cached"""
+    return "error" not in result and not any("error" in place for place in result.get("places", []))
+
+def admit_to_cache(cache, scope, vector, result):
+    """Cache a finished answer unless some part of it is an error"""
+    if cache is not None and is_complete(result):
+        cache.store(scope, vector, result)
+
+@timed("llm_answer")
+def describe_place(query, place_map, key, reviews):
+    place = place_map.lookup(key)
     if not place:
-        return {"error": f"Details for place '{best_place_name}' not found."}
+        return {"error": f"Details for place '{key}' not found."}
+    prompt = build_prompt_for_place(place, reviews, query)
+    return place_result(place, generate_structured_output(prompt))
+
+def structured_query_response(query, vectorstore, place_map, required_tags=None, top_n=1, strategy="max",
+                              cache_scope=None, ann_params=None):
+    """Recommend the top `top_n` places for a query.
+
+    Returns the single place's JSON for top_n=1, else {"places": [...], "strategy"}.
+    With `cache_scope` (e.g. city, category and store version) answers are
+    shared between near-duplicate queries through the semantic cache.
+    """
+    print("\n[🔍] Searching relevant reviews...")
+    if getattr(vectorstore, "place_ranker", None) is None:
+        ranked = rank_by_first_hit(query, vectorstore, place_map, required_tags, top_n)
+        return describe_ranked(query, place_map, ranked, top_n, strategy)
+
+    vector = embed_query(vectorstore, query)
+    cache = get_semantic_cache() if cache_scope is not None else None
+    if cache is not None:
+        scope = cache_scope_for(cache_scope, required_tags, top_n, strategy, ann_params)
+        cached = cache.lookup(scope, vector)
+        if cached is not None:
+            print("[✓] Served from semantic cache")
+            return cached
+
+    ranked = rank_places(query, vectorstore, place_map, required_tags, top_n, strategy, vector, ann_params)
+    result = describe_ranked(query, place_map, ranked, top_n, strategy)
+    if cache is not None:
+        admit_to_cache(cache, scope, vector, result)
+    return result
 
+def describe_ranked(query, place_map, ranked, top_n, strategy):
+    if not ranked:
+        return {"error": "No relevant places found."}
+
+    if top_n == 1:
+        return build_response([describe_place(query, place_map, *ranked[0])], top_n, strategy)
+
+    # One LLM call per place, in parallel; results keep the ranking order
+    with ThreadPoolExecutor(max_workers=len(ranked)) as pool:
+        results = list(pool.map(bind_trace(lambda item: describe_place(query, place_map, *item)), ranked))
+    return build_response(results, top_n, strategy)
+
+# === Batch queries ===
+BATCH_LLM_CONCURRENCY = int(os.getenv("VIBE_BATCH_LLM_CONCURRENCY", "8"))
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+def batch_query_response(queries, vectorstore, place_map, top_n=1, strategy="max", cache_scope=None,
+                         ann_params=None):
+    """Answer several queries at once.
+
+    `queries` is a list of {"query", "tags"}. All queries are embedded in one
+    request and searched with one matrix FAISS search per distinct tag filter.
+    Each (query, place) pair gets its own LLM answer, so every result and
+    cache entry answers exactly the query it is stored under; repeated
+    queries in the batch share one. The LLM calls run concurrently. Returns
+    [{"query", "result", "timings"}] in input order.
+    """
+    if getattr(vectorstore, "place_ranker", None) is None:
+        answers = []
+        for item in queries:
+            start = time.perf_counter()
+            result = structured_query_response(item["query"], vectorstore, place_map, item.get("tags"), top_n, strategy)
+            answers.append({"query": item["query"], "result": result, "timings": {"total_ms": _ms(start)}})
+        return answers
+
+    batch_start = time.perf_counter()
+    timings = [{} for _ in queries]
+    vectors = embed_queries(vectorstore, [item["query"] for item in queries])
+    for t in timings:
+        t["embed_ms"] = _ms(batch_start)  # shared by the whole batch
+
+    results = [None] * len(queries)
+    scopes = [None] * len(queries)
+    cache = get_semantic_cache() if cache_scope is not None else None
+    if cache is not None:
+        for i, item in enumerate(queries):
+            scopes[i] = cache_scope_for(cache_scope, item.get("tags"), top_n, strategy, ann_params)
+            results[i] = cache.lookup(scopes[i], vectors[i])
+
+    # 🔹 One matrix search per tag filter, then per-query place ranking
+    groups = defaultdict(list)
+    for i, item in enumerate(queries):
+        if results[i] is None:
+            groups[_tag_key(item.get("tags"))].append(i)
+
+    ranked = {}
+    k = min(CANDIDATE_K, vectorstore.index.ntotal)
+    for tags, members in groups.items():
+        bitmap = None
+        if tags:
+            bitmap = vectorstore.tag_index.bitmap_for(tags)
+            if not vectorstore.tag_index.count(bitmap):
+                ranked.update((i, []) for i in members)
+                continue
+        start = time.perf_counter()
+        sims, rows = search_rows_batch(vectorstore, vectors[members], k, bitmap, ann_params)
+        search_ms = _ms(start)
+        for j, i in enumerate(members):
+            start = time.perf_counter()
+            with span("rank"):
+                ranked[i] = vectorstore.place_ranker.rank(sims[j], rows[j], strategy, top_n)
+            timings[i]["search_ms"] = search_ms
+            timings[i]["rank_ms"] = _ms(start)
+
+    # 🔹 One LLM call per distinct (query, tags, place)
+    def pair_key(i, place):
+        return queries[i]["query"], _tag_key(queries[i].get("tags")), place.key
+
+    pairs = {}
+    for i, places in ranked.items():
+        for place in places:
+            pairs.setdefault(pair_key(i, place), [int(row) for row in place.rows])
+
+    def summarize(key):
+        start = time.perf_counter()
+        question, _, place = key
+        reviews = join_place_metadata(docs_for_rows(vectorstore, pairs[key][:15]), place_map)
+        return describe_place(question, place_map, place, reviews), _ms(start)
+
+    summaries = {}
+    if pairs:
+        keys = list(pairs)
+        with ThreadPoolExecutor(max_workers=min(len(keys), BATCH_LLM_CONCURRENCY)) as pool:
+            summaries = dict(zip(keys, pool.map(bind_trace(summarize), keys)))
+    print(f"[✓] Batch of {len(queries)} queries: {len(summaries)} place answers generated "
+          f"in {_ms(batch_start)} ms")
+
+    answers = []
+    for i, item in enumerate(queries):
+        if results[i] is not None:
+            timings[i]["cache_hit"] = True
+        elif not ranked[i]:
+            results[i] = {"error": "No relevant places found."}
+        else:
+            places = [summaries[pair_key(i, place)][0] for place in ranked[i]]
+            results[i] = build_response(places, top_n, strategy)
+            timings[i]["llm_ms"] = max(summaries[pair_key(i, place)][1] for place in ranked[i])
+            admit_to_cache(cache, scopes[i], vectors[i], results[i])
+        answers.append({"query": item["query"], "result": results[i], "timings": timings[i]})
+    return answers
+
+# === Streaming ===
+class SummaryStream:
+    """Pulls the "summary" string out of the model's JSON answer while it streams"""
+
+    _START = re.compile(r'"summary"\s*:\s*"')
+
+    def __init__(self):
+        self.raw = ""
+        self.sent = 0
+        self.done = False
+
+    @staticmethod
+    def _closing_quote(body):
+        escaped = False
+        for i, ch in enumerate(body):
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                return i
+        return None
+
+    def feed(self, text):
+        """Add streamed text; returns the summary text that became available"""
+        self.raw += text
+        if self.done:
+            return ""
+        match = self._START.search(self.raw)
+        if not match:
+            return ""
+        body = self.raw[match.end():]
+        end = self._closing_quote(body)
+        if end is not None:
+            body = body[:end]
+            self.done = True
+        # Hold back a half-received escape sequence (at most 5 chars, e.g. \u00e)
+        for cut in range(6):
+            try:
+                decoded = json.loads('"' + body[:len(body) - cut] + '"')
+                break
+            except json.JSONDecodeError:
+                continue
+        else:
+            return ""
+        delta = decoded[self.sent:]
+        self.sent = max(self.sent, len(decoded))
+        return delta
+
+@timed("llm_stream")
+def stream_place(query, place, reviews, card, emit):
+    """Stream one place's LLM answer, emitting summary deltas; returns the validated result"""
     prompt = build_prompt_for_place(place, reviews, query)
-    return generate_structured_output(prompt)
+    model = genai.GenerativeModel(STRUCTURED_OUTPUT_MODEL)
+    validate = lambda raw: validate_place_result(parse_json_object(raw), card)
+
+    summary = SummaryStream()
+    parts = []
+    for text in cached_stream(model, STRUCTURED_OUTPUT_MODEL, prompt, validate):
+        parts.append(text)
+        delta = summary.feed(text)
+        if delta:
+            emit(("delta", {"name": card["name"], "text": delta}))
+
+    try:
+        return validate("".join(parts))
+    except ValueError as e:
+        print(f"[!] Streamed answer for {card['name']} invalid ({e}), retrying without streaming")
+        return validate_place_result(generate_structured_output(prompt), card)
+
+def stream_query_response(query, vectorstore, place_map, required_tags=None, top_n=1, strategy="max",
+                          cache_scope=None, ann_params=None):
+    """Generate (event, data) pairs for a query, for server-sent events.
+
+    "places" carries the place cards as soon as retrieval finishes, "delta"
+    the summary text as the LLM writes it, "result" each place's validated
+    answer, and "done" the full response in the shape structured_query_response
+    returns. "error" ends the stream if nothing matched.
+    """
+    print("\n[🔍] Searching relevant reviews (streaming)...")
+    cache, scope, vector = None, None, None
+    if getattr(vectorstore, "place_ranker", None) is None:
+        ranked = rank_by_first_hit(query, vectorstore, place_map, required_tags, top_n)
+    else:
+        vector = embed_query(vectorstore, query)
+        cache = get_semantic_cache() if cache_scope is not None else None
+        if cache is not None:
+            scope = cache_scope_for(cache_scope, required_tags, top_n, strategy, ann_params)
+            cached = cache.lookup(scope, vector)
+            if cached is not None:
+                print("[✓] Served from semantic cache")
+                results = cached["places"] if top_n > 1 else [cached]
+                yield "places", results
+                for result in results:
+                    yield "result", {"name": result.get("name"), "place": result}
+                yield "done", cached
+                return
+        ranked = rank_places(query, vectorstore, place_map, required_tags, top_n, strategy, vector, ann_params)
+
+    ranked = [(place_map.lookup(key), reviews) for key, reviews in ranked if place_map.lookup(key)]
+    if not ranked:
+        yield "error", {"error": "No relevant places found."}
+        return
+
+    cards = [place_card(place) for place, _ in ranked]
+    yield "places", cards
+
+    # Each place streams from its own thread; events interleave in arrival order
+    events = queue.Queue()
+    results = {}
+
+    def run(i, place, card, reviews):
+        try:
+            result = stream_place(query, place, reviews, card, events.put)
+        except Exception as e:
+            result = {**card, "error": str(e)}
+        results[i] = result
+        events.put(("result", {"name": card["name"], "place": result}))
+        events.put(None)
+
+    with ThreadPoolExecutor(max_workers=len(ranked)) as pool:
+        for i, (card, (place, reviews)) in enumerate(zip(cards, ranked)):
+            pool.submit(bind_trace(run), i, place, card, reviews)
+        finished = 0
+        while finished < len(ranked):
+            event = events.get()
+            if event is None:
+                finished += 1
+            else:
+                yield event
+
+    final = build_response([results[i] for i in range(len(cards))], top_n, strategy)
+    admit_to_cache(cache, scope, vector, final)
+    yield "done", final
 
 def main():
     vectorstore, place_map = load_data_and_store()
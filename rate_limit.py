@@ -0,0 +1,341 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+
+from metrics import span, inc
+
+# Configuration
+RATE_LIMIT_DB = os.getenv("VIBE_RATE_LIMIT_DB", "cache/rate_limits.sqlite")
+RETRY_ATTEMPTS = int(os.getenv("VIBE_RETRY_ATTEMPTS", "4"))
+RETRY_BASE_SECONDS = float(os.getenv("VIBE_RETRY_BASE", "1"))
+RETRY_MAX_SECONDS = float(os.getenv("VIBE_RETRY_MAX", "30"))
+BREAKER_FAILURES = int(os.getenv("VIBE_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("VIBE_BREAKER_COOLDOWN", "30"))
+
+# Default quota per provider: (requests per minute across all processes,
+# calls in flight per process). Override with VIBE_RATE_<PROVIDER>_RPM and
+# VIBE_RATE_<PROVIDER>_CONCURRENCY.
+PROVIDER_LIMITS = {
+    "serpapi": (60, 4),
+    "tavily": (60, 4),
+    "gemini": (60, 8),
+    "groq": (30, 4),
+}
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(RuntimeError):
+    """Calls to a provider are suspended after repeated failures"""
+
+    def __init__(self, provider, retry_in):
+        super().__init__(f"{provider} circuit open after repeated failures, retry in {retry_in:.0f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+# === Outcome classification ===
+def _status(obj):
+    """HTTP status of a response or an API exception, if it carries one"""
+    for candidate in (obj, getattr(obj, "response", None)):
+        status = getattr(candidate, "status_code", None)
+        if isinstance(status, int):
+            return status
+    code = getattr(obj, "code", None)  # google.api_core exceptions
+    return int(code) if isinstance(code, int) else None
+
+def classify(result=None, error=None):
+    """"ok", "throttled" (429), "error" (5xx, network) or "fatal" (anything else)"""
+    status = _status(error if error is not None else result)
+    if status == 429:
+        return "throttled"
+    if status in RETRYABLE_STATUS:
+        return "error"
+    if error is None:
+        return "ok"
+    message = str(error).lower()
+    if "429" in message or "rate limit" in message or "too many requests" in message:
+        return "throttled"
+    if isinstance(error, (OSError, TimeoutError)):  # requests' connection errors are OSErrors
+        return "error"
+    return "fatal"
+
+def retry_after(obj):
+    """Seconds from a Retry-After header, if the response asked for one"""
+    headers = getattr(obj, "headers", None) or getattr(getattr(obj, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def backoff(attempt, base=RETRY_BASE_SECONDS, cap=RETRY_MAX_SECONDS):
+    """Full-jitter exponential backoff, so retrying callers spread out instead of retrying together"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# === Shared state ===
+class ProviderState:
+    """Token bucket and circuit breaker for one provider, kept in SQLite.
+
+    Every process on the host (Flask workers, multiprocessing scraper
+    workers) reads and updates the same row inside a write transaction, so
+    they draw from one request budget and see the same breaker state.
+
+    The breaker is closed (open_until = 0), open (now < open_until) or, once
+    the cooldown has passed, half-open: the first caller to ask claims a
+    trial call (trial_until is its lease) and everyone else stays rejected
+    until that caller records the outcome or the lease runs out.
+    """
+
+    def __init__(self, name, rate_per_minute, burst=None, path=RATE_LIMIT_DB,
+                 failure_threshold=BREAKER_FAILURES, cooldown_seconds=BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1, int(self.rate))
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS providers ("
+                " name TEXT PRIMARY KEY, tokens REAL, updated REAL,"
+                " failures INTEGER, open_until REAL, trial_until REAL DEFAULT 0)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(providers)")]
+            if "trial_until" not in columns:  # databases from before half-open tracking
+                conn.execute("ALTER TABLE providers ADD COLUMN trial_until REAL DEFAULT 0")
+            conn.execute(
+                "INSERT OR IGNORE INTO providers VALUES (?, ?, ?, 0, 0, 0)",
+                (name, float(self.capacity), time.time()),
+            )
+
+    def _conn(self):
+        # Connections must not cross threads or survive a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _update(self, change):
+        """Apply change(tokens, failures, open_until, trial_until, now) -> (new row values, result) atomically"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, updated, failures, open_until, trial_until = conn.execute(
+                "SELECT tokens, updated, failures, open_until, trial_until FROM providers WHERE name = ?",
+                (self.name,)
+            ).fetchone()
+            now = time.time()
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+            (tokens, failures, open_until, trial_until), result = change(tokens, failures, open_until,
+                                                                         trial_until or 0.0, now)
+            conn.execute(
+                "UPDATE providers SET tokens = ?, updated = ?, failures = ?, open_until = ?, trial_until = ?"
+                " WHERE name = ?",
+                (tokens, now, failures, open_until, trial_until, self.name),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def acquire(self):
+        """Block until the shared bucket allows a call"""
+        def take(tokens, failures, open_until, trial_until, now):
+            if tokens >= 1:
+                return (tokens - 1, failures, open_until, trial_until), 0.0
+            return (tokens, failures, open_until, trial_until), (1 - tokens) / self.rate
+
+        while (wait := self._update(take)) > 0:
+            time.sleep(wait)
+
+    def drain(self, seconds=0.0):
+        """Empty the bucket (and hold it for `seconds`) after the provider throttled us"""
+        return self._update(lambda tokens, failures, open_until, trial_until, now: (
+            (min(tokens, 0.0) - seconds * self.rate, failures, open_until, trial_until), None))
+
+    def admit(self):
+        """0 if the breaker lets this call through, else seconds until it might.
+
+        A closed breaker admits everyone. After the cooldown the first caller
+        claims the half-open trial; the rest are rejected until it reports.
+        """
+        def check(tokens, failures, open_until, trial_until, now):
+            row = (tokens, failures, open_until, trial_until)
+            if not open_until:
+                return row, 0.0
+            if now < open_until:
+                return row, open_until - now
+            if now < trial_until:  # another caller holds the trial
+                return row, trial_until - now
+            return (tokens, failures, open_until, now + self.cooldown_seconds), 0.0
+
+        return self._update(check)
+
+    def open_for(self):
+        """Seconds until the breaker may admit a call; 0 when closed or ready for a trial"""
+        open_until, trial_until = self._conn().execute(
+            "SELECT open_until, trial_until FROM providers WHERE name = ?", (self.name,)).fetchone()
+        if not open_until:
+            return 0.0
+        return max(0.0, open_until - time.time(), (trial_until or 0.0) - time.time())
+
+    def circuit(self):
+        """"closed", "open" or "half_open" (cooled down, trial pending or in flight)"""
+        open_until = self._conn().execute(
+            "SELECT open_until FROM providers WHERE name = ?", (self.name,)).fetchone()[0]
+        if not open_until:
+            return "closed"
+        return "open" if time.time() < open_until else "half_open"
+
+    def record(self, outcome):
+        """Count consecutive failures; opening the breaker once they reach the threshold.
+
+        A failed half-open trial reopens the breaker straight away, a success
+        closes it. Returns True when this outcome opened the breaker.
+        """
+        def change(tokens, failures, open_until, trial_until, now):
+            if outcome in ("ok", "fatal"):  # a 4xx is our fault, not the provider's
+                return (tokens, 0, 0.0, 0.0), False
+            failures += 1
+            if failures >= self.failure_threshold and (not open_until or now >= open_until):
+                return (tokens, failures, now + self.cooldown_seconds, 0.0), True
+            return (tokens, failures, open_until, trial_until), False
+
+        return self._update(change)
+
+class AdaptiveConcurrency:
+    """Per-process limit on calls in flight, adjusted AIMD-style: it grows by
+    1/limit on each success and halves when the provider throttles or fails"""
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, outcome):
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == "ok":
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif outcome in ("throttled", "error"):
+                self.limit = max(self.min_limit, self.limit / 2)
+            self._cond.notify_all()
+
+# === Provider limiter ===
+class ProviderLimiter:
+    """Throttled, retried calls to one external API.
+
+    call() waits for the shared token bucket and a concurrency slot, then
+    retries 429s, 5xx responses and network errors with jittered backoff
+    (honouring Retry-After). Repeated failures open a circuit breaker shared
+    by all processes, and calls fail fast with CircuitOpenError until it
+    cools down.
+    """
+
+    def __init__(self, name, rate_per_minute, max_concurrency, attempts=RETRY_ATTEMPTS, path=RATE_LIMIT_DB):
+        self.name = name
+        self.attempts = attempts
+        self.state = ProviderState(name, rate_per_minute, burst=max_concurrency, path=path)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self.counts = {"calls": 0, "ok": 0, "throttled": 0, "error": 0, "fatal": 0, "retries": 0, "rejected": 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.counts[key] += 1
+
+    def call(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) under this provider's limits.
+
+        Returns fn's result; when fn returns an HTTP response that is still
+        throttled or failing after the last attempt, that response is
+        returned for the caller to handle. Exceptions are re-raised once
+        retries run out or straight away when they are not transient.
+        """
+        self._count("calls")
+        for attempt in range(self.attempts):
+            wait = self.state.admit()
+            if wait > 0:
+                self._count("rejected")
+                inc("vibe_api_calls_total", help="External API call attempts by outcome", provider=self.name,
+                    outcome="rejected")
+                raise CircuitOpenError(self.name, wait)
+
+            self.state.acquire()
+            self.concurrency.acquire()
+            result = error = None
+            outcome = "fatal"
+            try:
+                with span("api_call", provider=self.name):
+                    result = fn(*args, **kwargs)
+                outcome = classify(result)
+            except Exception as e:
+                error = e
+                outcome = classify(error=e)
+            finally:
+                self.concurrency.release(outcome)
+            self._count(outcome)
+            inc("vibe_api_calls_total", help="External API call attempts by outcome", provider=self.name,
+                outcome=outcome)
+            if self.state.record(outcome):
+                print(f"[✗] {self.name}: circuit opened for {self.state.cooldown_seconds:.0f}s after repeated failures")
+
+            if outcome in ("ok", "fatal") or attempt == self.attempts - 1:
+                break
+            delay = max(backoff(attempt), retry_after(error if error is not None else result) or 0.0)
+            if outcome == "throttled":
+                self.state.drain(retry_after(error if error is not None else result) or 0.0)
+            print(f"[!] {self.name}: {outcome} on attempt {attempt + 1}, retrying in {delay:.1f}s")
+            self._count("retries")
+            time.sleep(delay)
+
+        if error is not None:
+            raise error
+        return result
+
+    def stats(self):
+        with self._stats_lock:
+            counts = dict(self.counts)
+        return {
+            **counts,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "circuit": self.state.circuit(),
+            "circuit_open_for": round(self.state.open_for(), 1),
+        }
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(provider):
+    """Process-wide ProviderLimiter for "serpapi", "tavily", "gemini" or "groq" """
+    with _limiters_lock:
+        if provider not in _limiters:
+            rpm, concurrency = PROVIDER_LIMITS[provider]
+            prefix = f"VIBE_RATE_{provider.upper()}"
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                int(os.getenv(f"{prefix}_RPM", str(rpm))),
+                int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+            )
+        return _limiters[provider]
+
+def limiter_stats():
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -1,10 +1,14 @@
 import os
 import json
 import time
+import asyncio
 from datetime import datetime
 from dotenv import load_dotenv
 from tavily import TavilyClient
-from playwright.sync_api import sync_playwright
+from rate_limit import get_limiter
+from browser_pool import get_browser_pool, AsyncBrowserPool
+from scrolling import scroll_until_loaded, scroll_until_loaded_async
+from metrics import timed, inc
 
 # Load API keys
 load_dotenv()
@@ -14,11 +18,47 @@ tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
 MAX_THREADS = 3
 MAX_COMMENTS_TO_SCAN = 30
 MIN_COMMENT_LENGTH = 10
+MAX_REPLIES = 5
+COMMENTS_READY_TIMEOUT_MS = 10000
+THREAD_TIMEOUT_MS = 60000
 
+# "evaluate" extracts a thread's whole comment forest in one page.evaluate
+# round trip; "locator" walks it with per-comment Playwright calls (sync
+# scraper only, kept for comparison; the async scraper always evaluates)
+EXTRACTION_MODE = os.getenv("VIBE_EXTRACTION_MODE", "evaluate")
+
+EXTRACT_COMMENTS_JS = """
+([maxComments, minLength, maxReplies]) => {
+  const parse = (node) => {
+    const textNode = node.querySelector('div:has(p)');
+    if (!textNode) return null;
+    const text = textNode.innerText.trim();
+    if (text.length < minLength) return null;
+    const perm = node.querySelector("a[data-testid='comment_permalink']");
+    const href = perm ? perm.getAttribute('href') : null;
+    const replies = [];
+    const children = node.querySelectorAll(':scope > shreddit-comment');
+    for (let i = 0; i < Math.min(children.length, maxReplies); i++) {
+      const reply = parse(children[i]);
+      if (reply) replies.push(reply);
+    }
+    return {text, permalink: href ? `https://www.reddit.com${href}` : null, replies};
+  };
+  return Array.from(document.querySelectorAll('shreddit-comment'))
+    .slice(0, maxComments)
+    .filter(node => !node.parentElement.closest('shreddit-comment'))
+    .map(parse)
+    .filter(Boolean);
+}
+"""
+EXTRACT_COMMENTS_ARGS = [MAX_COMMENTS_TO_SCAN, MIN_COMMENT_LENGTH, MAX_REPLIES]
+
+@timed("reddit_search")
 def get_reddit_threads(query, max_results=MAX_THREADS):
     try:
         print(f"[→] Searching Reddit for: {query}")
-        response = tavily_client.search(
+        response = get_limiter("tavily").call(
+            tavily_client.search,
             query=f"{query} site:reddit.com",
             max_results=max_results,
             include_domains=["reddit.com"],
@@ -56,7 +96,7 @@ def extract_comment_tree(comment_element):
 
         replies = []
         children = comment_element.locator(":scope > shreddit-comment")
-        for i in range(min(children.count(), 5)):
+        for i in range(min(children.count(), MAX_REPLIES)):
             child = children.nth(i)
             reply_data = extract_comment_tree(child)
             if reply_data:
@@ -71,54 +111,92 @@ def extract_comment_tree(comment_element):
         print(f"  [!] Error parsing comment: {e}")
         return None
 
-def scrape_all_comments(threads):
+def extract_thread_comments(page):
+    comment_blocks = page.locator("shreddit-comment")
+    total_comments = min(comment_blocks.count(), MAX_COMMENTS_TO_SCAN)
+    print(f"[✓] Scanning {total_comments} comments")
+
+    top_level_comments = []
+    for j in range(total_comments):
+        comment = comment_blocks.nth(j)
+        is_top = comment.evaluate("node => !node.parentElement.closest('shreddit-comment')")
+        if not is_top:
+            continue
+        comment_data = extract_comment_tree(comment)
+        if comment_data:
+            top_level_comments.append(comment_data)
+            if len(top_level_comments) % 5 == 0:
+                print(f"  [✓] Saved {len(top_level_comments)} comments")
+    return top_level_comments
+
+# === Shared by the sync and async scrapers ===
+def _thread_loaded(scrolled):
+    inc("vibe_pages_fetched_total", help="Pages loaded by the scrapers", source="reddit")
+    print(f"[✓] Loaded {scrolled.count} comments, {scrolled.waited_seconds:.1f}s waiting ({scrolled.reason})")
+
+def _thread_result(thread, top_level_comments):
+    print(f"[✓] Saved {len(top_level_comments)} comments total")
+    inc("vibe_items_scraped_total", len(top_level_comments), help="Reviews and comments scraped", source="reddit")
+    return {
+        "title": thread["title"],
+        "url": thread["url"],
+        "all_comments": top_level_comments
+    }
+
+# === Scrapers ===
+@timed("reddit_comments")
+def scrape_all_comments(threads, pool=None):
     all_data = []
-    with sync_playwright() as p:
+    pool = pool or get_browser_pool()
+    with pool.context() as context:
         try:
-            browser = p.chromium.launch(headless=False)
-            context = browser.new_context()
             page = context.new_page()
 
             for i, thread in enumerate(threads, 1):
                 print(f"\n[→] ({i}/{len(threads)}) Scanning: {thread['title']}")
                 try:
-                    page.goto(thread["url"], timeout=60000)
-                    page.wait_for_timeout(3000)
-
-                    for _ in range(3):
-                        page.mouse.wheel(0, 2000)
-                        time.sleep(0.5)
-
-                    comment_blocks = page.locator("shreddit-comment")
-                    total_comments = min(comment_blocks.count(), MAX_COMMENTS_TO_SCAN)
-                    print(f"[✓] Scanning {total_comments} comments")
-
-                    top_level_comments = []
-                    for j in range(total_comments):
-                        comment = comment_blocks.nth(j)
-                        is_top = comment.evaluate("node => !node.parentElement.closest('shreddit-comment')")
-                        if not is_top:
-                            continue
-                        comment_data = extract_comment_tree(comment)
-                        if comment_data:
-                            top_level_comments.append(comment_data)
-                            if len(top_level_comments) % 5 == 0:
-                                print(f"  [✓] Saved {len(top_level_comments)} comments")
-
-                    thread_data = {
-                        "title": thread["title"],
-                        "url": thread["url"],
-                        "all_comments": top_level_comments
-                    }
-                    print(f"[✓] Saved {len(top_level_comments)} comments total")
-                    all_data.append(thread_data)
+                    page.goto(thread["url"], timeout=THREAD_TIMEOUT_MS)
+                    try:
+                        page.wait_for_selector("shreddit-comment", timeout=COMMENTS_READY_TIMEOUT_MS)
+                    except Exception:
+                        print("[!] No comments rendered")
+                    _thread_loaded(scroll_until_loaded(page, "shreddit-comment", MAX_COMMENTS_TO_SCAN))
+
+                    if EXTRACTION_MODE == "evaluate":
+                        top_level_comments = page.evaluate(EXTRACT_COMMENTS_JS, EXTRACT_COMMENTS_ARGS)
+                    else:
+                        top_level_comments = extract_thread_comments(page)
+                    all_data.append(_thread_result(thread, top_level_comments))
 
                 except Exception as e:
                     print(f"[✗] Error loading thread: {e}")
                     continue
 
-        finally:
-            browser.close()
+        except Exception as e:
+            print(f"[✗] Browser error: {e}")
+    return all_data
+
+@timed("reddit_comments")
+async def scrape_all_comments_async(threads, pool: AsyncBrowserPool):
+    """Async Playwright version of scrape_all_comments; one context per place"""
+    all_data = []
+    async with pool.page() as page:
+        for i, thread in enumerate(threads, 1):
+            print(f"\n[→] ({i}/{len(threads)}) Scanning: {thread['title']}")
+            try:
+                await page.goto(thread["url"], timeout=THREAD_TIMEOUT_MS)
+                try:
+                    await page.wait_for_selector("shreddit-comment", timeout=COMMENTS_READY_TIMEOUT_MS)
+                except Exception:
+                    print("[!] No comments rendered")
+                _thread_loaded(await scroll_until_loaded_async(page, "shreddit-comment", MAX_COMMENTS_TO_SCAN))
+
+                top_level_comments = await page.evaluate(EXTRACT_COMMENTS_JS, EXTRACT_COMMENTS_ARGS)
+                all_data.append(_thread_result(thread, top_level_comments))
+
+            except Exception as e:
+                print(f"[✗] Error loading thread: {e}")
+                continue
     return all_data
 
 def sanitize_text(obj):
@@ -140,29 +218,51 @@ def run_pipeline(query):
         if not threads:
             print("[✗] No threads found")
             return None
+        return _finish_pipeline(query, scrape_all_comments(threads), start_time)
 
-        all_data = scrape_all_comments(threads)
-        if not all_data:
-            print("[✗] No comments scraped")
-            return None
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        place_slug = query.lower().replace(' ', '_')[:50]
-        output_path = f"Reddit Reviews/unfiltered_{place_slug}_{timestamp}.json"
-
-        # ✅ Sanitize before writing
-        all_data = sanitize_text(all_data)
+    except Exception as e:
+        print(f"[💥] Pipeline failed: {e}")
+        return None
 
-        with open(output_path, "w", encoding="utf-8", errors='replace') as f:
-            json.dump(all_data, f, indent=2, ensure_ascii=False)
+async def run_pipeline_async(query, pool: AsyncBrowserPool):
+    """Async version of run_pipeline; the Tavily search runs in a worker thread"""
+    start_time = time.time()
+    print(f"\n[🚀] Starting pipeline for: {query}")
 
-        print(f"\n[✅] Pipeline completed in {time.time()-start_time:.1f}s")
-        print(f"[💾] Saved to {output_path}")
-        return output_path
+    try:
+        threads = await asyncio.to_thread(get_reddit_threads, query)
+        if not threads:
+            print("[✗] No threads found")
+            return None
+        return _finish_pipeline(query, await scrape_all_comments_async(threads, pool), start_time)
 
     except Exception as e:
         print(f"[💥] Pipeline failed: {e}")
         return None
 
+def _finish_pipeline(query, all_data, start_time):
+    """Save scraped threads; returns the output path, or None if nothing was scraped"""
+    if not all_data:
+        print("[✗] No comments scraped")
+        return None
+    output_path = _save_threads(query, all_data)
+    print(f"\n[✅] Pipeline completed in {time.time()-start_time:.1f}s")
+    return output_path
+
+def _save_threads(query, all_data):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    place_slug = query.lower().replace(' ', '_')[:50]
+    os.makedirs("Reddit Reviews", exist_ok=True)
+    output_path = f"Reddit Reviews/unfiltered_{place_slug}_{timestamp}.json"
+
+    # ✅ Sanitize before writing
+    all_data = sanitize_text(all_data)
+
+    with open(output_path, "w", encoding="utf-8", errors='replace') as f:
+        json.dump(all_data, f, indent=2, ensure_ascii=False)
+
+    print(f"[💾] Saved to {output_path}")
+    return output_path
+
 if __name__ == "__main__":
     run_pipeline("Triveni Terrace Cafe, Delhi")
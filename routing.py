@@ -0,0 +1,131 @@
+import os
+import re
+import threading
+
+from metrics import inc
+
+# Rough transfer size of a blocked request, used to estimate bytes saved
+# (blocked requests never report a real size)
+ESTIMATED_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 30_000,
+    "other": 5_000,
+}
+
+# We only read text nodes, so images, video and fonts are never needed.
+# Stylesheets stay: the scroll helper relies on computed overflow styles.
+DEFAULT_BLOCKED_TYPES = ("image", "media", "font")
+
+DEFAULT_BLOCKED_URL_PATTERNS = (
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"googlesyndication\.com",
+    r"/maps/vt\b",            # map tiles
+    r"/maps/api/js/StaticMapService",
+    r"khms\d*\.google",       # satellite tiles
+    r"/gen_204\b",            # logging pings
+    r"/log\?format=",
+    r"events\.reddit\.com",
+    r"w3-reporting\.reddit\.com",
+    r"\.(mp4|webm|m3u8|gif)(\?|$)",
+)
+
+class RouteProfile:
+    """Request routing rules applied to every scraper BrowserContext.
+
+    Aborts requests whose resource type or URL is on the block list and counts
+    what was blocked and what was actually fetched.
+    """
+
+    def __init__(self, blocked_types=DEFAULT_BLOCKED_TYPES, blocked_url_patterns=DEFAULT_BLOCKED_URL_PATTERNS):
+        self.blocked_types = frozenset(blocked_types)
+        self.blocked_url = re.compile("|".join(blocked_url_patterns)) if blocked_url_patterns else None
+        self._lock = threading.Lock()
+        self.requests_blocked = 0
+        self.requests_allowed = 0
+        self.bytes_saved_estimate = 0
+        self.bytes_fetched = 0
+        self.blocked_by_type = {}
+
+    def should_block(self, request):
+        if request.resource_type in self.blocked_types:
+            return True
+        return bool(self.blocked_url and self.blocked_url.search(request.url))
+
+    def _count(self, request, blocked):
+        with self._lock:
+            if blocked:
+                kind = request.resource_type
+                self.requests_blocked += 1
+                self.blocked_by_type[kind] = self.blocked_by_type.get(kind, 0) + 1
+                self.bytes_saved_estimate += ESTIMATED_BYTES.get(kind, ESTIMATED_BYTES["other"])
+            else:
+                self.requests_allowed += 1
+        inc("vibe_browser_requests_total", help="Browser requests seen by the routing profile",
+            outcome="blocked" if blocked else "allowed")
+
+    def _add_fetched(self, sizes):
+        # Encoded body plus headers, as received; chunked and compressed
+        # responses count too, unlike with the content-length header
+        size = max(0, sizes.get("responseBodySize", 0)) + max(0, sizes.get("responseHeadersSize", 0))
+        with self._lock:
+            self.bytes_fetched += size
+        inc("vibe_browser_bytes_fetched_total", size, help="Response bytes loaded by scraper browsers")
+
+    def _on_request_finished(self, request):
+        try:
+            sizes = request.sizes()
+        except Exception:  # page or context closed meanwhile
+            return
+        self._add_fetched(sizes)
+
+    async def _on_request_finished_async(self, request):
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        self._add_fetched(sizes)
+
+    def _handle(self, route, request):
+        blocked = self.should_block(request)
+        self._count(request, blocked)
+        if blocked:
+            route.abort()
+        else:
+            route.continue_()
+
+    async def _handle_async(self, route, request):
+        blocked = self.should_block(request)
+        self._count(request, blocked)
+        if blocked:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def apply(self, context):
+        """Install the profile on a sync BrowserContext"""
+        context.route("**/*", self._handle)
+        context.on("requestfinished", self._on_request_finished)
+
+    async def apply_async(self, context):
+        """Install the profile on an async BrowserContext"""
+        await context.route("**/*", self._handle_async)
+        context.on("requestfinished", self._on_request_finished_async)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests_blocked": self.requests_blocked,
+                "requests_allowed": self.requests_allowed,
+                "blocked_by_type": dict(self.blocked_by_type),
+                "bytes_saved_estimate": self.bytes_saved_estimate,
+                "bytes_fetched": self.bytes_fetched,
+            }
+
+def default_route_profile():
+    """Routing profile from VIBE_ROUTE_PROFILE: 'block' (default) or 'off'"""
+    if os.getenv("VIBE_ROUTE_PROFILE", "block") == "off":
+        return None
+    return RouteProfile()
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from vibe_store import place_key, namespace
+from place_records import sanitize
+
+# Configuration
+LEDGER_DIR = os.getenv("VIBE_LEDGER_DIR", "ledger")
+SCRAPE_TTL_SECONDS = float(os.getenv("VIBE_SCRAPE_TTL_HOURS", "24")) * 3600
+
+SOURCES = ("google", "reddit")
+
+def data_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class ScrapeLedger:
+    """Per-(city, category) record of what was scraped for each place and when.
+
+    For every place_id and source it keeps the scrape time, the output file
+    and a hash of the scraped data, plus the SerpAPI `reviews_count` seen at
+    the time. Entries are written to disk as soon as each place/source
+    finishes, so a crashed run resumes from the last completed place.
+    """
+
+    def __init__(self, city, category, ttl_seconds=SCRAPE_TTL_SECONDS, directory=LEDGER_DIR):
+        self.path = os.path.join(directory, f"{namespace(city, category)}.json")
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.places = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.places = json.load(f)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.places, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def is_stale(self, place, source, now=None):
+        """True if this place/source must be (re-)scraped"""
+        entry = self.places.get(place_key(place), {})
+        scraped = entry.get(source)
+        if not scraped:
+            return True
+        # output_file is None when the scrape found nothing (e.g. no Reddit threads)
+        if scraped["output_file"] and not os.path.exists(scraped["output_file"]):
+            return True
+        if (now or time.time()) - scraped["scraped_at"] > self.ttl_seconds:
+            return True
+        # A changed review count means new Google reviews to pick up
+        if source == "google" and entry.get("reviews_count") != place.get("reviews_count"):
+            return True
+        return False
+
+    def record(self, place, source, output_file, data):
+        """Mark one place/source as successfully scraped and persist immediately"""
+        with self._lock:
+            entry = self.places.setdefault(place_key(place), {"name": place["name"]})
+            if source == "google":
+                entry["reviews_count"] = place.get("reviews_count")
+            entry[source] = {
+                "scraped_at": time.time(),
+                "output_file": output_file,
+                "hash": data_hash(data),
+            }
+            self._save()
+
+    def load_output(self, place, source):
+        """Previously scraped data for a place/source, or None if it must be re-scraped.
+
+        Data is sanitized the way it was when recorded, and a file whose
+        contents no longer match the recorded hash is treated as stale.
+        """
+        scraped = self.places.get(place_key(place), {}).get(source)
+        if not scraped:
+            return None
+        if not scraped["output_file"]:
+            return []
+        try:
+            with open(scraped["output_file"], "r", encoding="utf-8", errors="replace") as f:
+                data = sanitize(json.load(f))
+        except Exception as e:
+            print(f"[!] Could not reload {source} data for {place['name']}: {e}")
+            return None
+        if data_hash(data) != scraped["hash"]:
+            print(f"[!] {source} data for {place['name']} changed since it was scraped; re-scraping")
+            return None
+        return data
+
+    def needs_refresh(self):
+        """True if any recorded place/source is older than the TTL"""
+        now = time.time()
+        return any(
+            now - entry[source]["scraped_at"] > self.ttl_seconds
+            for entry in self.places.values()
+            for source in SOURCES
+            if source in entry
+        )
@@ -0,0 +1,122 @@
+import time
+import threading
+from collections import namedtuple
+
+# How long to wait for new items after a scroll before calling it a stall,
+# and a hard cap on the whole scroll loop (both in milliseconds)
+STALL_TIMEOUT_MS = 2000
+MAX_SCROLL_MS = 20000
+
+ScrollResult = namedtuple("ScrollResult", ["count", "rounds", "waited_seconds", "reason"])
+
+# Items matching the selector, or with `key` the distinct values of that
+# attribute (Maps nests several div[data-review-id] inside each review card)
+COUNT_ITEMS_JS = """
+  const countItems = (items, key) =>
+    key ? new Set(Array.from(items, el => el.getAttribute(key))).size : items.length;"""
+
+# Scrolls the nearest scrollable ancestor of the loaded items (e.g. the Maps
+# reviews feed), or the window if there is none, and returns the item count.
+SCROLL_STEP_JS = """
+([selector, scrollContainer, key]) => {""" + COUNT_ITEMS_JS + """
+  const items = document.querySelectorAll(selector);
+  let target = null;
+  if (scrollContainer && items.length) {
+    for (let el = items[items.length - 1].parentElement; el; el = el.parentElement) {
+      const overflow = getComputedStyle(el).overflowY;
+      if (el.scrollHeight > el.clientHeight && (overflow === 'auto' || overflow === 'scroll')) {
+        target = el;
+        break;
+      }
+    }
+  }
+  if (target) target.scrollTop = target.scrollHeight;
+  else window.scrollTo(0, document.body.scrollHeight);
+  return countItems(items, key);
+}
+"""
+
+COUNT_GREW_JS = """
+([selector, n, key]) => {""" + COUNT_ITEMS_JS + """
+  return countItems(document.querySelectorAll(selector), key) > n;
+}
+"""
+
+# === Wait-time metrics ===
+_metrics_lock = threading.Lock()
+_wait_metrics = {"pages": 0, "waited_seconds": 0.0, "stalls": 0}
+
+def record_wait(result):
+    with _metrics_lock:
+        _wait_metrics["pages"] += 1
+        _wait_metrics["waited_seconds"] += result.waited_seconds
+        _wait_metrics["stalls"] += result.reason == "stalled"
+
+def wait_metrics():
+    with _metrics_lock:
+        pages = _wait_metrics["pages"]
+        return {
+            **_wait_metrics,
+            "avg_waited_seconds": _wait_metrics["waited_seconds"] / pages if pages else 0.0,
+        }
+
+# === Scroll-until-satisfied loops ===
+def scroll_until_loaded(page, selector, target_count, scroll_container=False, key_attribute=None,
+                        stall_timeout_ms=STALL_TIMEOUT_MS, max_scroll_ms=MAX_SCROLL_MS):
+    """Scroll until `target_count` items match `selector` or loading stalls.
+
+    With `key_attribute`, items are counted by distinct values of that
+    attribute, so nested elements of one item count once. After each scroll
+    we wait for the item count to grow instead of sleeping a fixed time, so
+    fast pages finish immediately and slow ones get the full stall timeout.
+    """
+    deadline = time.monotonic() + max_scroll_ms / 1000
+    waited = 0.0
+    rounds = 0
+    while True:
+        count = page.evaluate(SCROLL_STEP_JS, [selector, scroll_container, key_attribute])
+        if count >= target_count:
+            result = ScrollResult(count, rounds, waited, "satisfied")
+            break
+        if time.monotonic() >= deadline:
+            result = ScrollResult(count, rounds, waited, "timeout")
+            break
+        rounds += 1
+        start = time.monotonic()
+        try:
+            page.wait_for_function(COUNT_GREW_JS, arg=[selector, count, key_attribute], timeout=stall_timeout_ms)
+        except Exception:
+            waited += time.monotonic() - start
+            result = ScrollResult(count, rounds, waited, "stalled")
+            break
+        waited += time.monotonic() - start
+
+    record_wait(result)
+    return result
+
+async def scroll_until_loaded_async(page, selector, target_count, scroll_container=False, key_attribute=None,
+                                    stall_timeout_ms=STALL_TIMEOUT_MS, max_scroll_ms=MAX_SCROLL_MS):
+    """Async Playwright version of scroll_until_loaded"""
+    deadline = time.monotonic() + max_scroll_ms / 1000
+    waited = 0.0
+    rounds = 0
+    while True:
+        count = await page.evaluate(SCROLL_STEP_JS, [selector, scroll_container, key_attribute])
+        if count >= target_count:
+            result = ScrollResult(count, rounds, waited, "satisfied")
+            break
+        if time.monotonic() >= deadline:
+            result = ScrollResult(count, rounds, waited, "timeout")
+            break
+        rounds += 1
+        start = time.monotonic()
+        try:
+            await page.wait_for_function(COUNT_GREW_JS, arg=[selector, count, key_attribute], timeout=stall_timeout_ms)
+        except Exception:
+            waited += time.monotonic() - start
+            result = ScrollResult(count, rounds, waited, "stalled")
+            break
+        waited += time.monotonic() - start
+
+    record_wait(result)
+    return result
@@ -1,44 +1,109 @@
 import os
 import json
-import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from rate_limit import get_limiter, CircuitOpenError
+from http_client import get_session, HTTP_TIMEOUT
+from metrics import timed, inc, bind_trace
 
 load_dotenv()
 SERPAPI_API_KEY = os.getenv("SERPAPI_KEY")
+SERPAPI_URL = os.getenv("VIBE_SERPAPI_URL", "https://serpapi.com/search.json")
 
-def get_places_from_google_maps(city: str, category: str, max_places: int = 10):
-    query = f"{category} in {city}"
-    
+# Configuration
+SERP_PAGE_SIZE = 20  # local_results per google_maps page
+SERP_MAX_PAGES = int(os.getenv("VIBE_SERP_MAX_PAGES", "6"))  # Google Maps stops paging after ~120 results
+SERP_CONCURRENCY = int(os.getenv("VIBE_SERP_CONCURRENCY", "4"))
+
+def fetch_results_page(query, start=0):
+    """One page of google_maps local_results ([] past the last page), or None if the request failed"""
     params = {
         "engine": "google_maps",
         "q": query,
         "type": "search",
+        "start": start,
         "api_key": SERPAPI_API_KEY
     }
 
-    response = requests.get("https://serpapi.com/search.json", params=params)
-    
+    try:
+        response = get_limiter("serpapi").call(get_session().get, SERPAPI_URL, params=params, timeout=HTTP_TIMEOUT)
+    except CircuitOpenError as e:
+        print(f"[✗] Request skipped: {e}")
+        return None
+    except OSError as e:  # connection errors and timeouts, after retries
+        print(f"[✗] Request failed for page at {start}: {e}")
+        return None
+
     if response.status_code != 200:
         print(f"[✗] Request failed: {response.status_code} - {response.text}")
-        return []
+        return None
 
-    data = response.json()
-    results = data.get("local_results", [])
-    places = []
+    inc("vibe_serp_pages_total", help="SerpAPI result pages fetched")
+    return response.json().get("local_results", [])
+
+@timed("serp_discovery")
+def get_places_from_google_maps(city: str, category: str, max_places: int = 10):
+    """Discover up to `max_places` places, fetching result pages concurrently.
 
-    for place in results[:max_places]:
-        places.append({
-            "name": place.get("title"),
-            "address": place.get("address"),
-            "rating": place.get("rating"),
-            "reviews_count": place.get("reviews"),
-            "coordinates": place.get("gps_coordinates"),
-            "category": category,
-            "city": city,
-            "source_url": place.get("place_id"),
-        })
+    Pages are requested with SerpAPI's `start` offset, at most
+    SERP_CONCURRENCY in flight, and consumed in order; places are
+    deduplicated by place_id. No further pages are requested after a short
+    (last) page, and paging ends there or after SERP_MAX_PAGES. Raises
+    RuntimeError if a page could not be fetched, rather than returning a
+    truncated list.
+    """
+    query = f"{category} in {city}"
+    n_pages = min(SERP_MAX_PAGES, max(1, -(-max_places // SERP_PAGE_SIZE)))
+    workers = max(1, min(SERP_CONCURRENCY, n_pages))
+    fetch = bind_trace(lambda start: fetch_results_page(query, start))
+
+    pages = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        next_page = 0
+
+        def request_next():
+            nonlocal next_page
+            start = next_page * SERP_PAGE_SIZE
+            in_flight.append((start, pool.submit(fetch, start)))
+            next_page += 1
+
+        while next_page < min(workers, n_pages):
+            request_next()
+        while in_flight:
+            start, future = in_flight.popleft()
+            results = future.result()
+            if results is None:
+                raise RuntimeError(f"Place discovery for '{query}' failed at result {start}")
+            pages.append(results)
+            if len(results) < SERP_PAGE_SIZE:  # last page: request no more
+                break
+            if next_page < n_pages:
+                request_next()
+
+    places = []
+    seen = set()
+    for results in pages:
+        for place in results:
+            place_id = place.get("place_id")
+            if place_id is not None:
+                if place_id in seen:
+                    continue
+                seen.add(place_id)
+            places.append({
+                "name": place.get("title"),
+                "address": place.get("address"),
+                "rating": place.get("rating"),
+                "reviews_count": place.get("reviews"),
+                "coordinates": place.get("gps_coordinates"),
+                "category": category,
+                "city": city,
+                "source_url": place_id,
+            })
 
-    return places
+    print(f"[✓] Discovered {len(places)} places from {len(pages)} result pages")
+    return places[:max_places]
 
 def save_places_to_json(places, city, category):
     filename = f"output/{category.lower().replace(' ', '_')}_{city.lower().replace(' ', '_')}.json"
@@ -54,4 +119,4 @@ if __name__ == "__main__":
     places = get_places_from_google_maps(city, category)
     print(f"Found {len(places)} places:")
     for p in places:
-        print(f"- {p['name']}")
\ No newline at end of file
+        print(f"- {p['name']}")
@@ -0,0 +1,135 @@
+import os
+import itertools
+import threading
+from collections import OrderedDict, namedtuple
+
+# Default memory budget for all loaded vectorstores together (in MB)
+DEFAULT_MEMORY_BUDGET_MB = int(os.getenv("VIBE_STORE_MEMORY_MB", "1024"))
+
+# An immutable view of one loaded store. Queries hold on to the snapshot they
+# started with; a rebuild swaps a new snapshot in without touching old readers.
+StoreSnapshot = namedtuple("StoreSnapshot", ["vectorstore", "place_map", "version", "size"])
+
+_versions = itertools.count(1)
+
+def store_key(city, category):
+    """Normalize a (city, category) pair into a registry key"""
+    return (city.strip().lower(), category.strip().lower())
+
+def estimate_store_bytes(vectorstore, place_map):
+    """Rough resident size of a loaded store: raw vectors + docstore text + place data"""
+    index = vectorstore.index
+    total = index.ntotal * index.d * 4
+
+    docstore = getattr(vectorstore.docstore, "_dict", {})
+    for doc in docstore.values():
+        total += len(doc.page_content) + 64 * len(doc.metadata)
+
+    for place in place_map.values():
+        total += sum(len(str(v)) for v in place.values())
+    return total
+
+class VectorstoreRegistry:
+    """LRU registry of loaded FAISS stores keyed by (city, category).
+
+    Stores are loaded lazily via `loader(city, category)` and evicted least
+    recently used first once the estimated total size exceeds the budget.
+    The most recently used store is never evicted, even if it alone exceeds it.
+
+    Entries are `StoreSnapshot`s that are never mutated after insertion, so
+    readers can search them without holding any lock.
+    """
+
+    def __init__(self, loader, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        self.loader = loader
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._stores = OrderedDict()  # key -> StoreSnapshot
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def __contains__(self, key):
+        with self._lock:
+            return store_key(*key) in self._stores
+
+    def get(self, city, category):
+        """Return (vectorstore, place_map) for a city/category, loading it if needed"""
+        snapshot = self.snapshot(city, category)
+        return snapshot.vectorstore, snapshot.place_map
+
+    def snapshot(self, city, category):
+        """Return the current StoreSnapshot for a city/category, loading it if needed"""
+        key = store_key(city, category)
+        with self._lock:
+            if key in self._stores:
+                self._stores.move_to_end(key)
+                self.hits += 1
+                return self._stores[key]
+
+        # Only one thread loads a given key; others wait and then hit
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._stores:
+                    self._stores.move_to_end(key)
+                    self.hits += 1
+                    return self._stores[key]
+                self.misses += 1
+
+            vectorstore, place_map = self.loader(*key)
+            return self.put(key, vectorstore, place_map)
+
+    def reload(self, city, category):
+        """Load a fresh copy from disk and atomically swap it in.
+
+        Queries already running keep using the previous snapshot.
+        """
+        key = store_key(city, category)
+        with self._key_lock(key):
+            vectorstore, place_map = self.loader(*key)
+            return self.put(key, vectorstore, place_map)
+
+    def put(self, key, vectorstore, place_map):
+        """Insert or replace a loaded store and evict down to the budget"""
+        key = store_key(*key)
+        snapshot = StoreSnapshot(
+            vectorstore, place_map, next(_versions), estimate_store_bytes(vectorstore, place_map)
+        )
+        with self._lock:
+            self._stores[key] = snapshot
+            self._stores.move_to_end(key)
+            self._evict()
+        return snapshot
+
+    def invalidate(self, city, category):
+        """Drop a store so the next `get` reloads it from disk"""
+        with self._lock:
+            self._stores.pop(store_key(city, category), None)
+
+    def _evict(self):
+        used = sum(snapshot.size for snapshot in self._stores.values())
+        while used > self.memory_budget and len(self._stores) > 1:
+            _, snapshot = self._stores.popitem(last=False)
+            used -= snapshot.size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "stores": [
+                    {"city": city, "category": category, "version": snapshot.version, "bytes": snapshot.size}
+                    for (city, category), snapshot in self._stores.items()
+                ],
+                "memory_used_bytes": sum(snapshot.size for snapshot in self._stores.values()),
+                "memory_budget_bytes": self.memory_budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
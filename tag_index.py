@@ -0,0 +1,74 @@
+import os
+import numpy as np
+
+from lazy_store import chunk_metadata
+
+TAG_INDEX_NAME = "tag_index.npz"
+
+def normalize_tag(tag):
+    return tag.strip().lower()
+
+class TagIndex:
+    """Inverted index from vibe tag to the FAISS row IDs of chunks with that tag.
+
+    Each posting list is a bitmap over rows 0..ntotal-1, packed little-endian
+    (bit i lives in byte i >> 3 at position i & 7), which is the layout
+    faiss.IDSelectorBitmap expects.
+    """
+
+    def __init__(self, ntotal, bitmaps):
+        self.ntotal = ntotal
+        self.bitmaps = bitmaps  # tag -> packed uint8 array
+
+    @classmethod
+    def build(cls, vectorstore, place_map=None):
+        """Build from a loaded store, taking tags from the place side table
+        (compact chunks) or from the chunk metadata itself (older stores)"""
+        ntotal = vectorstore.index.ntotal
+        place_map = place_map or {}
+        rows_by_tag = {}
+        for row, metadata in chunk_metadata(vectorstore):
+            place = place_map.get(metadata.get("place_id"))
+            tags = place.get("tags", []) if place is not None else metadata.get("tags", [])
+            for tag in tags:
+                rows_by_tag.setdefault(normalize_tag(tag), []).append(row)
+
+        bitmaps = {}
+        for tag, rows in rows_by_tag.items():
+            bits = np.zeros(ntotal, dtype=bool)
+            bits[rows] = True
+            bitmaps[tag] = np.packbits(bits, bitorder="little")
+        return cls(ntotal, bitmaps)
+
+    def save(self, path):
+        np.savez_compressed(
+            os.path.join(path, TAG_INDEX_NAME),
+            __ntotal__=np.array([self.ntotal]),
+            **{f"tag:{tag}": bitmap for tag, bitmap in self.bitmaps.items()}
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index, or None if the store has none"""
+        index_file = os.path.join(path, TAG_INDEX_NAME)
+        if not os.path.exists(index_file):
+            return None
+        with np.load(index_file) as data:
+            ntotal = int(data["__ntotal__"][0])
+            bitmaps = {name[4:]: data[name] for name in data.files if name.startswith("tag:")}
+        return cls(ntotal, bitmaps)
+
+    def bitmap_for(self, tags):
+        """Packed bitmap of rows having ANY of `tags` (the query filter semantics)"""
+        combined = np.zeros((self.ntotal + 7) // 8, dtype=np.uint8)
+        for tag in tags:
+            bitmap = self.bitmaps.get(normalize_tag(tag))
+            if bitmap is not None:
+                combined |= bitmap
+        return combined
+
+    def count(self, bitmap):
+        return int(np.unpackbits(bitmap, bitorder="little")[:self.ntotal].sum())
+
+    def stats(self):
+        return {tag: self.count(bitmap) for tag, bitmap in sorted(self.bitmaps.items())}
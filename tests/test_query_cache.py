@@ -0,0 +1,39 @@
+import numpy as np
+
+from query_cache import SemanticCache
+
+def scope(version, tags=(), top_n=1, strategy="max"):
+    return ("pune", "cafes", version, tags, top_n, strategy, ())
+
+def test_hit_for_near_duplicate_query_in_same_scope():
+    cache = SemanticCache(threshold=0.95)
+    cache.store(scope(1), [1.0, 0.0, 0.0], {"name": "Cafe A"})
+
+    assert cache.lookup(scope(1), [0.99, 0.05, 0.0]) == {"name": "Cafe A"}
+    assert cache.lookup(scope(1), [0.0, 1.0, 0.0]) is None
+
+def test_rebuilt_store_version_never_serves_old_answer():
+    cache = SemanticCache(threshold=0.95)
+    vector = np.array([0.3, 0.4, 0.5])
+    cache.store(scope(1), vector, {"name": "Cafe A"})
+
+    assert cache.lookup(scope(2), vector) is None
+    cache.store(scope(2), vector, {"name": "Cafe B"})
+    assert cache.lookup(scope(2), vector) == {"name": "Cafe B"}
+    assert cache.lookup(scope(1), vector) == {"name": "Cafe A"}
+
+def test_filters_and_ranking_options_are_part_of_the_scope():
+    cache = SemanticCache(threshold=0.95)
+    vector = [1.0, 0.0]
+    cache.store(scope(1, tags=("quiet",)), vector, {"name": "Cafe A"})
+
+    assert cache.lookup(scope(1), vector) is None
+    assert cache.lookup(scope(1, tags=("quiet",), top_n=3), vector) is None
+    assert cache.lookup(scope(1, tags=("quiet",), strategy="rrf"), vector) is None
+    assert cache.lookup(scope(1, tags=("quiet",)), vector) == {"name": "Cafe A"}
+
+def test_expired_entries_are_not_served():
+    cache = SemanticCache(threshold=0.95, ttl_seconds=0)
+    cache.store(scope(1), [1.0, 0.0], {"name": "Cafe A"})
+
+    assert cache.lookup(scope(1), [1.0, 0.0]) is None
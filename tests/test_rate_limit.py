@@ -0,0 +1,65 @@
+import time
+import threading
+
+import pytest
+
+from rate_limit import ProviderState
+
+@pytest.fixture
+def state(tmp_path):
+    return ProviderState("fake", 6000, burst=10, path=str(tmp_path / "limits.sqlite"),
+                         failure_threshold=2, cooldown_seconds=0.2)
+
+def open_breaker(state):
+    for _ in range(state.failure_threshold):
+        state.record("error")
+    assert state.circuit() == "open"
+
+def test_breaker_opens_after_consecutive_failures(state):
+    assert state.admit() == 0
+    state.record("error")
+    assert state.circuit() == "closed"
+    state.record("error")
+    assert state.circuit() == "open"
+    assert state.admit() > 0
+
+def test_half_open_breaker_lets_exactly_one_caller_through(state):
+    open_breaker(state)
+    time.sleep(0.25)
+    assert state.circuit() == "half_open"
+
+    admitted = []
+    barrier = threading.Barrier(8)
+
+    def caller():
+        barrier.wait()
+        admitted.append(state.admit() == 0)
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert admitted.count(True) == 1
+
+def test_failed_trial_reopens_and_successful_trial_closes(state):
+    open_breaker(state)
+    time.sleep(0.25)
+    assert state.admit() == 0
+    assert state.record("error") is True
+    assert state.circuit() == "open"
+    assert state.admit() > 0
+
+    time.sleep(0.25)
+    assert state.admit() == 0
+    state.record("ok")
+    assert state.circuit() == "closed"
+    assert state.admit() == 0 and state.admit() == 0
+
+def test_trial_lease_expires_if_the_caller_never_reports(state):
+    open_breaker(state)
+    time.sleep(0.25)
+    assert state.admit() == 0
+    assert state.admit() > 0  # trial still in flight
+    time.sleep(0.25)
+    assert state.admit() == 0
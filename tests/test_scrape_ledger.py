@@ -0,0 +1,47 @@
+import json
+import time
+
+import pytest
+
+from scrape_ledger import ScrapeLedger
+
+PLACE = {"name": "Cafe", "source_url": "ChIJ1", "reviews_count": 10}
+
+@pytest.fixture
+def ledger(tmp_path):
+    return ScrapeLedger("Pune", "cafes", ttl_seconds=3600, directory=str(tmp_path))
+
+def write_output(tmp_path, data):
+    path = tmp_path / "reviews.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return str(path)
+
+def test_empty_ledger_needs_no_refresh(ledger):
+    assert not ledger.needs_refresh()
+
+def test_needs_refresh_once_any_source_is_older_than_ttl(ledger, tmp_path):
+    data = [{"text": "great coffee"}]
+    ledger.record(PLACE, "google", write_output(tmp_path, data), data)
+    ledger.record(PLACE, "reddit", None, [])
+    assert not ledger.needs_refresh()
+
+    ledger.places["ChIJ1"]["reddit"]["scraped_at"] = time.time() - 7200
+    assert ledger.needs_refresh()
+
+def test_ledger_persists_and_reloads(ledger, tmp_path):
+    data = [{"text": "great coffee"}]
+    ledger.record(PLACE, "google", write_output(tmp_path, data), data)
+
+    reloaded = ScrapeLedger("Pune", "cafes", ttl_seconds=3600, directory=str(tmp_path))
+    assert not reloaded.is_stale(PLACE, "google")
+    assert reloaded.load_output(PLACE, "google") == data
+    assert reloaded.is_stale(PLACE, "reddit")
+
+def test_changed_review_count_or_output_marks_place_stale(ledger, tmp_path):
+    data = [{"text": "great coffee"}]
+    output = write_output(tmp_path, data)
+    ledger.record(PLACE, "google", output, data)
+
+    assert ledger.is_stale({**PLACE, "reviews_count": 11}, "google")
+    write_output(tmp_path, [{"text": "edited"}])
+    assert ledger.load_output(PLACE, "google") is None
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from tag_index import TagIndex
+from vibe_store import PlaceTable
+
+class FakeDocstore:
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+    def metadata_items(self):
+        return self.metadata.items()
+
+def fake_store(row_metadata):
+    """Just enough of a FAISS vectorstore for TagIndex.build"""
+    ids = {row: f"doc{row}" for row in range(len(row_metadata))}
+    return SimpleNamespace(
+        index=SimpleNamespace(ntotal=len(row_metadata)),
+        index_to_docstore_id=ids,
+        docstore=FakeDocstore({ids[row]: metadata for row, metadata in enumerate(row_metadata)}),
+    )
+
+def rows(tag_index, tags):
+    bits = np.unpackbits(tag_index.bitmap_for(tags), bitorder="little")[:tag_index.ntotal]
+    return np.flatnonzero(bits).tolist()
+
+PLACES = PlaceTable([
+    {"name": "Cafe", "source_url": "A", "tags": ["quiet", "Cozy"]},
+    {"name": "Cafe", "source_url": "B", "tags": ["lively"]},
+])
+
+def test_tags_come_from_the_place_table_by_place_key():
+    store = fake_store([{"place_id": "A"}, {"place_id": "B"}, {"place_id": "A"}, {"place_id": "B"}])
+    tag_index = TagIndex.build(store, PLACES)
+
+    assert rows(tag_index, ["quiet"]) == [0, 2]
+    assert rows(tag_index, ["lively"]) == [1, 3]
+    assert tag_index.count(tag_index.bitmap_for(["quiet"])) == 2
+
+def test_filter_matches_any_tag_and_normalizes_case():
+    store = fake_store([{"place_id": "A"}, {"place_id": "B"}])
+    tag_index = TagIndex.build(store, PLACES)
+
+    assert rows(tag_index, ["cozy", "LIVELY"]) == [0, 1]
+    assert rows(tag_index, ["outdoor-seating"]) == []
+
+def test_older_chunks_carry_their_own_tags():
+    store = fake_store([{"source": "Cafe", "tags": ["quiet"]}, {"source": "Bar", "tags": ["noisy"]}])
+    tag_index = TagIndex.build(store)
+
+    assert rows(tag_index, ["noisy"]) == [1]
+
+def test_save_and_load_round_trip(tmp_path):
+    store = fake_store([{"place_id": "A"}, {"place_id": "B"}, {"place_id": "A"}])
+    TagIndex.build(store, PLACES).save(str(tmp_path))
+    loaded = TagIndex.load(str(tmp_path))
+
+    assert loaded.ntotal == 3
+    assert rows(loaded, ["quiet"]) == [0, 2]
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("langchain_google_genai")
+pytest.importorskip("langchain.text_splitter")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import vibe_store
+import build_vibe_vectorstore as bvv
+from finalPDFmaster import load_vector_store
+from vibe_store import live_store_dir, load_manifest, load_place_table, store_path
+
+def place(key, n_reviews, text="lovely quiet corner"):
+    return {
+        "name": f"Cafe {key}",
+        "city": "Pune",
+        "category": "cafes",
+        "address": f"{key} Main Road",
+        "rating": 4.5,
+        "reviews_count": n_reviews,
+        "coordinates": {"latitude": 18.5, "longitude": 73.8},
+        "source_url": key,
+        "google_reviews": [{"author": f"Author {i}", "text": f"{text} {key} {i}"} for i in range(n_reviews)],
+    }
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    """update_place_store against a temporary store root, fake embeddings and tags"""
+    monkeypatch.setattr(vibe_store, "STORES_ROOT", str(tmp_path / "vectorstores"))
+    monkeypatch.setattr(bvv, "create_embeddings", lambda chunks: DeterministicFakeEmbedding(size=16))
+    tagged = []
+
+    def fake_tagging(places, city):
+        tagged.extend(p["source_url"] for p in places)
+        for p in places:
+            p["tags"] = ["quiet"]
+        return []
+
+    monkeypatch.setattr(bvv, "tag_batch_of_places", fake_tagging)
+    source = tmp_path / "combined.jsonl"
+
+    def run(places):
+        tagged.clear()
+        source.write_text("\n".join(json.dumps(p) for p in places), encoding="utf-8")
+        return bvv.update_place_store(places, "Pune", "cafes", str(source))
+
+    run.tagged = tagged
+    return run
+
+def stored(city="Pune", category="cafes"):
+    path = live_store_dir(store_path(city, category))
+    vectorstore = load_vector_store(path, DeterministicFakeEmbedding(size=16), mode="eager")
+    return vectorstore, load_manifest(path), load_place_table(path)
+
+def test_incremental_update_adds_replaces_and_deletes_places(build):
+    build([place("A", 5), place("B", 5), place("C", 5)])
+    vectorstore, manifest, _ = stored()
+    assert vectorstore.index.ntotal == 15
+    assert manifest["version"] == 1
+
+    # A unchanged, B rewritten with fewer reviews, C gone, D new
+    build([place("A", 5), place("B", 3, text="now very noisy"), place("D", 2)])
+    vectorstore, manifest, places = stored()
+
+    assert build.tagged == ["B", "D"]
+    assert vectorstore.index.ntotal == 5 + 3 + 2
+    assert manifest["version"] == 2
+    assert sorted(manifest["places"]) == ["A", "B", "D"]
+    assert sorted(p["source_url"] for p in places) == ["A", "B", "D"]
+
+    # Every FAISS row points at a live chunk of the right place
+    expected_ids = {cid for entry in manifest["places"].values() for cid in entry["chunk_ids"]}
+    assert set(vectorstore.index_to_docstore_id.values()) == expected_ids
+    assert set(vectorstore.docstore._dict) == expected_ids
+    for doc_id in expected_ids:
+        doc = vectorstore.docstore.search(doc_id)
+        assert doc.metadata["place_id"] == doc_id.split(":")[0]
+        if doc.metadata["place_id"] == "B":
+            assert doc.page_content.startswith("now very noisy")
+
+def test_unchanged_rebuild_keeps_vectors_and_skips_tagging(build):
+    places = [place("A", 4), place("B", 2)]
+    build(places)
+    build([place("A", 4), place("B", 2)])
+    vectorstore, manifest, _ = stored()
+
+    assert build.tagged == []
+    assert vectorstore.index.ntotal == 6
+    assert manifest["version"] == 2
@@ -6,6 +6,39 @@ export const searchPlaces = (city, category) => {
   return axios.post(`${API_URL}/search`, { city, category });
 };
 
-export const queryVibes = (query, tags = []) => {
-  return axios.post(`${API_URL}/query`, { query, tags });
-};
\ No newline at end of file
+export const getJobStatus = (jobId) => {
+  return axios.get(`${API_URL}/jobs/${jobId}`);
+};
+
+export const queryVibes = (query, tags = [], city, category) => {
+  return axios.post(`${API_URL}/query`, { query, tags, city, category });
+};
+
+// POST a query and call onEvent(event, data) for each server-sent event
+export const streamQueryVibes = async (body, onEvent) => {
+  const response = await fetch(`${API_URL}/query/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body),
+  });
+  if (!response.ok) {
+    const { error } = await response.json();
+    throw new Error(error);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const messages = buffer.split('\n\n');
+    buffer = messages.pop();
+    for (const message of messages) {
+      const event = message.match(/^event: (.*)$/m)?.[1] ?? 'message';
+      const data = message.match(/^data: (.*)$/m)?.[1];
+      if (data !== undefined) onEvent(event, JSON.parse(data));
+    }
+  }
+};
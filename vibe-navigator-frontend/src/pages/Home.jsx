@@ -2,7 +2,19 @@ import { useState } from 'react';
 import { Container, Typography } from '@mui/material';
 import SearchForm from '../components/SearchForm';
 import ResultsList from '../components/ResultsList';
-import axios from 'axios';
+import { searchPlaces, getJobStatus, queryVibes, streamQueryVibes } from '../api';
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Poll a search job until its scrape/build/load stages finish
+const waitForJob = async (jobId) => {
+  for (;;) {
+    const { data: job } = await getJobStatus(jobId);
+    if (job.status === 'done') return job;
+    if (job.status === 'failed') throw new Error(job.error);
+    await sleep(2000);
+  }
+};
 
 export default function Home() {
   const [results, setResults] = useState([]);
@@ -11,16 +23,37 @@ export default function Home() {
   const handleSearch = async ({ city, category, query, tags }) => {
     setLoading(true);
     try {
-      // First: collect data
-      await axios.post('http://localhost:5000/api/search', { city, category });
+      // First: collect data (runs as a background job)
+      const { data: job } = await searchPlaces(city, category);
+      await waitForJob(job.job_id);
 
-      // Then: query using user-defined query + selected tags
-      const { data } = await axios.post('http://localhost:5000/api/query', {
-        query,
-        tags
-      });
+      // Then: stream the answer; place cards arrive first, summaries fill in as they are written
+      const updatePlace = (name, update) =>
+        setResults((places) => places.map((place) => (place.name === name ? update(place) : place)));
 
-      setResults([data]);
+      let streamed = false;
+      const onEvent = (event, data) => {
+        streamed = true;
+        if (event === 'places') {
+          setResults(data);
+          setLoading(false);
+        } else if (event === 'delta') {
+          updatePlace(data.name, (place) => ({ ...place, summary: place.summary + data.text }));
+        } else if (event === 'result') {
+          updatePlace(data.name, () => data.place);
+        } else if (event === 'error') {
+          throw new Error(data.error);
+        }
+      };
+      try {
+        await streamQueryVibes({ query, tags, city, category }, onEvent);
+      } catch (error) {
+        if (streamed) throw error;
+        // Stream failed before any event (e.g. no /query/stream on this backend): ask for the whole answer
+        const { data } = await queryVibes(query, tags, city, category);
+        if (data.error) throw new Error(data.error);
+        setResults(data.places ?? [data]);
+      }
     } catch (error) {
       console.error(error);
     } finally {
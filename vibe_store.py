@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reader leases, only the grace period
+    fcntl = None
+
+# Root directory holding one vectorstore per (city, category)
+STORES_ROOT = os.getenv("VIBE_STORES_ROOT", "vectorstores")
+LEGACY_STORE_PATH = "vibe_vectorstore"
+MANIFEST_NAME = "manifest.json"
+PLACE_TABLE_NAME = "places.json"
+CURRENT_POINTER = "CURRENT"  # names the published version directory of a store
+STORE_VERSIONS_KEPT = int(os.getenv("VIBE_STORE_VERSIONS_KEPT", "2"))
+# Superseded versions younger than this are never pruned, covering readers
+# that resolved CURRENT just before a publish but have not taken a lease yet
+STORE_VERSION_GRACE_SECONDS = int(os.getenv("VIBE_STORE_VERSION_GRACE", "600"))
+READER_LEASE = "readers.lock"
+
+# Version 2: chunks carry only {place_id, author, origin}; place fields live in
+# the places.json side table and are joined in at query time
+DOCSTORE_FORMAT = 2
+
+def _slug(value):
+    return value.strip().lower().replace(" ", "_")
+
+def namespace(city, category):
+    """File-name prefix shared by everything stored for one city/category"""
+    return f"{_slug(category)}_{_slug(city)}"
+
+def store_path(city, category):
+    """Directory of the vectorstore for one city/category"""
+    return os.path.join(STORES_ROOT, namespace(city, category))
+
+# === Store versions ===
+# Each save writes every store file (index, docstore.sqlite, side tables and
+# manifest) into a new version directory, then swaps the CURRENT pointer, so
+# readers see either the old store or the new one, never a mix of the two.
+def live_store_dir(path):
+    """Directory holding the published files of the store at `path`
+    (the store itself for stores saved before versioning)"""
+    pointer = os.path.join(path, CURRENT_POINTER)
+    if not os.path.exists(pointer):
+        return path
+    with open(pointer, "r", encoding="utf-8") as f:
+        return os.path.join(path, f.read().strip())
+
+def new_store_dir(path, version):
+    """Fresh, unpublished directory to save version `version` of a store into"""
+    os.makedirs(path, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f"v{version:06d}_", dir=path)
+
+def hold_store_dir(version_dir):
+    """Shared lease on a published version directory, held while a loaded
+    store may still read its files (the lazy docstore opens SQLite per thread).
+
+    Keep the returned file object alive with the loaded store; the lease ends
+    when it is closed or garbage collected, or the process exits. Returns None
+    for stores saved before versioning.
+    """
+    if fcntl is None or not os.path.exists(os.path.join(os.path.dirname(version_dir), CURRENT_POINTER)):
+        return None
+    lease = open(os.path.join(version_dir, READER_LEASE), "a")
+    fcntl.flock(lease, fcntl.LOCK_SH)
+    return lease
+
+def _store_dir_in_use(version_dir):
+    """True if any process still holds a reader lease on version_dir"""
+    lease_file = os.path.join(version_dir, READER_LEASE)
+    if fcntl is None or not os.path.exists(lease_file):
+        return False
+    with open(lease_file, "a") as lease:
+        try:
+            fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(lease, fcntl.LOCK_UN)
+    return False
+
+def publish_store_dir(path, version_dir):
+    """Make version_dir the store's live version atomically, then prune old versions.
+
+    Besides the newest STORE_VERSIONS_KEPT versions, a version is kept while
+    any worker holds a reader lease on it (see hold_store_dir) and for
+    STORE_VERSION_GRACE_SECONDS after it was superseded, so snapshots in
+    other processes never lose files they still have open.
+    """
+    pointer = os.path.join(path, CURRENT_POINTER)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(version_dir))
+    os.replace(pointer + ".tmp", pointer)
+
+    # Newest first; names start with the zero-padded store version
+    versions = sorted(
+        (entry for entry in os.scandir(path) if entry.is_dir() and entry.name.startswith("v")),
+        key=lambda entry: entry.name, reverse=True,
+    )
+    written = [entry.stat().st_mtime for entry in versions]
+    now = time.time()
+    for i, entry in enumerate(versions):
+        if i < max(1, STORE_VERSIONS_KEPT) or entry.path == version_dir:
+            continue
+        # A version was superseded when the next one was written
+        if now - written[i - 1] < STORE_VERSION_GRACE_SECONDS or _store_dir_in_use(entry.path):
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+    # Files of an unversioned store are superseded by the first published version
+    for entry in os.scandir(path):
+        if entry.is_file() and entry.name != CURRENT_POINTER:
+            os.remove(entry.path)
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def place_key(place):
+    """Stable per-place ID: the Google place_id, or the name if it is missing"""
+    return place.get("source_url") or place["name"]
+
+def place_content_hash(place):
+    """Hash of everything that ends up in a place's chunks"""
+    content = {
+        "google_reviews": place.get("google_reviews", []),
+        "reddit_comments": place.get("reddit_comments", []),
+        "meta": [place.get(k) for k in ("name", "address", "rating", "reviews_count", "coordinates", "city")],
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def chunk_ids_for(key, chunks):
+    """Deterministic docstore IDs for one place's chunks"""
+    return [f"{key}:{i}" for i in range(len(chunks))]
+
+# === Place side table ===
+def place_record(place):
+    """What the query path needs to know about a place, without its reviews"""
+    return {
+        "name": place["name"],
+        "city": place.get("city"),
+        "category": place.get("category"),
+        "address": place.get("address"),
+        "rating": place.get("rating"),
+        "reviews_count": place.get("reviews_count"),
+        "coordinates": place.get("coordinates"),
+        "source_url": place.get("source_url"),
+        "tags": place.get("tags", []),
+        "reddit_comments": [
+            {"title": thread.get("title"), "url": thread.get("url")}
+            for thread in place.get("reddit_comments", [])
+        ],
+    }
+
+def place_metadata(place):
+    """Per-chunk metadata as stored before DOCSTORE_FORMAT 2, rebuilt from a place record"""
+    return {
+        "source": place["name"],
+        "city": place.get("city", "unknown city"),
+        "tags": place.get("tags", []),
+        "address": place.get("address"),
+        "rating": place.get("rating"),
+        "reviews_count": place.get("reviews_count"),
+        "coordinates": place.get("coordinates"),
+        "url": f"https://www.google.com/maps/place/?q=place_id:{place.get('source_url')}",
+    }
+
+def save_place_table(path, places):
+    os.makedirs(path, exist_ok=True)
+    tmp = os.path.join(path, PLACE_TABLE_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump([place_record(place) for place in places], f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(path, PLACE_TABLE_NAME))
+
+def load_place_table(path):
+    """List of place records for a store, or None for stores without a side table"""
+    table_file = os.path.join(path, PLACE_TABLE_NAME)
+    if not os.path.exists(table_file):
+        return None
+    with open(table_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class PlaceTable(dict):
+    """Places keyed by place_key, plus `by_name` for chunks that only carry a name"""
+
+    def __init__(self, places):
+        super().__init__((place_key(place), place) for place in places)
+        self.by_name = {place["name"]: place for place in places}
+
+    def lookup(self, key):
+        """Place for a place_key, falling back to the display name older chunks store"""
+        return self.get(key) or self.by_name.get(key)
+
+# === Manifest ===
+def empty_manifest(city, category):
+    return {
+        "city": city,
+        "category": category,
+        "version": 0,
+        "source_hash": None,
+        "embedding_model": None,
+        "index_factory": None,
+        "docstore_format": DOCSTORE_FORMAT,
+        "updated_at": None,
+        "places": {},  # place key -> {"name", "content_hash", "tags", "tags_ok", "chunk_ids"}
+    }
+
+def load_manifest(path, city=None, category=None):
+    manifest_file = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_file):
+        return empty_manifest(city, category)
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically next to the index files"""
+    manifest["updated_at"] = time.time()
+    os.makedirs(path, exist_ok=True)
+    tmp = os.path.join(path, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, os.path.join(path, MANIFEST_NAME))
+
+def place_unchanged(place, manifest):
+    """True if the store already holds this place's current reviews and metadata"""
+    entry = manifest["places"].get(place_key(place))
+    return bool(entry) and entry["content_hash"] == place_content_hash(place)
+
+def store_is_current(city, category, source_path):
+    """True if the store for city/category was built from exactly this source file
+    and every place in it was tagged successfully"""
+    path = live_store_dir(store_path(city, category))
+    if not os.path.exists(os.path.join(path, MANIFEST_NAME)) or not os.path.exists(source_path):
+        return False
+    manifest = load_manifest(path)
+    if any(not entry.get("tags_ok", True) for entry in manifest["places"].values()):
+        return False
+    return manifest["source_hash"] == file_hash(source_path)
+
+def legacy_tagged_path(city, category):
+    """Tagged places file written by the single-store builder"""
+    return f"Combined Output/{category}_{city}_combined_tagged.json"
+
+def legacy_store_matches(city, category):
+    """True if the legacy single store was built for this city/category.
+
+    Its manifest says so when it has one; stores from before manifests are
+    matched by the tagged file the old builder wrote for them.
+    """
+    if not os.path.exists(os.path.join(LEGACY_STORE_PATH, "index.faiss")):
+        return False
+    if os.path.exists(os.path.join(LEGACY_STORE_PATH, MANIFEST_NAME)):
+        manifest = load_manifest(LEGACY_STORE_PATH)
+        if not manifest.get("city") or not manifest.get("category"):
+            return False
+        return namespace(manifest["city"], manifest["category"]) == namespace(city, category)
+    return os.path.exists(legacy_tagged_path(city, category))
+
+def resolve_store_path(city, category):
+    """Namespaced store if it exists, else the legacy store if it was built for this city/category"""
+    path = live_store_dir(store_path(city, category))
+    if os.path.exists(os.path.join(path, "index.faiss")):
+        return path
+    if legacy_store_matches(city, category):
+        return LEGACY_STORE_PATH
+    raise FileNotFoundError(f"No vectorstore has been built for {category} in {city}")